@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+""" Benchmark the engine end to end against stubserver stand-ins for the
+checker sites, for comparing engine changes.
+
+Reports URLs/sec, p50/p95/p99 latency per checker (one request to the
+checker site and parsing its response) and peak resident memory, for a
+synthetic list of URLs.
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -n urls, --urls urls  Number of synthetic URLs to check.  (Default: 200)
+  -t threads, --threads threads
+                        Number of engine worker threads.  (Default: 8)
+  --latency seconds     Average stand-in response time.  (Default: 0.05)
+  --error-rate rate     Fraction of stand-in responses that are HTTP 503.
+                        (Default: 0.0)
+  --rate-limit requests
+                        Requests per second each stand-in host answers before
+                        HTTP 429.  (Default: no limit)
+  --checker-limits      Keep each checker's own rate limit.
+                        (Default: only its concurrency cap)
+  --retries retries     Number of times a check is retried after a transient
+                        failure.  (Default: 3)
+  --deadline seconds    Give up a URL's checks still outstanding this many
+                        seconds after they started.  (Default: no deadline)
+  --hedge               Send slow GET requests again after their checker's
+                        observed p95 latency (or hedge delay, at first).
+  --format format       Output format rendered (and discarded): text or
+                        jsonl.  (Default: text)
+  --startup runs        Instead, time this many cold starts of the
+                        sitechecker.main script (--help, and an argument
+                        error) and list the slow imports they loaded.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from sitechecker import engine, registry, render, stats, stubserver
+
+
+DEFAULT_NUM_OF_URLS = 200
+DEFAULT_NUM_OF_THREADS = 8
+DEFAULT_LATENCY_SECONDS = 0.05
+
+# Rate and burst given to every checker host when its own rate limit is not
+# kept, high enough that no request ever waits for a token
+_UNLIMITED_RATE = 1000000
+
+# Modules that take most of the start up time, and that the script should
+# only import once it checks a URL
+_SLOW_IMPORTS = ('bs4', 'requests', 'lxml', 'multiprocessing',\
+    'BaseHTTPServer', 'pkg_resources')
+
+# Arguments of each timed start of the script, which all exit while parsing
+# them
+_STARTUP_ARGS = (['--help'], ['--threads', '0', '--site', 'www.google.com'])
+
+
+class LatencyRecorder(object):
+    """ Encapsulate the request latencies of every checker over a run.
+    """
+
+    def __init__(self):
+        """ Initialize an instance of the class.
+        """
+        # checker name: list of seconds
+        self.latencies = {}
+        self.__lock = threading.Lock()
+
+    def add(self, checker_name, seconds):
+        """ Record the latency of one request.
+
+        :param checker_name: User-friendly name of the checker
+        :param seconds: Time taken by the request
+        """
+        with self.__lock:
+            self.latencies.setdefault(checker_name, []).append(seconds)
+
+    def get_timed_class(self, checker_class):
+        """ Return a child class of checker_class whose request_url() records
+        its latency here.
+
+        :param checker_class: checker.SiteChecker child class
+        """
+        recorder = self
+
+        def request_url(temp_checker, url_to_check):
+            """ Request the checker site, timing the request.
+            """
+            start = time.time()
+            try:
+                return checker_class.request_url(temp_checker, url_to_check)
+            finally:
+                recorder.add(temp_checker.name, time.time() - start)
+
+        return type('Timed' + checker_class.__name__, (checker_class,),\
+            {'request_url': request_url})
+
+
+def get_peak_rss_mb():
+    """ Return the peak resident memory of this process so far, in MB.
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on OS X and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak_rss / (1024.0 * 1024.0)
+    return peak_rss / 1024.0
+
+
+def get_synthetic_urls(num_of_urls):
+    """ Return a generator of num_of_urls distinct URLs.
+    """
+    return ('site{}.example.com'.format(i) for i in xrange(num_of_urls))
+
+
+def run_benchmark(args):
+    """ Check the synthetic URLs against the stand-ins and print the report.
+
+    :param args: Parsed arguments (see __parse_script_args())
+    """
+    (stub_servers, stub_checker_dict) = stubserver.start_for_checkers(\
+        registry.get_checker_dict(opt_config_path=None),\
+        opt_latency=args.latency,\
+        opt_error_rate=args.error_rate, opt_rate_limit=args.rate_limit)
+
+    recorder = LatencyRecorder()
+    for definition in stub_checker_dict.values():
+        definition.checker_class = recorder.get_timed_class(\
+            definition.checker_class)
+        if not args.checker_limits:
+            definition.requests_per_second = _UNLIMITED_RATE
+            definition.request_burst = _UNLIMITED_RATE
+
+    batch_engine = engine.BatchEngine(stub_checker_dict, args.threads,\
+        opt_max_retries=args.retries, opt_deadline=args.deadline,\
+        opt_hedge=args.hedge)
+
+    # Render as usual, so rendering is measured too, but out of sight
+    saved_stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            renderer = render.get_renderer(args.format)
+            for url_task in batch_engine.run(get_synthetic_urls(args.urls)):
+                renderer.render(url_task)
+            renderer.close()
+        finally:
+            sys.stdout = saved_stdout
+
+    for stub in stub_servers:
+        stub.stop()
+
+    print 'URLs: {}  Threads: {}  Stand-in latency: {}s  Error rate: {}'.\
+        format(batch_engine.url_cnt, args.threads, args.latency,\
+            args.error_rate)
+    print 'Elapsed: {:.2f} seconds'.format(batch_engine.end_time -\
+        batch_engine.start_time)
+    print 'URLs/sec: {:.2f}'.format(batch_engine.get_urls_per_sec())
+    print 'Retried: {}  Hedged: {}  Failed: {}'.format(\
+        batch_engine.retry_cnt, batch_engine.hedged_cnt,\
+        sum(batch_engine.failure_cnts.values()))
+    print
+    print '{:<32}{:>8}{:>10}{:>10}{:>10}'.format('Checker latency', 'count',\
+        'p50', 'p95', 'p99')
+    for i in sorted(stub_checker_dict.keys()):
+        checker_name = stub_checker_dict[i].name
+        latencies = recorder.latencies.get(checker_name, [])
+        print '{:<32}{:>8}{:>10}{:>10}{:>10}'.format(checker_name,\
+            len(latencies), *[__format_seconds(stats.get_percentile(latencies,\
+                percent)) for percent in (50, 95, 99)])
+    print
+    print 'Peak RSS: {:.1f} MB'.format(get_peak_rss_mb())
+
+
+def run_startup_benchmark(num_of_runs):
+    """ Time num_of_runs cold starts of the sitechecker.main script per
+    _STARTUP_ARGS entry and print the report.
+
+    :param num_of_runs: Number of times to start the script per entry
+    """
+    with open(os.devnull, 'w') as devnull:
+        print '{:<40}{:>10}{:>10}'.format('Script start', 'min', 'p50')
+        for script_args in _STARTUP_ARGS:
+            durations = []
+            for _ in xrange(num_of_runs):
+                start = time.time()
+                subprocess.call([sys.executable, '-m', 'sitechecker.main'] +\
+                    script_args, stdout=devnull, stderr=devnull)
+                durations.append(time.time() - start)
+            print '{:<40}{:>10}{:>10}'.format(' '.join(script_args),\
+                __format_seconds(min(durations)),\
+                __format_seconds(stats.get_percentile(durations, 50)))
+
+    slow_imports = subprocess.check_output([sys.executable, '-c',\
+        'import sys; import sitechecker.main; print " ".join([module for '\
+            'module in {!r} if module in sys.modules])'.format(\
+                _SLOW_IMPORTS)]).strip()
+    print
+    print 'Slow imports loaded by sitechecker.main: {}'.format(\
+        slow_imports or 'none')
+
+
+def __format_seconds(seconds):
+    """ Return seconds formatted for the report (- if None).
+    """
+    return '-' if seconds is None else '{:.3f}s'.format(seconds)
+
+
+def __parse_script_args():
+    """ Parse command-line arguments to this script
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the engine '\
+        'against local stand-ins for the checker sites')
+    parser.add_argument('-n', '--urls', metavar='urls', type=int,\
+        default=DEFAULT_NUM_OF_URLS,\
+        help='Number of synthetic URLs to check.  (Default: {})'.\
+            format(DEFAULT_NUM_OF_URLS))
+    parser.add_argument('-t', '--threads', metavar='threads', type=int,\
+        default=DEFAULT_NUM_OF_THREADS,\
+        help='Number of engine worker threads.  (Default: {})'.\
+            format(DEFAULT_NUM_OF_THREADS))
+    parser.add_argument('--latency', metavar='seconds', type=float,\
+        default=DEFAULT_LATENCY_SECONDS,\
+        help='Average stand-in response time.  (Default: {})'.\
+            format(DEFAULT_LATENCY_SECONDS))
+    parser.add_argument('--error-rate', metavar='rate', type=float,\
+        default=0.0, help='Fraction of stand-in responses that are HTTP '\
+            '503.  (Default: 0.0)')
+    parser.add_argument('--rate-limit', metavar='requests', type=float,\
+        help='Requests per second each stand-in host answers before HTTP '\
+            '429.  (Default: no limit)')
+    parser.add_argument('--checker-limits', action='store_true',\
+        help='Keep each checker\'s own rate limit.  '\
+            '(Default: only its concurrency cap)')
+    parser.add_argument('--retries', metavar='retries', type=int,\
+        default=engine.DEFAULT_MAX_RETRIES,\
+        help='Number of times a check is retried after a transient '\
+            'failure.  (Default: {})'.format(engine.DEFAULT_MAX_RETRIES))
+    parser.add_argument('--deadline', metavar='seconds', type=float,\
+        help='Give up a URL\'s checks still outstanding this many seconds '\
+            'after they started.  (Default: no deadline)')
+    parser.add_argument('--hedge', action='store_true',\
+        help='Send slow GET requests again after their checker\'s observed '\
+            'p95 latency (or hedge delay, at first).')
+    parser.add_argument('--format', metavar='format',\
+        choices=[render.FORMAT_TEXT, render.FORMAT_JSONL],\
+        default=render.FORMAT_TEXT,\
+        help='Output format rendered (and discarded): text or jsonl.  '\
+            '(Default: text)')
+    parser.add_argument('--startup', metavar='runs', type=int,\
+        help='Instead, time this many cold starts of the sitechecker.main '\
+            'script (--help, and an argument error) and list the slow '\
+            'imports they loaded.')
+    args = parser.parse_args()
+    if args.urls < 1 or args.threads < 1 or\
+        (args.startup is not None and args.startup < 1):
+        parser.error('Please provide --urls, --threads and --startup as '\
+            'numbers greater than 0')
+        # Not reachable, so no return
+    return args
+
+
+if __name__ == "__main__":
+    ARGS = __parse_script_args()
+    if ARGS.startup is not None:
+        run_startup_benchmark(ARGS.startup)
+    else:
+        run_benchmark(ARGS)
+else:
+    pass
@@ -0,0 +1,155 @@
+""" Contains ResponseCache and CacheCounts classes
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'),\
+    '.sitechecker_cache.sqlite')
+
+
+class ResponseCache(object):
+    """ Encapsulate a single-file (SQLite) store of checker site responses,
+    keyed by checker name and URL from user input.
+
+    Only successful responses are stored.  Whether a stored response is still
+    fresh is decided by the caller's time to live (TTL), so each checker can
+    keep its results for as long as suits the provider.
+
+    A failure to open, read or write the file (example: locked, read-only or
+    in a missing directory) never fails a check: the lookup is a miss, the
+    response is not stored, and a warning is printed to standard error the
+    first time.  If the file cannot be opened at all, the run goes on
+    without a cache.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, opt_refresh=False):
+        """ Initialize an instance of the class.
+
+        :param path: Path of the SQLite file (created if missing)
+        :param opt_refresh: (Optional) True to ignore stored responses but
+            still store new ones
+        """
+        self.path = path
+        self.refresh = opt_refresh
+        self.hit_cnt = 0
+        self.miss_cnt = 0
+        # Opens, lookups and stores that failed on the file
+        self.error_cnt = 0
+        self.__lock = threading.Lock()
+        # Shared by the engine's worker threads; access is serialized by
+        # self.__lock.  None if the file cannot be opened
+        self.__conn = None
+        with self.__lock:
+            try:
+                self.__conn = sqlite3.connect(path, check_same_thread=False)
+                self.__conn.execute('CREATE TABLE IF NOT EXISTS responses ('\
+                    'checker TEXT NOT NULL, '\
+                    'url TEXT NOT NULL, '\
+                    'fetched_at REAL NOT NULL, '\
+                    'encoding TEXT, '\
+                    'body BLOB NOT NULL, '\
+                    'PRIMARY KEY (checker, url))')
+                self.__conn.commit()
+            except sqlite3.Error as exc_obj:
+                self.__add_error(exc_obj)
+
+    def get(self, checker_name, url_to_check, ttl):
+        """ Return the stored (body, encoding) for the checker and URL if it
+        is younger than ttl seconds, else None.
+
+        :param checker_name: User-friendly name of the checker (example:
+            GOOGLE PAGESPEED INSIGHTS)
+        :param url_to_check: URL from user input
+        :param ttl: Maximum age in seconds of a usable response
+        """
+        row = None
+        with self.__lock:
+            if not self.refresh and self.__conn is not None:
+                try:
+                    row = self.__conn.execute('SELECT body, encoding FROM '\
+                        'responses WHERE checker = ? AND url = ? AND '\
+                        'fetched_at >= ?', (checker_name, url_to_check,\
+                            time.time() - ttl)).fetchone()
+                except sqlite3.Error as exc_obj:
+                    self.__add_error(exc_obj)
+            if row is None:
+                self.miss_cnt += 1
+                return None
+            self.hit_cnt += 1
+        return (str(row[0]), row[1])
+
+    def put(self, checker_name, url_to_check, body, encoding):
+        """ Store a response for the checker and URL, replacing any older one.
+
+        :param checker_name: User-friendly name of the checker
+        :param url_to_check: URL from user input
+        :param body: Response body, as bytes
+        :param encoding: Character encoding of body given by the checker
+            site, or None
+        """
+        with self.__lock:
+            if self.__conn is None:
+                return
+            try:
+                self.__conn.execute('INSERT OR REPLACE INTO responses '\
+                    '(checker, url, fetched_at, encoding, body) VALUES (?, '\
+                    '?, ?, ?, ?)', (checker_name, url_to_check, time.time(),\
+                        encoding, sqlite3.Binary(body)))
+                self.__conn.commit()
+            except sqlite3.Error as exc_obj:
+                self.__add_error(exc_obj)
+
+    def __add_error(self, exc_obj):
+        """ Count a failed open, lookup or store, warning about the first.
+        Call with the lock held.
+        """
+        if self.error_cnt == 0:
+            print >> sys.stderr, 'Warning: cache {} not usable, checking '\
+                'without it ({})'.format(self.path, exc_obj)
+        self.error_cnt += 1
+
+    def get_hit_ratio(self):
+        """ Return the share of lookups answered from the cache (0.0 to 1.0).
+        """
+        return get_hit_ratio(self.hit_cnt, self.miss_cnt)
+
+
+class CacheCounts(object):
+    """ Encapsulate the counters of several ResponseCache instances on the
+    same file (example: one per worker process), added up, for the run
+    summary and metrics.
+    """
+
+    def __init__(self, path):
+        """ Initialize an instance of the class.
+
+        :param path: Path of the SQLite file the caches share
+        """
+        self.path = path
+        self.hit_cnt = 0
+        self.miss_cnt = 0
+        self.error_cnt = 0
+
+    def add(self, hit_cnt, miss_cnt, error_cnt):
+        """ Add the counters of a ResponseCache.
+        """
+        self.hit_cnt += hit_cnt
+        self.miss_cnt += miss_cnt
+        self.error_cnt += error_cnt
+
+    def get_hit_ratio(self):
+        """ Return the share of lookups answered from the caches (0.0 to
+        1.0).
+        """
+        return get_hit_ratio(self.hit_cnt, self.miss_cnt)
+
+
+def get_hit_ratio(hit_cnt, miss_cnt):
+    """ Return the share of lookups answered from a cache (0.0 to 1.0).
+    """
+    lookup_cnt = hit_cnt + miss_cnt
+    return float(hit_cnt) / lookup_cnt if lookup_cnt > 0 else 0.0
@@ -0,0 +1,161 @@
+""" Contains Cassette and CassetteAdapter classes, which record checker site
+responses to a file and replay them later without network access
+"""
+import base64
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+class CassetteError(Exception):
+    """ Raised when replaying a request that the cassette has no recorded
+    response for.
+    """
+    pass
+
+
+class Cassette(object):
+    """ Encapsulate a JSON file of recorded checker site interactions (the
+    request method and URL, and the response or the connection error).
+
+    Interactions for the same method and URL are replayed in the order they
+    were recorded, and the last one is repeated once they run out, so that
+    replays are deterministic whatever the order the engine's worker threads
+    send their requests in.
+    """
+
+    def __init__(self, path, opt_record=False):
+        """ Initialize an instance of the class, loading the file unless
+        recording.
+
+        :param path: Path of the cassette file
+        :param opt_record: (Optional) True to send real requests and record
+            them (replacing the file on save()), instead of replaying the file
+        """
+        self.path = path
+        self.record = opt_record
+        self.replay_cnt = 0
+        # (method, URL): list of interaction dicts
+        self.__interactions = {}
+        # (method, URL): number of interactions replayed
+        self.__replayed = {}
+        self.__lock = threading.Lock()
+        if not opt_record:
+            with open(path) as cassette_file:
+                for interaction in json.load(cassette_file)['interactions']:
+                    self.__interactions.setdefault((interaction['method'],\
+                        interaction['url']), []).append(interaction)
+
+    def add(self, interaction):
+        """ Record an interaction.
+
+        :param interaction: Dict created by CassetteAdapter
+        """
+        with self.__lock:
+            self.__interactions.setdefault((interaction['method'],\
+                interaction['url']), []).append(interaction)
+
+    def get(self, method, url):
+        """ Return the next recorded interaction for the method and URL.
+
+        :param method: HTTP method (example: GET)
+        :param url: Checker URL, including the URL from user input
+        :raise CassetteError: If nothing was recorded for the method and URL
+        """
+        with self.__lock:
+            interactions = self.__interactions.get((method, url))
+            if not interactions:
+                raise CassetteError('No recorded response for {} {} in {}'.\
+                    format(method, url, self.path))
+            index = self.__replayed.get((method, url), 0)
+            self.__replayed[(method, url)] = index + 1
+            self.replay_cnt += 1
+            return interactions[min(index, len(interactions) - 1)]
+
+    def save(self):
+        """ Write the recorded interactions to the file, if recording.
+        """
+        if not self.record:
+            return
+        with self.__lock:
+            interactions = [interaction for key in\
+                sorted(self.__interactions.keys()) for interaction in\
+                    self.__interactions[key]]
+        with open(self.path, 'w') as cassette_file:
+            json.dump({'interactions': interactions}, cassette_file,\
+                indent=2, sort_keys=True, separators=(',', ': '))
+            cassette_file.write('\n')
+
+
+class CassetteAdapter(HTTPAdapter):
+    """ Encapsulate a requests transport adapter that answers from a
+    Cassette, or sends real requests and records them in it.
+
+    Mounted on a requests.Session, it sits below everything the checkers do
+    with the response, so replayed responses (HTTP errors and Retry-After
+    headers included) are handled exactly like live ones.
+    """
+
+    def __init__(self, cassette, **kwargs):
+        """ Initialize an instance of the class.
+
+        :param cassette: Cassette to replay from or record to
+        :param kwargs: Keyword arguments for HTTPAdapter (example:
+            pool_maxsize=4)
+        """
+        self.cassette = cassette
+        super(CassetteAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        """ Return the response to request, from the cassette or the network.
+        """
+        if self.cassette.record:
+            return self.__send_and_record(request, **kwargs)
+
+        interaction = self.cassette.get(request.method, request.url)
+        if 'error' in interaction:
+            error_class = getattr(requests.exceptions, interaction['error'],\
+                requests.exceptions.RequestException)
+            raise error_class(interaction['message'], request=request)
+
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.reason = interaction['reason']
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        if 'body_base64' in interaction:
+            response._content = base64.b64decode(interaction['body_base64'])
+        else:
+            response._content = interaction['body'].encode('utf-8')
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def __send_and_record(self, request, **kwargs):
+        """ Send request over the network and record the response, or the
+        connection error, in the cassette.
+        """
+        interaction = {'method': request.method, 'url': request.url}
+        try:
+            response = super(CassetteAdapter, self).send(request, **kwargs)
+        except requests.exceptions.RequestException as exc_obj:
+            interaction['error'] = type(exc_obj).__name__
+            interaction['message'] = str(exc_obj)
+            self.cassette.add(interaction)
+            raise
+
+        interaction['status'] = response.status_code
+        interaction['reason'] = response.reason
+        interaction['headers'] = dict(response.headers)
+        try:
+            # Keep text bodies readable in the file
+            interaction['body'] = response.content.decode('utf-8')
+        except UnicodeDecodeError:
+            interaction['body_base64'] = base64.b64encode(response.content)
+        self.cassette.add(interaction)
+        return response
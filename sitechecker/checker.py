@@ -1,13 +1,34 @@
 """ Contains SiteChecker class
 """
 import abc
+import collections
 import json
 import re
+import sys
+import time
 
-import bs4
-import requests
+# bs4 and requests (with transport, which needs it) take most of the start up
+# time, so they are imported where a check first needs them; --help, argument
+# errors and URL validation do not wait for them
+from sitechecker import results, utils
 
-from sitechecker import utils
+
+# The fastest HTML parser backend for bs4 that is installed, once known
+_html_parser = None
+
+
+def get_html_parser():
+    """ Return the name of the fastest HTML parser backend for bs4 that is
+    installed: lxml if it is, else html.parser.
+    """
+    global _html_parser
+    if _html_parser is None:
+        try:
+            import lxml
+            _html_parser = 'lxml'
+        except ImportError:
+            _html_parser = 'html.parser'
+    return _html_parser
 
 
 class SiteChecker:
@@ -23,11 +44,54 @@ class SiteChecker:
     """
     __metaclass__ = abc.ABCMeta
 
+    RESPONSE_KIND_HTML = 'HTML'
+    RESPONSE_KIND_JSON = 'JSON'
+
+    # Override in child classes with the checker site's details, which the
+    # checker definitions are built from (see registry.py), and which the
+    # checker config file may override per checker
+    NAME = None
+    BASE_URL = None
+    GET_OR_POST = 'GET'
+    # Most requests in flight at once to the checker's host
+    MAX_CONCURRENT_REQUESTS = 1
+    # Requests per second to the checker's host, and the burst of requests
+    # allowed at once
+    REQUESTS_PER_SECOND = 1
+    REQUEST_BURST = 1
+    # Seconds to keep responses in the cache
+    CACHE_TTL = 86400
+    # Seconds to wait for a connection to the checker's host, and between
+    # bytes of its response
+    CONNECT_TIMEOUT = 10
+    READ_TIMEOUT = 60
+    # Seconds after which a GET request is hedged (--hedge) until enough of
+    # the checker's latencies have been observed to hedge at their p95
+    HEDGE_DELAY = 10
+    # False to leave the checker out of runs unless it is asked for (--only,
+    # or enabled in the checker config file)
+    ENABLED_BY_DEFAULT = True
+
+    # Override in child classes whose checker site answers in JSON
+    _RESPONSE_KIND = RESPONSE_KIND_HTML
+    # Override in child classes with a tag filter function (as a
+    # staticmethod) for a bs4.SoupStrainer matching the only parts of an HTML
+    # response that display_results() needs
+    _PARSE_ONLY = None
+
+    # Compiled once, as every URL of the input is matched against it
+    # if re.match(r'[-a-zA-Z0-9@:%._\+~#=]{2,256}\.
+    #   [a-z]{2,6}\b([-a-zA-Z0-9@:%_\+.~#?&//=]*)', url_to_check):
+    # Above URL regex too permissive for my use but others may want to
+    # allow for multisite etc (if so additional testing needed).
+    _URL_PATTERN = re.compile(r'[-a-zA-Z0-9@:%._\+~#=]{2,256}\.[a-z]{2,6}$')
+
     _PAGE_WIDTH = 80
     _MAX_MSG_LENGTH = 60
     _MAX_RESULTS_TO_DISPLAY = 10
 
-    def __init__(self, name, base_url, get_or_post):
+    def __init__(self, name, base_url, get_or_post, opt_session=None,\
+        opt_cache=None, opt_cache_ttl=0, opt_timeout=None):
         """  Initialize an instance of the class.
 
         :param name:  A user-friendly name to represent the type of checker
@@ -36,33 +100,51 @@ class SiteChecker:
             http://checkyoursiteforbadstuff.com/uri=)
         :param get_or_post: The type of HTTP request for the checker
             (examples: GET or POST)
+        :param opt_session: (Optional) A requests.Session to send the request
+            with, so that its connections are reused (default: a new
+            connection per request)
+        :param opt_cache: (Optional) A cache.ResponseCache to read responses
+            from before requesting the checker site, and to store new
+            responses in
+        :param opt_cache_ttl: (Optional) Maximum age in seconds of a cached
+            response that may be used instead of requesting the checker site
+        :param opt_timeout: (Optional) (connect, read) timeouts in seconds
+            (default: the class's CONNECT_TIMEOUT and READ_TIMEOUT)
         """
         self.name = name
         self.base_url = base_url
         self.get_or_post = get_or_post
+        self.session = opt_session
+        self.cache = opt_cache
+        self.cache_ttl = opt_cache_ttl
+        self.timeout = opt_timeout if opt_timeout is not None else\
+            (self.CONNECT_TIMEOUT, self.READ_TIMEOUT)
+        # Stage (connect, ttfb, download, parse or render): seconds spent in
+        # it for url_to_check, over every request attempt
+        self.timings = collections.Counter()
+        self.request_cnt = 0
+        self.response_bytes = 0
 
     @classmethod
-    def is_valid_url(cls, url_to_check):
+    def is_valid_url(cls, url_to_check, opt_quiet=False):
         """ Validate string for URL syntax.
 
         Assumes Top Level Domain (TLD) max length of 6 and nothing after TLD.
 
         :param url_to_check: URL from user input
+        :param opt_quiet: (Optional) True to not print the expected format
+            when invalid
         :return bool:  True if valid, False if not
         """
         if utils.is_non_empty_str(url_to_check):
-            # if re.match(r'[-a-zA-Z0-9@:%._\+~#=]{2,256}\.
-            #   [a-z]{2,6}\b([-a-zA-Z0-9@:%_\+.~#?&//=]*)', url_to_check):
-            # Above URL regex too permissive for my use but others may want to
-            # allow for multisite etc (if so additional testing needed).
-            if re.match(r'[-a-zA-Z0-9@:%._\+~#=]{2,256}\.[a-z]{2,6}$',\
-                url_to_check):
+            if cls._URL_PATTERN.match(url_to_check):
                 # OK
                 return True
             else:
-                print
-                print 'Expecting URL in format like www.google.com'
-                print 'Received: {}'.format(url_to_check)
+                if not opt_quiet:
+                    print
+                    print 'Expecting URL in format like www.google.com'
+                    print 'Received: {}'.format(url_to_check)
                 return False
 
     @classmethod
@@ -74,43 +156,166 @@ class SiteChecker:
             format(SiteChecker._MAX_RESULTS_TO_DISPLAY, SiteChecker.\
                 _MAX_RESULTS_TO_DISPLAY)
 
-    def process_url(self, url_to_check):
+    def fetch_url(self, url_to_check):
+        """ Get the checker site response for url_to_check from the cache, or
+        else by requesting the checker site, without printing anything, so
+        that it is safe to call from a worker thread.
+
+        :param url_to_check: URL from user input
+        :return results.CheckResult: Checker-specific child class instance,
+            or results.ErrorResult if the request or parsing failed
+        """
+        return self.read_cache(url_to_check) or self.request_url(url_to_check)
+
+    def read_cache(self, url_to_check):
+        """ Return the fetch_url() result for a fresh cached response for
+        url_to_check, or None if there is none (or no cache).
+
+        :param url_to_check: URL from user input
+        """
+        if self.cache is not None:
+            cached = self.cache.get(self.name, url_to_check, self.cache_ttl)
+            if cached is not None:
+                try:
+                    return self.__get_result(cached[0], cached[1],\
+                        url_to_check)
+                except:
+                    # Request the checker site again rather than keep
+                    # failing on a bad stored response
+                    pass
+        return None
+
+    def request_url(self, url_to_check):
+        """ Request the checker site for url_to_check, bypassing the cache
+        but storing the response in it once it has parsed successfully.
+
+        :param url_to_check: URL from user input
+        :return results.CheckResult: Same as fetch_url()
+        """
+        try:
+            (body, encoding) = self.__request_checker_url(self.base_url +\
+                url_to_check)
+            result = self.__get_result(body, encoding, url_to_check)
+        except:
+            return self.__get_error_result(url_to_check)
+        if self.cache is not None:
+            self.cache.put(self.name, url_to_check, body, encoding)
+        return result
+
+    @classmethod
+    def _parse_response(cls, body, encoding):
+        """ Return the checker site response body as a bs4.BeautifulSoup
+        object, or as a dict if the checker site answers in JSON.
+
+        JSON is decoded straight from the body, skipping HTML parsing and
+        character set detection.  HTML is parsed with the fastest installed
+        parser, and only the parts matched by _PARSE_ONLY (if set) are built
+        into the tree.
+
+        :param body: Response body, as bytes
+        :param encoding: Character encoding given by the checker site, or
+            None (HTML: let bs4 detect it; JSON: UTF-8)
+        """
+        if cls._RESPONSE_KIND == SiteChecker.RESPONSE_KIND_JSON:
+            return json.loads(body, encoding=encoding or 'utf-8')
+        import bs4
+        return bs4.BeautifulSoup(body, get_html_parser(),\
+            parse_only=bs4.SoupStrainer(cls._PARSE_ONLY) if\
+                cls._PARSE_ONLY is not None else None,\
+            from_encoding=encoding)
+
+    def __get_result(self, body, encoding, url_to_check):
+        """ Parse a checker site response body into a results.CheckResult.
+        """
+        start = time.time()
+        url_read_soup = self._parse_response(body, encoding)
+        try:
+            # Call child's implementation
+            return self.parse_results(url_read_soup, url_to_check)
+        finally:
+            if not isinstance(url_read_soup, dict):
+                # Free the tree now that the results are extracted
+                url_read_soup.decompose()
+            self.timings['parse'] += time.time() - start
+
+    def __get_error_result(self, url_to_check):
+        """ Return a results.ErrorResult for the exception that is currently
+        being handled.
+        """
+        from sitechecker import transport
+        exc_info = sys.exc_info()
+        return results.ErrorResult(self.name, url_to_check,\
+            error_type=utils.get_exception_name(exc_info),\
+            error=['URL: ' + self.base_url + url_to_check, ''] +\
+                utils.format_exception(exc_info),\
+            transient=transport.is_transient_error(exc_info[1]),\
+            retry_after=transport.get_retry_after(exc_info[1]))
+
+    def process_url(self, url_to_check, opt_result=None):
         """ Process URL by:
         - Passing url_to_check as URL parameter to checker site
-        (example: Google Page Insights).
-        - Displaying parsed results.
+        (example: Google Page Insights), unless opt_result is provided.
+        - Displaying parsed results (or what went wrong) as text.
 
         :param url_to_check: URL from user input
+        :param opt_result: (Optional) results.CheckResult previously returned
+            by fetch_url() for url_to_check
         """
         if utils.is_non_empty_str(url_to_check):
-            url_read_soup = self.__request_checker_url(self.base_url +\
-                url_to_check)
+            if opt_result is None:
+                opt_result = self.fetch_url(url_to_check)
 
-            # Call child's implementation
-            self.display_results(url_read_soup, url_to_check)
+            start = time.time()
+            if isinstance(opt_result, results.ErrorResult):
+                self._display_error(opt_result)
+            else:
+                # Call child's implementation
+                self.display_results(opt_result)
+            self.timings['render'] += time.time() - start
 
     def __request_checker_url(self, checker_url):
         """ HTTP Request the checker_url which includes the appended
         url_to_check from the user input and return the response as a
-        bs4.BeautifulSoup object
+        (body, encoding) tuple.  Exceptions are left to the caller.
+
+        Time spent opening the connection, waiting for the first byte of the
+        response (its headers) and downloading the body is added to
+        self.timings.
         """
         if utils.is_non_empty_str(checker_url):
             header_dict = {
                 'user-agent': 'Mozilla'
             }
+            import requests
+            from sitechecker import transport
+            # A session has the same request functions as the module
+            http = self.session if self.session is not None else requests
+            self.request_cnt += 1
+            transport.reset_connect_seconds()
+            start = time.time()
             try:
+                # Return once the headers are in, so the download is timed
+                # on its own
                 if self.get_or_post == 'POST':
-                    response = requests.post(checker_url, timeout=60,\
-                        headers=header_dict)
+                    response = http.post(checker_url, timeout=self.timeout,\
+                        headers=header_dict, stream=True)
                 else:
-                    response = requests.get(checker_url, timeout=60,\
-                        headers=header_dict)
-
-                response.raise_for_status()
-                return bs4.BeautifulSoup(response.text)
-            except:
-                utils.display_exception(opt_prepend='URL: ' + checker_url)
-                # Not reachable, so no return
+                    response = http.get(checker_url, timeout=self.timeout,\
+                        headers=header_dict, stream=True)
+            finally:
+                connect_seconds = transport.get_connect_seconds()
+                self.timings['connect'] += connect_seconds
+                self.timings['ttfb'] += time.time() - start - connect_seconds
+
+            start = time.time()
+            # Read the body before raising, so the connection goes back to
+            # the pool
+            body = response.content
+            self.timings['download'] += time.time() - start
+            self.response_bytes += len(body)
+
+            response.raise_for_status()
+            return (body, response.encoding)
 
     def _display_type_of_check_header(self):
         """ Print the user-friendly name of the checker (example: GOOGLE
@@ -122,299 +327,438 @@ class SiteChecker:
             /2) * ' ', self.name)
         print
 
+    def _display_error(self, error_result):
+        """ Print the checker header and what went wrong, in place of the
+        checker's results.
+
+        :param error_result: results.ErrorResult
+        """
+        self._display_type_of_check_header()
+        for line in error_result.error:
+            print line
+        print
+
+    def display_changes(self, changes):
+        """ Print the checker header and how its results changed since the
+        previous run.
+
+        :param changes: Dict of field name: change, from
+            history.get_changes()
+        """
+        self._display_type_of_check_header()
+        for field_name in sorted(changes.keys()):
+            change = changes[field_name]
+            print '{}:'.format(field_name)
+            if isinstance(change, dict) and 'added' in change:
+                for item in change['added']:
+                    print '+ {}'.format(self.__format_change_value(item))
+                for item in change['removed']:
+                    print '- {}'.format(self.__format_change_value(item))
+            elif isinstance(change, dict):
+                for key in sorted(change.keys()):
+                    print '{}: {} -> {}'.format(key,\
+                        self.__format_change_value(change[key][0]),\
+                        self.__format_change_value(change[key][1]))
+            else:
+                print '{} -> {}'.format(self.__format_change_value(change[0]),\
+                    self.__format_change_value(change[1]))
+        print
+
+    @classmethod
+    def __format_change_value(cls, value):
+        """ Return a result field value (or list item) as one line of text.
+        """
+        if isinstance(value, list):
+            return ', '.join([cls.__format_change_value(item) for item in\
+                value])
+        if isinstance(value, unicode):
+            return value.encode('utf-8')
+        return str(value)
+
     @abc.abstractmethod
-    def display_results(self, url_read_soup, url_to_check):
+    def parse_results(self, url_read_soup, url_to_check):
         """ Override with checker-specific HTTP response parsing.
 
-        Print parsed results from checker site.
+        Return the parsed results from checker site.
 
         :param url_read_soup: bs4.BeautifulSoup object created by requesting
-            checker site URL
-        :param url_to_check: (Optional) URL from user input that was passed
-            checker site for checking
+            checker site URL (a dict instead if the checker site answers in
+            JSON)
+        :param url_to_check: URL from user input that was passed checker site
+            for checking
+        :return results.CheckResult: Checker-specific child class instance
         """
         pass
 
+    @abc.abstractmethod
+    def display_results(self, result):
+        """ Override with checker-specific text output.
+
+        Print parsed results from checker site.
+
+        :param result: results.CheckResult returned by parse_results()
+        """
+        pass
+
+
+def _get_tag_classes(attrs):
+    """ Return the list of CSS classes in a tag's attributes, which bs4 may
+    hold either as a str or as a list while parsing.
+    """
+    classes = attrs.get('class') or []
+    return classes.split() if isinstance(classes, basestring) else classes
+
+
+def _is_wot_result_tag(name, attrs):
+    """ Return True for the tags WotChecker.parse_results() reads: the
+    server location (id="country") and the reputation components
+    (div class="rep-comp").
+    """
+    return attrs.get('id') == 'country' or\
+        (name == 'div' and 'rep-comp' in _get_tag_classes(attrs))
+
+
+def _is_sucuri_result_tag(name, attrs):
+    """ Return True for the tags SucuriChecker.parse_results() reads: the
+    scan findings tables and the site details panel.
+    """
+    return attrs.get('id') == 'sitecheck-details' or\
+        (name == 'table' and 'scan-findings' in _get_tag_classes(attrs))
+
+
+def _get_string(tag):
+    """ Return the bs4 .string of tag as unicode (None if it has none), so
+    that results do not keep references into the parsed tree.
+    """
+    return unicode(tag.string) if tag.string is not None else None
+
 
 class WotChecker(SiteChecker):
     """ Extend SiteChecker for WOT-specific processing.
     """
-
-    def display_results(self, url_read_soup, url_to_check=None):
-        """ Override SiteChecker.display_results() with WOT-specific HTTP
+    NAME = 'WOT SCORECARD'
+    BASE_URL = 'https://www.mywot.com/en/scorecard/'
+    MAX_CONCURRENT_REQUESTS = 4
+    REQUESTS_PER_SECOND = 2
+    REQUEST_BURST = 4
+    READ_TIMEOUT = 30
+    _PARSE_ONLY = staticmethod(_is_wot_result_tag)
+
+    def parse_results(self, url_read_soup, url_to_check=None):
+        """ Override SiteChecker.parse_results() with WOT-specific HTTP
         response parsing.
 
-        Print parsed WOT results.
-
         :param url_read_soup: bs4.BeautifulSoup object created by requesting
             WOT scorecard URL
-        :param url_to_check: None (not needed here)
+        :param url_to_check: URL from user input
+        :return results.WotResult:
+        """
+        country = url_read_soup.find(id='country')
+        return results.WotResult(self.name, url_to_check,\
+            server_location=country['alt'],\
+            reputation=[items.get_text(': ', strip=True) for items in\
+                url_read_soup('div', {'class': 'rep-comp'})])
+
+    def display_results(self, result):
+        """ Override SiteChecker.display_results() with WOT-specific text
+        output.
+
+        Print parsed WOT results.
+
+        :param result: results.WotResult
         """
         self._display_type_of_check_header()
-        if url_read_soup is not None:
-            try:
-                country = url_read_soup.find(id='country')
-                print 'Server location: {}'.format(country['alt'])
+        if result is not None:
+            print 'Server location: {}'.format(result.server_location)
 
-                for items in url_read_soup('div', {'class': 'rep-comp'}):
-                    print items.get_text(': ', strip=True)
-            except:
-                utils.display_exception()
+            for items in result.reputation:
+                print items
         print
 
 
 class SucuriChecker(SiteChecker):
     """ Extend SiteChecker for Sucuri-specific processing.
     """
-
-    def display_results(self, url_read_soup, url_to_check):
-        """ Override SiteChecker.display_results() with Sucuri site
+    NAME = 'SUCURI SECURITY SITE CHECK'
+    BASE_URL = 'https://sitecheck.sucuri.net/results/'
+    GET_OR_POST = 'POST'
+    MAX_CONCURRENT_REQUESTS = 2
+    REQUESTS_PER_SECOND = 0.5
+    REQUEST_BURST = 2
+    CACHE_TTL = 21600
+    _PARSE_ONLY = staticmethod(_is_sucuri_result_tag)
+
+    def parse_results(self, url_read_soup, url_to_check):
+        """ Override SiteChecker.parse_results() with Sucuri site
         check-specific HTTP response parsing.
 
-        Prints parsed Sucuri results.
-
         :param url_read_soup: bs4.BeautifulSoup object created by requesting
             Sucuri SiteChecker URL
         :param url_to_check: URL from user input that was passed to Sucuri for
             checking
+        :return results.SucuriResult:
+        """
+        scan_findings = []
+        for trs in url_read_soup('table',\
+            {'class': 'table scan-findings'})[0].tbody('tr'):
+            tds = trs('td')
+            scan_findings.append([_get_string(tds[0]), _get_string(tds[1]),\
+                _get_string(tds[2])])
+
+        blacklist = []
+        for trs in url_read_soup('table',\
+            {'class': 'table scan-findings'})[1].tbody('tr'):
+            tds = trs('td')
+            blacklist.append(_get_string(tds[0]))
+
+        details_panel = url_read_soup.find(id='sitecheck-details')
+        collapse_one = details_panel.find(id='collapseOne')
+        # It is not sufficient to .strip collapse_one get_text, so will
+        # split on the new lines and strip individually, and then omit
+        # anything left that is empty.  Troublemakers.
+        details = [line.strip() for line in\
+            collapse_one.get_text().strip().splitlines() if line.strip() != '']
+
+        links = []
+        collapse_two = details_panel.find(id='collapseTwo')
+        if collapse_two is not None:
+            for line in collapse_two.get_text().strip().splitlines():
+                if line.startswith('http')\
+                    and not line.replace('http://', '').\
+                        replace('https://', '').\
+                        replace('www.', '').\
+                        startswith(url_to_check.replace('www.', '')):
+                    links.append(line)
+
+        scripts = []
+        collapse_three = details_panel.find(id='collapseThree')
+        if collapse_three is not None:
+            scripts = collapse_three.get_text().strip().splitlines()
+
+        return results.SucuriResult(self.name, url_to_check,\
+            scan_findings=scan_findings, blacklist=blacklist,\
+            details=details, links=links, scripts=scripts)
+
+    def display_results(self, result):
+        """ Override SiteChecker.display_results() with Sucuri site
+        check-specific text output.
+
+        Prints parsed Sucuri results.
+
+        :param result: results.SucuriResult
         """
         self._display_type_of_check_header()
-        if url_read_soup is not None:
-            try:
-                print 'Scan Results:'
-                for trs in url_read_soup('table',\
-                    {'class': 'table scan-findings'})[0].tbody('tr'):
-                    tds = trs('td')
-                    print '{}: {} ({})'.format(tds[0].string,\
-                        tds[1].string, tds[2].string)
-
-                print
-                print 'Blacklist Results:'
-                for trs in url_read_soup('table',\
-                    {'class': 'table scan-findings'})[1].tbody('tr'):
-                    tds = trs('td')
-                    print '{}'.format(tds[0].string)
-
-                print
-                print 'Website Details:'
-                details_panel = url_read_soup.find(id='sitecheck-details')
-                collapse_one = details_panel.find(id='collapseOne')
-                # It is not sufficient to .strip collapse_one get_text, so will
-                # split on the new lines and strip individually, and then omit
-                # anything left that is empty.  Troublemakers.
-                collapse_one_lines = \
-                    collapse_one.get_text().strip().splitlines()
-                for line in collapse_one_lines:
-                    if line.strip() != '':
-                        print line.strip()
-
-                print
-                print 'List of Links Found to Other Domains or Sub Domains:'
-                collapse_two = details_panel.find(id='collapseTwo')
-                if collapse_two is not None:
-                    collapse_two_lines = \
-                        collapse_two.get_text().strip().splitlines()
-                    line_cnt = 0
-                    for line in collapse_two_lines:
-                        if line.startswith('http')\
-                            and not line.replace('http://', '').\
-                                replace('https://', '').\
-                                replace('www.', '').\
-                                startswith(url_to_check.replace('www.', '')):
-                            line_cnt += 1
-                            if line_cnt < SiteChecker._MAX_RESULTS_TO_DISPLAY:
-                                print line
-                            else:
-                                SiteChecker._display_max_results_exceeded()
-                                break
-
-                print
-                print 'List of Scripts Included:'
-                collapse_three = details_panel.find(id='collapseThree')
-                if collapse_three is not None:
-                    collapse_three_lines = collapse_three.get_text().strip().\
-                        splitlines()
-                    line_cnt = 0
-                    for line in collapse_three_lines:
-                        line_cnt += 1
-                        if line_cnt < SiteChecker._MAX_RESULTS_TO_DISPLAY:
-                            print line
-                        else:
-                            SiteChecker._display_max_results_exceeded()
-                            break
-            except:
-                utils.display_exception()
+        if result is not None:
+            print 'Scan Results:'
+            for finding in result.scan_findings:
+                print '{}: {} ({})'.format(finding[0], finding[1], finding[2])
+
+            print
+            print 'Blacklist Results:'
+            for blacklist_item in result.blacklist:
+                print '{}'.format(blacklist_item)
+
+            print
+            print 'Website Details:'
+            for line in result.details:
+                print line
+
+            print
+            print 'List of Links Found to Other Domains or Sub Domains:'
+            line_cnt = 0
+            for line in result.links:
+                line_cnt += 1
+                if line_cnt < SiteChecker._MAX_RESULTS_TO_DISPLAY:
+                    print line
+                else:
+                    SiteChecker._display_max_results_exceeded()
+                    break
+
+            print
+            print 'List of Scripts Included:'
+            line_cnt = 0
+            for line in result.scripts:
+                line_cnt += 1
+                if line_cnt < SiteChecker._MAX_RESULTS_TO_DISPLAY:
+                    print line
+                else:
+                    SiteChecker._display_max_results_exceeded()
+                    break
         print
 
 
 class GoogleChecker(SiteChecker):
     """ Extend SiteChecker for Google-specific processing.
     """
+    NAME = 'GOOGLE PAGESPEED INSIGHTS'
+    BASE_URL = 'https://www.googleapis.com/pagespeedonline/v1/runPagespeed?'\
+        'url=http://'
+    MAX_CONCURRENT_REQUESTS = 4
+    REQUEST_BURST = 4
+    # PageSpeed loads the whole page before it answers
+    READ_TIMEOUT = 90
+    HEDGE_DELAY = 30
+    _RESPONSE_KIND = SiteChecker.RESPONSE_KIND_JSON
+
+    def parse_results(self, soup_dict, url_to_check=None):
+        """ Override SiteChecker.parse_results() with Google-specific
+        HTTP response parsing.
 
-    def display_results(self, url_read_soup, url_to_check=None):
+        :param soup_dict: dict decoded from the JSON response to requesting
+            Google PageSpeed Insights URL
+        :param url_to_check: URL from user input
+        :return results.GoogleResult:
+        """
+        rule_results = soup_dict['formattedResults']['ruleResults']
+        return results.GoogleResult(self.name, url_to_check,\
+            score=soup_dict['score'], page_stats=soup_dict['pageStats'],\
+            rules=[[rule_results[i]['localizedRuleName'],\
+                rule_results[i]['ruleImpact']] for i in rule_results])
+
+    def display_results(self, result):
         """ Override SiteChecker.display_results() with Google-specific
-        HTTP response parsing.
+        text output.
 
         Print parsed Google results.
 
-        :param url_read_soup: bs4.BeautifulSoup object created by requesting
-            Google PageSpeed Insights URL
-        :param url_to_check: None (not needed here)
+        :param result: results.GoogleResult
         """
         self._display_type_of_check_header()
-        if url_read_soup is not None:
-            try:
-                soup_dict = json.loads(str(url_read_soup))
-            except:
-                utils.display_exception(opt_prepend='Unexpected response '\
-                    'or invalid JSON response.')
-
-            try:
-                print 'PageSpeed score: {} / 100'.format(soup_dict['score'])
-
-                print
-                print 'Page stats:'
-                for key, value in soup_dict['pageStats'].items():
-                    print '{}: {}'.format(key, value)
-
-                print
-                print 'Rules negatively impacting score:'
-                for i in soup_dict['formattedResults']['ruleResults']:
-                    print '{}: {}'.format(soup_dict['formattedResults']\
-                        ['ruleResults'][i]['localizedRuleName'],\
-                        soup_dict['formattedResults']['ruleResults'][i]\
-                        ['ruleImpact'])
-            except:
-                utils.display_exception()
+        if result is not None:
+            print 'PageSpeed score: {} / 100'.format(result.score)
+
+            print
+            print 'Page stats:'
+            for key, value in result.page_stats.items():
+                print '{}: {}'.format(key, value)
+
+            print
+            print 'Rules negatively impacting score:'
+            for rule in result.rules:
+                print '{}: {}'.format(rule[0], rule[1])
         print
 
 
 class W3MarkupChecker(SiteChecker):
     """ Extend SiteChecker for W3 Markup Validation-specific processing.
     """
+    NAME = 'W3 MARKUP VALIDATION'
+    BASE_URL = 'http://validator.w3.org/check?output=json&uri=http%3A%2F%2F'
+    # See github issue #3
+    ENABLED_BY_DEFAULT = False
+    _RESPONSE_KIND = SiteChecker.RESPONSE_KIND_JSON
+
+    def parse_results(self, soup_dict, url_to_check=None):
+        """ Override SiteChecker.parse_results() with W3 Markup
+        Validation-specific HTTP response parsing.
 
-    def display_results(self, url_read_soup, url_to_check=None):
+        :param soup_dict: dict decoded from the JSON response to requesting
+            W3 Markup Validation URL
+        :param url_to_check: URL from user input
+        :return results.W3MarkupResult:
+        """
+        messages = []
+        for i in soup_dict['messages']:
+            if i['message'] != 'This interface to HTML5 document checking '\
+                    'is deprecated.':
+                messages.append([i['type'], i.get('lastLine', ''),\
+                    i.get('lastColumn', ''), i['message']])
+
+        # The first markup error is a generic one so don't count it if
+        # presented
+        return results.W3MarkupResult(self.name, url_to_check,\
+            error_count=len(soup_dict['messages'])-1 \
+                if len(soup_dict['messages']) > 0 else 0,\
+            messages=messages)
+
+    def display_results(self, result):
         """ Override SiteChecker.display_results() with W3 Markup
-        Validation-specific HTTP response parsing.
+        Validation-specific text output.
 
         Print parsed W3 Markup Validation results.
 
-        :param url_read_soup: bs4.BeautifulSoup object created by requesting W3
-            Markup Validation URL
-        :param url_to_check: None (not needed here)
+        :param result: results.W3MarkupResult
         """
         self._display_type_of_check_header()
-        if url_read_soup is not None:
-            # Strip the "explanation" key/value, which we don't need and often
-            # causes the JSON to be invalid and thus unable to be loaded
-            url_read_soup_str = str(url_read_soup)
-            url_read_soup_str = re.sub('"explanation":.+', '',\
-                url_read_soup_str)
-
-            soup_dict = {}
-            try:
-                soup_dict = json.loads(url_read_soup_str)
-            except:
-                utils.display_exception(opt_prepend='Unexpected response '\
-                    'or invalid JSON response.')
-
-            try:
-                # The first markup error is a generic one so don't count it if
-                # presented
-                print 'errorcount: {}'.format(len(soup_dict['messages'])-1 \
-                    if len(soup_dict['messages']) > 0 else 0)
-                print
-
-                err_cnt = 0
-                message = ''
-                last_line = ''
-                last_column = ''
-                for i in soup_dict['messages']:
-                    message = i['message']
-                    if len(message) > SiteChecker._MAX_MSG_LENGTH:
-                        message = '{} ...'.format(message[:SiteChecker.\
-                            _MAX_MSG_LENGTH])
-                    if message != 'This interface to HTML5 document checking '\
-                            'is deprecated.':
-                        err_cnt += 1
-                        if err_cnt <= SiteChecker._MAX_RESULTS_TO_DISPLAY:
-                            last_line = i['lastLine'] if 'lastLine' in \
-                                i.keys() else ''
-                            last_column = i['lastLine'] if 'lastColumn' in \
-                                i.keys() else ''
-                            print '({}) Line {}: Column {}.  {}'.\
-                                format(i['type'], last_line, last_column, \
-                                    message)
-                        else:
-                            SiteChecker._display_max_results_exceeded()
-                            break
-            except:
-                utils.display_exception()
+        if result is not None:
+            print 'errorcount: {}'.format(result.error_count)
+            print
+
+            err_cnt = 0
+            message = ''
+            for (message_type, last_line, last_column, message) in\
+                result.messages:
+                if len(message) > SiteChecker._MAX_MSG_LENGTH:
+                    message = '{} ...'.format(message[:SiteChecker.\
+                        _MAX_MSG_LENGTH])
+                err_cnt += 1
+                if err_cnt <= SiteChecker._MAX_RESULTS_TO_DISPLAY:
+                    print '({}) Line {}: Column {}.  {}'.\
+                        format(message_type, last_line, last_column, message)
+                else:
+                    SiteChecker._display_max_results_exceeded()
+                    break
         print
 
 
 class W3CssChecker(SiteChecker):
     """ Extend SiteChecker for W3 CSS Validation-specific processing.
     """
+    NAME = 'W3 CSS3 VALIDATION'
+    BASE_URL = 'http://jigsaw.w3.org/css-validator/validator?output=json&uri='
+    MAX_CONCURRENT_REQUESTS = 2
+    _RESPONSE_KIND = SiteChecker.RESPONSE_KIND_JSON
 
-    def display_results(self, url_read_soup, url_to_check=None):
-        """ Override SiteChecker.display_results() with W3 CSS
+    def parse_results(self, soup_dict, url_to_check=None):
+        """ Override SiteChecker.parse_results() with W3 CSS
         Validation-specific HTTP response parsing.
 
+        :param soup_dict: dict decoded from the JSON response to requesting
+            W3 CSS Validation URL
+        :param url_to_check: URL from user input
+        :return results.W3CssResult:
+        """
+        counts = soup_dict['cssvalidation']['result']
+        errors = []
+        if any(value > 0 for value in counts.values()):
+            errors = [[i['source'], i.get('line', ''), i['message']] for i in\
+                soup_dict['cssvalidation']['errors']]
+        return results.W3CssResult(self.name, url_to_check, counts=counts,\
+            errors=errors)
+
+    def display_results(self, result):
+        """ Override SiteChecker.display_results() with W3 CSS
+        Validation-specific text output.
+
         Print parsed W3 CSS Validation results
 
-        :param url_read_soup: bs4.BeautifulSoup object created by requesting W3
-            CSS Validation URL
-        :param url_to_check: None (not needed here)
+        :param result: results.W3CssResult
         """
         self._display_type_of_check_header()
-        if url_read_soup is not None:
-            soup_dict = {}
-            try:
-                soup_dict = json.loads(str(url_read_soup))
-            except:
-                utils.display_exception(opt_prepend='Unexpected response '\
-                    'or invalid JSON response.')
-
-            try:
-                err_or_warning = False
-                print
-                for key, value in soup_dict['cssvalidation']['result'].items():
-                    if value > 0:
-                        err_or_warning = True
-                    print '{}: {}'.format(key, value)
-                print
-
-                if err_or_warning:
-                    err_cnt = 0
-                    source = ''
-                    message = ''
-                    line = ''
-                    last_source = ''
-                    source = ''
-                    for i in soup_dict['cssvalidation']['errors']:
-                        err_cnt += 1
-                        if err_cnt <= SiteChecker._MAX_RESULTS_TO_DISPLAY:
-                            source = i['source']
-                            if source != last_source:
-                                if err_cnt != 1:
-                                    print
-                                print 'Source: {}'.format(source)
-
-                            message = i['message']
-                            if len(message) > SiteChecker._MAX_MSG_LENGTH:
-                                message = '{} ...'.\
-                                    format(message[:SiteChecker.\
-                                        _MAX_MSG_LENGTH])
-
-                            line = i['line'] if 'line' in i.keys() else ''
-                            print '(error) Line {}.  {}'.format(line, message)
-                            last_source = source
-                        else:
-                            SiteChecker._display_max_results_exceeded()
-                            break
-            except:
-                utils.display_exception()
-        print
+        if result is not None:
+            print
+            for key, value in result.counts.items():
+                print '{}: {}'.format(key, value)
+            print
+
+            err_cnt = 0
+            message = ''
+            last_source = ''
+            for (source, line, message) in result.errors:
+                err_cnt += 1
+                if err_cnt <= SiteChecker._MAX_RESULTS_TO_DISPLAY:
+                    if source != last_source:
+                        if err_cnt != 1:
+                            print
+                        print 'Source: {}'.format(source)
 
+                    if len(message) > SiteChecker._MAX_MSG_LENGTH:
+                        message = '{} ...'.\
+                            format(message[:SiteChecker._MAX_MSG_LENGTH])
 
+                    print '(error) Line {}.  {}'.format(line, message)
+                    last_source = source
+                else:
+                    SiteChecker._display_max_results_exceeded()
+                    break
+        print
@@ -0,0 +1,700 @@
+""" Contains BatchEngine class
+"""
+import collections
+import copy
+import Queue
+import sys
+import threading
+import time
+import urlparse
+
+from sitechecker import checker, inputs, ratelimit, results, stats, utils
+
+
+DEFAULT_MAX_RETRIES = 3
+
+# Error type of the results of the checks given up at a URL's deadline
+DEADLINE_ERROR_TYPE = 'DeadlineExceeded'
+
+# Percentile of a checker's observed request latency after which a hedged
+# request is sent
+HEDGE_PERCENTILE = 95
+
+# Latencies of the most recent requests kept per checker, and the fewest
+# observed before hedging its requests at their HEDGE_PERCENTILE (instead of
+# at the checker's configured hedge delay)
+_MAX_LATENCY_SAMPLES = 200
+_MIN_LATENCY_SAMPLES = 20
+
+
+class UrlTask(object):
+    """ Encapsulate the checks requested for one URL from user input.
+
+    The results are filled in by the engine's worker threads in any order;
+    the task is done once every checker has a result, or once its deadline
+    has passed and the checks still outstanding are given up (see expire()).
+    The deadline runs from the start of the URL's first check (see
+    start_deadline()), so time spent queued behind other URLs does not
+    count against it.
+    """
+
+    def __init__(self, url_to_check, temp_checkers, is_valid=True,\
+        opt_deadline_seconds=None, opt_on_expire=None):
+        """ Initialize an instance of the class.
+
+        :param url_to_check: URL from user input
+        :param temp_checkers: List of checker.SiteChecker child class
+            instances, in the order their results are to be displayed
+        :param is_valid: False if url_to_check failed URL validation (no
+            checks will be run for it)
+        :param opt_deadline_seconds: (Optional) Seconds from the start of
+            the first check by which the checks are to be complete (default:
+            no deadline)
+        :param opt_on_expire: (Optional) Function called once with the list
+            of the names of the checkers given up by expire(), if any
+        """
+        self.url_to_check = url_to_check
+        self.checkers = temp_checkers
+        self.is_valid = is_valid
+        self.deadline_seconds = opt_deadline_seconds
+        # Unix time by which the checks are to be complete, once the first
+        # has started
+        self.deadline = None
+        self.__on_expire = opt_on_expire
+        self.result_list = [None] * len(temp_checkers)
+        self.__remaining = len(temp_checkers) if is_valid else 0
+        self.__lock = threading.Lock()
+        self.__done = threading.Event()
+        if self.__remaining == 0:
+            self.__done.set()
+
+    def set_result(self, index, result):
+        """ Store the result for the checker at index, and return True; or
+        return False, dropping the result, if the check was given up at the
+        deadline.
+
+        :param index: Position of the checker in self.checkers
+        :param result: results.CheckResult (results.ErrorResult if the check
+            failed)
+        """
+        with self.__lock:
+            if self.result_list[index] is not None:
+                return False
+            self.result_list[index] = result
+            self.__remaining -= 1
+            if self.__remaining == 0:
+                self.__done.set()
+            return True
+
+    def start_deadline(self):
+        """ Start the deadline, unless it is already running (or there is
+        none).  Called by a worker thread as it starts one of the checks.
+        """
+        with self.__lock:
+            if self.deadline_seconds is not None and self.deadline is None:
+                self.deadline = time.time() + self.deadline_seconds
+
+    def is_expired(self):
+        """ Return True if the task's deadline is running and has passed.
+        """
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def is_done(self):
+        """ Return True if every checker for the URL has a result, or the
+        deadline has passed (wait() then returns at once).
+        """
+        return self.__done.is_set() or self.is_expired()
+
+    def wait(self):
+        """ Block until every checker for the URL has a result, or until the
+        deadline, then expire() the checks still outstanding.
+        """
+        # Wait in slices so that Ctrl-C is still delivered to the main thread
+        while not self.__done.is_set():
+            if self.is_expired():
+                self.expire()
+            elif self.deadline is not None:
+                self.__done.wait(min(1, self.deadline - time.time()))
+            elif self.deadline_seconds is not None:
+                # A deadline started meanwhile ends no sooner than this
+                self.__done.wait(min(1, self.deadline_seconds))
+            else:
+                self.__done.wait(1)
+
+    def expire(self):
+        """ Give up the checks still outstanding: each gets a
+        results.ErrorResult of DEADLINE_ERROR_TYPE, and the task is done.
+        Their requests cannot be stopped once sent; what they return later
+        is dropped (see set_result()).
+        """
+        with self.__lock:
+            if self.__done.is_set():
+                return
+            expired_names = []
+            for (index, temp_checker) in enumerate(self.checkers):
+                if self.result_list[index] is None:
+                    self.result_list[index] = results.ErrorResult(\
+                        temp_checker.name, self.url_to_check,\
+                        error_type=DEADLINE_ERROR_TYPE,\
+                        error=['URL: ' + temp_checker.base_url +\
+                            self.url_to_check, '', 'Gave up: no result by '\
+                                'the deadline for the URL'],\
+                        transient=True, retry_after=None)
+                    expired_names.append(temp_checker.name)
+            self.__remaining = 0
+            self.__done.set()
+        if self.__on_expire is not None:
+            self.__on_expire(expired_names)
+
+
+class SharedUrlTask(UrlTask):
+    """ Encapsulate a URL from user input whose checks are shared with an
+    equivalent URL already in flight (see inputs.canonicalize_url()), instead
+    of being run again.
+
+    The task is done when the shared task is, and its results are then
+    copies of the shared task's results for this URL.
+    """
+
+    def __init__(self, url_to_check, temp_checkers, shared_task):
+        """ Initialize an instance of the class.
+
+        :param url_to_check: URL from user input
+        :param temp_checkers: List of checker.SiteChecker child class
+            instances to display the results with (they run no checks)
+        :param shared_task: UrlTask running the checks for an equivalent URL
+        """
+        UrlTask.__init__(self, url_to_check, temp_checkers)
+        self.shared_task = shared_task
+
+    def is_done(self):
+        """ Return True if every checker for the equivalent URL has a result.
+        """
+        return self.shared_task.is_done()
+
+    def wait(self):
+        """ Block until every checker for the equivalent URL has a result,
+        then take a copy of each result for this URL.
+        """
+        self.shared_task.wait()
+        if None in self.result_list:
+            self.result_list = [result.with_url(self.url_to_check) for\
+                result in self.shared_task.result_list]
+
+
+class BatchEngine(object):
+    """ Run the checks for many URLs with many requests in flight at once.
+
+    A pool of worker threads processes (URL, checker) jobs.  Each checker
+    service (host) is additionally capped at its own number of concurrent
+    requests and held to its own requests per second budget, so that a big
+    pool does not flood any one provider.  Requests to a host share a pool of
+    keep-alive connections sized to that cap.  Transient failures are retried
+    with capped exponential backoff; other failures become error results for
+    their (URL, checker) only, and the run goes on.  Completed
+    URLs are handed back in input order, so the report layout does not depend
+    on which provider answers first.
+
+    With a deadline, a URL is handed back once its deadline passes even if
+    some checks are outstanding; those are marked as timed out.  With
+    hedging, a GET request that has not answered within its checker's
+    observed p95 latency is sent once more, and the first answer is used.
+    """
+
+    def __init__(self, checker_dict, num_of_threads, opt_cache=None,\
+        opt_cache_ttl=None, opt_max_retries=DEFAULT_MAX_RETRIES,\
+        opt_journal=None, opt_cassette=None, opt_deadline=None,\
+        opt_hedge=False):
+        """ Initialize an instance of the class.
+
+        :param checker_dict: Dict of checker definitions, in the format of
+            registry.get_checker_dict()
+        :param num_of_threads: Number of worker threads (i.e. the maximum
+            number of requests in flight over all checker services)
+        :param opt_cache: (Optional) A cache.ResponseCache shared by all
+            checkers
+        :param opt_cache_ttl: (Optional) Cache time to live in seconds for
+            every checker, instead of the checker's own from checker_dict
+        :param opt_max_retries: (Optional) Number of times a check is retried
+            after a transient failure
+        :param opt_journal: (Optional) A journal.Journal to skip the checks
+            already completed in, and to record completed checks in
+        :param opt_cassette: (Optional) A cassette.Cassette to replay checker
+            site responses from, or to record them in
+        :param opt_deadline: (Optional) Seconds from the start of a URL's
+            first check after which its outstanding checks are given up
+            (default: none)
+        :param opt_hedge: (Optional) True to hedge slow GET requests
+        """
+        self.checker_dict = checker_dict
+        self.num_of_threads = num_of_threads
+        self.cache = opt_cache
+        self.cache_ttl = opt_cache_ttl
+        self.max_retries = opt_max_retries
+        self.journal = opt_journal
+        self.deadline = opt_deadline
+        self.hedge = opt_hedge
+        self.retry_cnt = 0
+        # Requests not sent because an equivalent URL in flight had its checks
+        # requested from the checker sites (not from the cache or journal)
+        self.coalesced_cnt = 0
+        # Requests sent a second time because the first was slow
+        self.hedged_cnt = 0
+        # (checker name, error type): number of failed checks, including
+        # those given up at the deadline
+        self.failure_cnts = collections.Counter()
+        self.__cnt_lock = threading.Lock()
+        # Checker name: latencies of its most recent answered requests
+        self.__latencies = {}
+        # Checker name: seconds to hedge after, until enough latencies
+        self.__hedge_delays = dict([(definition.name, definition.hedge_delay)\
+            for definition in checker_dict.values()])
+        self.url_cnt = 0
+        self.start_time = None
+        self.end_time = None
+        self.__job_queue = Queue.Queue()
+        self.__workers = []
+        self.__host_semaphores = {}
+        self.__stopping = threading.Event()
+        self.rate_limiter = ratelimit.HostRateLimiter()
+        # Imported here, as it imports requests (see checker.py)
+        from sitechecker import transport
+        self.session_pool = transport.SessionPool(opt_cassette=opt_cassette)
+
+        for i in sorted(checker_dict.keys()):
+            definition = checker_dict[i]
+            host = urlparse.urlparse(definition.base_url).netloc
+            if host not in self.__host_semaphores:
+                self.__host_semaphores[host] = threading.BoundedSemaphore(\
+                    definition.max_concurrent_requests)
+            self.session_pool.add_host(definition.base_url,\
+                definition.max_concurrent_requests)
+            # Replayed responses cost the provider nothing, so they are not
+            # held to its rate limit
+            if opt_cassette is None or opt_cassette.record:
+                self.rate_limiter.add_host(definition.base_url,\
+                    definition.requests_per_second, definition.request_burst)
+
+    def run(self, urls_to_check):
+        """ Check every URL and yield a UrlTask per URL, in input order, once
+        all of its checks have completed.
+
+        Checking stops at the first URL that fails validation; that URL is
+        yielded (with is_valid False) after the URLs before it.  Checking
+        also stops, once the URLs in flight are complete, after stop() is
+        called.
+
+        A URL equivalent to one in flight (example: www.example.com after
+        example.com) shares its checks instead of running them again.
+
+        :param urls_to_check: Iterable of URLs from user input.  An input
+            that may have no URL ready for a while (example: a queue filled
+            by another process) can yield None meanwhile, so that the URLs
+            already complete are still handed back
+        """
+        # Bound the URLs in flight so that results are displayed as they
+        # complete and memory use does not grow with the input size
+        max_pending = self.num_of_threads * 2
+        pending = collections.deque()
+        # Canonical URL: UrlTask running its checks, until handed back
+        in_flight = {}
+        self.start()
+        try:
+            for url_item in urls_to_check:
+                if self.__stopping.is_set():
+                    break
+
+                # Hand back what is already complete without waiting, then
+                # wait only if too many URLs are in flight
+                while pending and (pending[0].is_done() or\
+                    len(pending) >= max_pending):
+                    yield self.__complete(pending.popleft(), in_flight)
+
+                if url_item is None:
+                    continue
+                task = self.__submit_or_share(url_item, in_flight)
+                pending.append(task)
+                if not task.is_valid:
+                    break
+
+            while len(pending) > 1:
+                yield self.__complete(pending.popleft(), in_flight)
+
+            # Let the idle workers exit before the last URL is handed back,
+            # as the caller may exit the script while processing it
+            last_task = self.__complete(pending.popleft(), in_flight) if\
+                pending else None
+            self.__stop_workers(opt_wait=True)
+            if last_task is not None:
+                yield last_task
+        finally:
+            # Workers still fetching (example: the script is exiting on an
+            # error) are left to finish on their own
+            self.finish()
+
+    def start(self):
+        """ Reset the run counters and start the worker threads, to check the
+        URLs handed to submit().  run() does this itself.
+        """
+        self.url_cnt = 0
+        self.retry_cnt = 0
+        self.coalesced_cnt = 0
+        self.hedged_cnt = 0
+        self.failure_cnts.clear()
+        self.__stopping.clear()
+        self.start_time = time.time()
+        self.end_time = None
+        self.__start_workers()
+
+    def submit(self, url_item):
+        """ Create the UrlTask for url_item and queue a job per checker; the
+        task is done once the worker threads have run every check.  Safe to
+        call from several threads at once, between start() and finish().
+
+        :param url_item: URL from user input
+        """
+        if not checker.SiteChecker.is_valid_url(url_item, opt_quiet=True):
+            return UrlTask(url_item, [], is_valid=False)
+
+        # In checker_dict key order
+        temp_checkers = [self.get_checker(i) for i in\
+            sorted(self.checker_dict.keys())]
+
+        task = UrlTask(url_item, temp_checkers,\
+            opt_deadline_seconds=self.deadline,\
+            opt_on_expire=self.__count_expired)
+        for index in range(len(temp_checkers)):
+            result = self.journal.get(url_item, temp_checkers[index].name)\
+                if self.journal is not None else None
+            if result is not None:
+                # Completed by an earlier run
+                task.set_result(index, result)
+            else:
+                self.__job_queue.put((task, index))
+        with self.__cnt_lock:
+            self.url_cnt += 1
+        return task
+
+    def finish(self, opt_wait=False):
+        """ Tell the worker threads started by start() to exit once they
+        finish their current job, and end the run.
+
+        :param opt_wait: (Optional) True to wait for the worker threads to
+            exit
+        """
+        self.__stop_workers(opt_wait=opt_wait)
+        self.end_time = time.time()
+
+    def stop(self):
+        """ Stop starting the checks for new URLs; run() ends once the URLs
+        already in flight are complete.  Safe to call from a signal handler.
+        """
+        self.__stopping.set()
+
+    def get_urls_per_sec(self):
+        """ Return the number of URLs checked per second during the last run.
+        """
+        elapsed = (self.end_time or time.time()) - self.start_time
+        return self.url_cnt / elapsed if elapsed > 0 else 0.0
+
+    def get_checker(self, checker_key):
+        """ Return a new instance of the checker.SiteChecker child class for
+        checker_key, using the engine's sessions and cache.
+
+        :param checker_key: Key of the checker in checker_dict
+        """
+        definition = self.checker_dict[checker_key]
+        return definition.get_checker(\
+            opt_session=self.session_pool.get_session(definition.base_url),\
+            opt_cache=self.cache, opt_cache_ttl=definition.cache_ttl if\
+                self.cache_ttl is None else self.cache_ttl,\
+            opt_timeout=(definition.connect_timeout, definition.read_timeout))
+
+    def check(self, temp_checker, url_to_check, opt_deadline=None):
+        """ Run one check on the calling thread and return its result
+        (results.ErrorResult if it failed): from the cache if fresh, else by
+        requesting the checker site within its host's limits, retrying
+        transient failures.  The result is recorded in the journal, if any.
+
+        :param temp_checker: checker.SiteChecker child class instance from
+            get_checker()
+        :param url_to_check: URL from user input
+        :param opt_deadline: (Optional) Unix time after which no request is
+            sent or waited for; None is returned if it passes first
+        """
+        # Cached responses cost the provider nothing, so they are not held to
+        # its limits
+        result = temp_checker.read_cache(url_to_check)
+        if result is None:
+            result = self.__request(temp_checker, url_to_check, opt_deadline)
+            if result is None:
+                return None
+
+        if isinstance(result, results.ErrorResult):
+            with self.__cnt_lock:
+                self.failure_cnts[(temp_checker.name, result.error_type)] += 1
+        if self.journal is not None:
+            self.journal.record(result)
+        return result
+
+    def __submit_or_share(self, url_item, in_flight):
+        """ Return a SharedUrlTask for url_item if an equivalent URL is in
+        flight, else submit() it.
+
+        :param in_flight: Dict of canonical URL: UrlTask in flight
+        """
+        if not checker.SiteChecker.is_valid_url(url_item, opt_quiet=True):
+            return self.submit(url_item)
+
+        canonical_url = inputs.canonicalize_url(url_item)
+        shared_task = in_flight.get(canonical_url)
+        if shared_task is None:
+            task = self.submit(url_item)
+            in_flight[canonical_url] = task
+            return task
+
+        # Checkers to display the results with; they run no checks
+        temp_checkers = [self.get_checker(i) for i in\
+            sorted(self.checker_dict.keys())]
+        with self.__cnt_lock:
+            self.url_cnt += 1
+        return SharedUrlTask(url_item, temp_checkers, shared_task)
+
+    def __complete(self, task, in_flight):
+        """ Wait for task to complete and return it, no longer sharing its
+        checks with equivalent URLs.
+
+        :param in_flight: Dict of canonical URL: UrlTask in flight
+        """
+        task.wait()
+        canonical_url = inputs.canonicalize_url(task.url_to_check)
+        if in_flight.get(canonical_url) is task:
+            del in_flight[canonical_url]
+        elif isinstance(task, SharedUrlTask):
+            # Only the shared checks that requested their checker site saved
+            # a request
+            with self.__cnt_lock:
+                self.coalesced_cnt += len([temp_checker for temp_checker in\
+                    task.shared_task.checkers if temp_checker.request_cnt > 0])
+            if self.journal is not None:
+                # So that a resumed run does not check the URL again either
+                for result in task.result_list:
+                    self.journal.record(result)
+        return task
+
+    def __start_workers(self):
+        """ Start the worker threads.
+        """
+        for _ in range(self.num_of_threads):
+            worker = threading.Thread(target=self.__work)
+            # Never keep the script alive because of a slow provider
+            worker.daemon = True
+            worker.start()
+            self.__workers.append(worker)
+
+    def __stop_workers(self, opt_wait=False):
+        """ Tell the worker threads to exit once they finish their current
+        job.
+
+        :param opt_wait: (Optional) True to wait for the worker threads to
+            exit
+        """
+        for _ in self.__workers:
+            self.__job_queue.put(None)
+        if opt_wait:
+            for worker in self.__workers:
+                worker.join()
+        self.__workers = []
+
+    def __work(self):
+        """ Worker thread loop: fetch one (URL, checker) job at a time,
+        honoring the concurrency cap and rate limit of the checker's host.
+        """
+        while True:
+            job = self.__job_queue.get()
+            if job is None:
+                break
+
+            (task, index) = job
+            # Given up at the deadline while queued
+            if task.is_expired():
+                continue
+            task.start_deadline()
+            result = self.check(task.checkers[index], task.url_to_check,\
+                opt_deadline=task.deadline)
+            if result is not None:
+                task.set_result(index, result)
+
+    def __count_expired(self, checker_names):
+        """ Count the checks of a UrlTask given up at its deadline as
+        failures.
+        """
+        with self.__cnt_lock:
+            for checker_name in checker_names:
+                self.failure_cnts[(checker_name, DEADLINE_ERROR_TYPE)] += 1
+
+    def __request(self, temp_checker, url_to_check, opt_deadline=None):
+        """ Request the checker site for url_to_check within its host's
+        limits, retrying transient failures, and return the result, or None
+        if opt_deadline passes first.
+        """
+        host = urlparse.urlparse(temp_checker.base_url).netloc
+        semaphore = self.__host_semaphores[host]
+        timeout = temp_checker.timeout
+        attempt = 0
+        semaphore.acquire()
+        # False while the requests of a hedged attempt hold the host's slots
+        holds_slot = True
+        try:
+            while True:
+                if opt_deadline is not None:
+                    remaining = opt_deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    # A sent request cannot be stopped, so none is allowed
+                    # to wait past the deadline
+                    temp_checker.timeout = tuple([min(seconds, remaining)\
+                        for seconds in timeout])
+
+                # Don't beat up the kindly web sites that provide you with
+                # data
+                self.rate_limiter.acquire(temp_checker.base_url)
+                hedge_delay = self.__get_hedge_delay(temp_checker)
+                if hedge_delay is None:
+                    start = time.time()
+                    result = _request_url(temp_checker, url_to_check)
+                    self.__add_latency(temp_checker.name, result,\
+                        time.time() - start)
+                else:
+                    # The requests release the host's slots as they end
+                    holds_slot = False
+                    result = self.__request_hedged(temp_checker,\
+                        url_to_check, hedge_delay, semaphore)
+                if not (isinstance(result, results.ErrorResult) and\
+                    result.transient) or attempt >= self.max_retries:
+                    return result
+
+                attempt += 1
+                with self.__cnt_lock:
+                    self.retry_cnt += 1
+                # Keep holding the host's slot, so a struggling provider is
+                # not sent more requests meanwhile
+                if not holds_slot:
+                    semaphore.acquire()
+                    holds_slot = True
+                from sitechecker import transport
+                delay = transport.get_retry_delay(attempt, result.retry_after)
+                if opt_deadline is not None:
+                    delay = min(delay, max(0, opt_deadline - time.time()))
+                time.sleep(delay)
+        finally:
+            if holds_slot:
+                semaphore.release()
+
+    def __request_hedged(self, temp_checker, url_to_check, hedge_delay,\
+        semaphore):
+        """ Request the checker site for url_to_check on a thread, and once
+        more on another if the first has not answered within hedge_delay
+        seconds (and the host has a free slot and budget for it).  Return
+        the first answer that is not a transient failure, or else the last.
+
+        Each request runs on a copy of temp_checker and holds one of the
+        host's slots (the first, the caller's) until it ends, even after the
+        other has answered.  The timings and bytes of the answer used, and
+        the number of requests sent, are added to temp_checker.
+        """
+        answers = Queue.Queue()
+        racer_cnt = 1
+        self.__start_racer(temp_checker, url_to_check, semaphore, answers)
+        try:
+            answer = answers.get(timeout=hedge_delay)
+        except Queue.Empty:
+            answer = None
+            if semaphore.acquire(False):
+                if self.rate_limiter.try_acquire(temp_checker.base_url):
+                    self.__start_racer(temp_checker, url_to_check, semaphore,\
+                        answers)
+                    racer_cnt += 1
+                    with self.__cnt_lock:
+                        self.hedged_cnt += 1
+                else:
+                    semaphore.release()
+        if answer is None:
+            answer = answers.get()
+        (racer, result, seconds) = answer
+        if racer_cnt > 1 and isinstance(result, results.ErrorResult) and\
+            result.transient:
+            (racer, result, seconds) = answers.get()
+
+        self.__add_latency(temp_checker.name, result, seconds)
+        temp_checker.timings.update(racer.timings)
+        temp_checker.response_bytes += racer.response_bytes
+        temp_checker.request_cnt += racer_cnt
+        return result
+
+    def __start_racer(self, temp_checker, url_to_check, semaphore, answers):
+        """ Start a thread requesting the checker site for url_to_check with
+        a copy of temp_checker, which releases a slot of semaphore when the
+        request ends and then puts (copy, result, seconds) in answers.
+        """
+        racer = copy.copy(temp_checker)
+        racer.timings = collections.Counter()
+        racer.request_cnt = 0
+        racer.response_bytes = 0
+
+        def request():
+            """ Request the checker site, then release the slot.
+            """
+            start = time.time()
+            try:
+                result = _request_url(racer, url_to_check)
+            finally:
+                semaphore.release()
+            answers.put((racer, result, time.time() - start))
+
+        thread = threading.Thread(target=request)
+        # Never keep the script alive because of a slow provider
+        thread.daemon = True
+        thread.start()
+
+    def __get_hedge_delay(self, temp_checker):
+        """ Return the seconds after which a request with temp_checker is
+        hedged: its checker's observed HEDGE_PERCENTILE latency, or its
+        checker's configured hedge delay while too few latencies have been
+        observed (example: a run checking a single URL).  Return None if
+        hedging is off or the request is not a GET (which is safe to send
+        twice).
+        """
+        if not self.hedge or temp_checker.get_or_post != 'GET':
+            return None
+        with self.__cnt_lock:
+            latencies = list(self.__latencies.get(temp_checker.name, []))
+        if len(latencies) < _MIN_LATENCY_SAMPLES:
+            return self.__hedge_delays[temp_checker.name]
+        return stats.get_percentile(latencies, HEDGE_PERCENTILE)
+
+    def __add_latency(self, checker_name, result, seconds):
+        """ Keep the latency of an answered request, to hedge by.
+        """
+        if not isinstance(result, results.ErrorResult):
+            with self.__cnt_lock:
+                if checker_name not in self.__latencies:
+                    self.__latencies[checker_name] = collections.deque(\
+                        maxlen=_MAX_LATENCY_SAMPLES)
+                self.__latencies[checker_name].append(seconds)
+
+
+def _request_url(temp_checker, url_to_check):
+    """ Return temp_checker.request_url(url_to_check), or a
+    results.ErrorResult if it raises (example: a checker plugin's override),
+    so that the check still completes and nothing waits on it forever.
+    """
+    try:
+        return temp_checker.request_url(url_to_check)
+    except:
+        exc_info = sys.exc_info()
+        return results.ErrorResult(temp_checker.name, url_to_check,\
+            error_type=utils.get_exception_name(exc_info),\
+            error=['URL: ' + temp_checker.base_url + url_to_check, ''] +\
+                utils.format_exception(exc_info),\
+            transient=False, retry_after=None)
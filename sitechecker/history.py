@@ -0,0 +1,145 @@
+""" Contains HistoryStore class, and the comparison of results between runs
+"""
+import json
+import sqlite3
+import time
+import zlib
+
+from sitechecker import results
+
+
+class HistoryStore(object):
+    """ Encapsulate a single-file (SQLite) history of check results per run,
+    indexed by URL and checker.
+
+    A result is stored only when it differs from the one before it, zlib
+    compressed, so the store grows with how much the sites change rather
+    than with how many are checked.  Failed checks are not stored, so that
+    the last good result stays the baseline.
+    """
+
+    def __init__(self, path):
+        """ Initialize an instance of the class, and start a new run.
+
+        :param path: Path of the SQLite file (created if missing)
+        """
+        self.path = path
+        self.unchanged_cnt = 0
+        self.changed_cnt = 0
+        self.new_cnt = 0
+        self.__conn = sqlite3.connect(path)
+        self.__conn.execute('CREATE TABLE IF NOT EXISTS runs ('\
+            'id INTEGER PRIMARY KEY, '\
+            'started_at REAL NOT NULL)')
+        self.__conn.execute('CREATE TABLE IF NOT EXISTS results ('\
+            'url TEXT NOT NULL, '\
+            'checker TEXT NOT NULL, '\
+            'run_id INTEGER NOT NULL REFERENCES runs (id), '\
+            'record BLOB NOT NULL, '\
+            'PRIMARY KEY (url, checker, run_id))')
+        self.run_id = self.__conn.execute('INSERT INTO runs (started_at) '\
+            'VALUES (?)', (time.time(),)).lastrowid
+        self.__conn.commit()
+
+    def add(self, result):
+        """ Store result for this run if it differs from the previous result
+        for its URL and checker (see get_changes()), and return the previous
+        one: a results.CheckResult, or None if there is none.  The result
+        must not be a results.ErrorResult.
+
+        :param result: results.CheckResult for a completed check
+        """
+        record = _get_comparable_record(result)
+        row = self.__conn.execute('SELECT record FROM results WHERE url = ? '\
+            'AND checker = ? AND run_id < ? ORDER BY run_id DESC LIMIT 1',\
+            (result.url, result.checker, self.run_id)).fetchone()
+        previous_record = json.loads(zlib.decompress(str(row[0]))) if\
+            row is not None else None
+
+        # Only reordered list items (example: Sucuri links) are no change
+        # either, as get_changes() has it
+        if previous_record == record or (previous_record is not None and\
+            not _get_field_changes(previous_record['result'],\
+                record['result'], result.get_field_names())):
+            self.unchanged_cnt += 1
+        else:
+            if previous_record is None:
+                self.new_cnt += 1
+            else:
+                self.changed_cnt += 1
+            self.__conn.execute('INSERT OR REPLACE INTO results (url, '\
+                'checker, run_id, record) VALUES (?, ?, ?, ?)', (result.url,\
+                    result.checker, self.run_id, sqlite3.Binary(\
+                        zlib.compress(json.dumps(record,\
+                            separators=(',', ':'))))))
+        return results.from_record(previous_record) if\
+            previous_record is not None else None
+
+    def add_url_task(self, url_task):
+        """ Store the results of every successful check for a URL (see
+        add()) and save them, so that a killed run keeps what it checked.
+        Return a list of (index of the checker in url_task.checkers, previous
+        result or None), in checker order.
+
+        :param url_task: engine.UrlTask whose checks have all completed
+        """
+        previous_results = [(index, self.add(result)) for (index, result) in\
+            enumerate(url_task.result_list) if\
+                not isinstance(result, results.ErrorResult)]
+        self.__conn.commit()
+        return previous_results
+
+    def close(self):
+        """ Save the results stored so far and close the history file.
+        """
+        self.__conn.commit()
+        self.__conn.close()
+
+
+def get_changes(previous_result, result):
+    """ Return a dict of field name: change for the fields of result that
+    differ from previous_result (both of the same results.CheckResult child
+    class).
+
+    A change is {"added": [...], "removed": [...]} for a list field (example:
+    Sucuri blacklist entries), {key: [old, new], ...} for a dict field
+    (example: PageSpeed page stats; a missing key is None) and [old, new]
+    otherwise (example: PageSpeed score).
+    """
+    return _get_field_changes(_get_comparable_record(previous_result)\
+        ['result'], _get_comparable_record(result)['result'],\
+        result.get_field_names())
+
+
+def _get_field_changes(previous_dict, new_dict, field_names):
+    """ Return the changes of get_changes() between the result dicts of two
+    comparable records (see _get_comparable_record()).
+
+    :param field_names: Names of the fields to compare
+    """
+    changes = {}
+    for field_name in field_names:
+        (old, new) = (previous_dict.get(field_name), new_dict.get(field_name))
+        if old == new:
+            continue
+        if isinstance(old, list) and isinstance(new, list):
+            added = [item for item in new if item not in old]
+            removed = [item for item in old if item not in new]
+            # Only reordered (example: Sucuri links) is not a change
+            if added or removed:
+                changes[field_name] = {'added': added, 'removed': removed}
+        elif isinstance(old, dict) and isinstance(new, dict):
+            changes[field_name] = dict([(key, [old.get(key), new.get(key)])\
+                for key in sorted(set(old.keys()) | set(new.keys())) if\
+                    old.get(key) != new.get(key)])
+        else:
+            changes[field_name] = [old, new]
+    return changes
+
+
+def _get_comparable_record(result):
+    """ Return results.to_record(result) as it reads back from JSON, so that
+    a fresh result compares equal to a stored one (example: tuples become
+    lists and str becomes unicode).
+    """
+    return json.loads(json.dumps(results.to_record(result)))
@@ -0,0 +1,180 @@
+""" Contains UrlReader class and the sharding of URL lists
+"""
+import collections
+import hashlib
+import os
+
+from sitechecker import checker, utils
+
+
+DEFAULT_MAX_URLS_REMEMBERED = 100000
+
+# Bytes of whole lines read at a time by find_invalid_lines(), so that a huge
+# URL file is validated without being held in memory
+DEFAULT_VALIDATION_CHUNK_BYTES = 1024 * 1024
+
+
+class UrlReader(object):
+    """ Encapsulate the lazy reading of URLs from a file (or standard input),
+    1 URL per line.
+
+    URLs are normalized and handed out as they are read, so checking starts
+    with the first line and the file is never held in memory.  Repeated URLs
+    are skipped; to keep memory bounded, only the most recently seen
+    max_urls_remembered distinct URLs are remembered for that purpose.
+    Invalid URLs are handed out too (so that checking stops at them), unless
+    skip_invalid is set.
+    """
+
+    def __init__(self, url_file,\
+        max_urls_remembered=DEFAULT_MAX_URLS_REMEMBERED,\
+        opt_skip_invalid=False):
+        """ Initialize an instance of the class.
+
+        :param url_file: File object to read URLs from (example: sys.stdin)
+        :param max_urls_remembered: Number of distinct URLs remembered to
+            skip repeats
+        :param opt_skip_invalid: (Optional) True to skip the lines that are
+            not valid URLs, keeping them in invalid_lines
+        """
+        self.url_file = url_file
+        self.max_urls_remembered = max_urls_remembered
+        self.skip_invalid = opt_skip_invalid
+        self.line_cnt = 0
+        self.duplicate_cnt = 0
+        # (line number, normalized line) of every invalid URL skipped
+        self.invalid_lines = []
+        self.__seen = collections.OrderedDict()
+
+    @classmethod
+    def normalize_url(cls, url_item):
+        """ Return url_item without surrounding white space and in lower case
+        (host names are case insensitive).
+        """
+        return url_item.strip().lower()
+
+    def __iter__(self):
+        """ Yield each normalized, not yet seen URL in the file.
+        """
+        with self.url_file as url_file:
+            while True:
+                # readline() rather than file iteration, which reads ahead
+                # and would hold back URLs piped in slowly on standard input
+                try:
+                    line = url_file.readline()
+                except:
+                    utils.display_exception()
+                    # Not reachable, so no return
+                if line == '':
+                    break
+
+                self.line_cnt += 1
+                url_item = self.normalize_url(line)
+                if not utils.is_non_empty_str(url_item):
+                    continue
+                if self.skip_invalid and\
+                    not checker.SiteChecker.is_valid_url(url_item,\
+                        opt_quiet=True):
+                    self.invalid_lines.append((self.line_cnt, url_item))
+                    continue
+
+                if url_item in self.__seen:
+                    self.duplicate_cnt += 1
+                    # Keep the URL as recently seen
+                    del self.__seen[url_item]
+                else:
+                    yield url_item
+                self.__seen[url_item] = None
+                if len(self.__seen) > self.max_urls_remembered:
+                    self.__seen.popitem(last=False)
+
+
+def is_seekable(url_file):
+    """ Return True if url_file can be read again from the start (example: a
+    regular file), False if not (example: standard input from a pipe).
+    """
+    try:
+        url_file.seek(0, os.SEEK_CUR)
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def find_invalid_lines(url_file,\
+    opt_chunk_bytes=DEFAULT_VALIDATION_CHUNK_BYTES):
+    """ Return a list of (line number, normalized line) for every line of
+    url_file that is not blank and not a valid URL, reading the file in
+    chunks of about opt_chunk_bytes bytes of whole lines, then rewind it so
+    that a UrlReader reads it from the start.
+
+    Line numbers count from 1, as in UrlReader.line_cnt.
+
+    :param url_file: Seekable file object to read URLs from (see
+        is_seekable())
+    :param opt_chunk_bytes: (Optional) Bytes of lines to read at a time
+    """
+    is_valid_url = checker.SiteChecker.is_valid_url
+    normalize_url = UrlReader.normalize_url
+    invalid_lines = []
+    line_cnt = 0
+    while True:
+        try:
+            lines = url_file.readlines(opt_chunk_bytes)
+        except:
+            utils.display_exception()
+            # Not reachable, so no return
+        if not lines:
+            break
+
+        for line in lines:
+            line_cnt += 1
+            url_item = normalize_url(line)
+            if url_item and not is_valid_url(url_item, opt_quiet=True):
+                invalid_lines.append((line_cnt, url_item))
+    url_file.seek(0)
+    return invalid_lines
+
+
+def canonicalize_url(url_item):
+    """ Return the form of url_item shared by the URLs that the checkers treat
+    as the same site: normalized, and without a leading www. (example:
+    www.example.com and example.com, as SucuriChecker does for links).
+
+    :param url_item: URL from user input
+    """
+    url_item = UrlReader.normalize_url(url_item)
+    return url_item[len('www.'):] if url_item.startswith('www.') else\
+        url_item
+
+
+def get_shard(url_item, num_of_shards, opt_salt=''):
+    """ Return the shard (0 to num_of_shards - 1) that url_item belongs to.
+
+    Unlike hash(), the shard is the same in every process and on every
+    machine, so separate runs given the same input split it the same way.
+    URLs with the same canonical form (see canonicalize_url()) share a
+    shard, so that their checks can be shared.
+
+    :param url_item: Normalized URL (see UrlReader.normalize_url())
+    :param num_of_shards: Number of shards the URLs are split into
+    :param opt_salt: (Optional) str to hash with the URL, so that a shard can
+        be split again without every URL landing in the same part
+    """
+    return int(hashlib.md5(opt_salt + canonicalize_url(url_item)).\
+        hexdigest(), 16) % num_of_shards
+
+
+def select_shard(urls_to_check, shard_index, num_of_shards):
+    """ Yield the URLs of urls_to_check that belong to shard shard_index.
+
+    Invalid URLs are yielded in every shard, so that every shard stops at the
+    same bad line an unsharded run would stop at.
+
+    :param urls_to_check: Iterable of URLs from user input
+    :param shard_index: Shard to yield, from 0 to num_of_shards - 1
+    :param num_of_shards: Number of shards the URLs are split into
+    """
+    for url_item in urls_to_check:
+        if get_shard(url_item, num_of_shards) == shard_index or\
+            not checker.SiteChecker.is_valid_url(url_item, opt_quiet=True):
+            yield url_item
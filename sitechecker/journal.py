@@ -0,0 +1,80 @@
+""" Contains Journal class
+"""
+import json
+import threading
+
+from sitechecker import results
+
+
+class Journal(object):
+    """ Encapsulate an append-only JSON Lines file of completed checks, 1
+    (URL, checker) result per line, written as each check completes.
+
+    Failed checks are not journaled, so that a resumed run tries them again.
+    """
+
+    def __init__(self, path, opt_resume=False):
+        """ Initialize an instance of the class.
+
+        :param path: Path of the journal file
+        :param opt_resume: (Optional) True to load the checks already in the
+            journal and append to it, else start an empty journal
+        """
+        self.path = path
+        self.resumed_cnt = 0
+        self.__completed = {}
+        self.__lock = threading.Lock()
+        if opt_resume:
+            self.__load()
+        self.__file = open(path, 'a' if opt_resume else 'w')
+
+    def get(self, url_to_check, checker_name):
+        """ Return the journaled results.CheckResult for the URL and checker,
+        or None if the check has not been completed.
+
+        :param url_to_check: URL from user input
+        :param checker_name: User-friendly name of the checker (example:
+            GOOGLE PAGESPEED INSIGHTS)
+        """
+        record = self.__completed.get((url_to_check, checker_name))
+        if record is None:
+            return None
+        with self.__lock:
+            self.resumed_cnt += 1
+        return results.from_record(record)
+
+    def record(self, result):
+        """ Append a completed check to the journal, unless it failed.  The
+        line is flushed right away, so it survives the script being killed.
+
+        :param result: results.CheckResult
+        """
+        if not isinstance(result, results.ErrorResult):
+            line = json.dumps(results.to_record(result),\
+                separators=(',', ':')) + '\n'
+            with self.__lock:
+                self.__file.write(line)
+                self.__file.flush()
+
+    def close(self):
+        """ Close the journal file.
+        """
+        with self.__lock:
+            self.__file.close()
+
+    def __load(self):
+        """ Read the checks completed by earlier runs.
+        """
+        try:
+            with open(self.path) as journal_file:
+                for line in journal_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # The last line of a killed run may be incomplete
+                        continue
+                    self.__completed[(record['result']['url'],\
+                        record['result']['checker'])] = record
+        except IOError:
+            # Nothing to resume yet
+            pass
@@ -15,77 +15,234 @@ optional arguments:
   -h,      --help       show this help message and exit
   -s site, --site site  Url of site to check.  Example: www.google.com
   -f file, --file file  Absolute path to file containing 1 or more urls to
-                        check. (URLs in file should be 1 per line in format
-                        www.google.com)
+                        check, or - for standard input.  (URLs in file should
+                        be 1 per line in format www.google.com)
+  -t threads, --threads threads
+                        Number of worker threads used to run checks
+                        concurrently, within a URL and across URLs.
+                        (Default: 1, one check after another)
+  --cache-file file     Path of the file caching checker site responses.
+                        (Default: ~/.sitechecker_cache.sqlite)
+  --cache-ttl seconds   Use cached responses up to this many seconds old for
+                        every checker.  (Default: per checker)
+  --no-cache            Neither read nor store cached responses.
+  --refresh             Request every checker site again, but store the new
+                        responses in the cache.
+  --format format       Output format: text (report) or jsonl (one JSON
+                        record per URL and checker).  (Default: text)
+  --retries retries     Number of times a check is retried after a timeout,
+                        connection error, HTTP 429 or HTTP 5xx.  (Default: 3)
+  --deadline seconds    Give up the checks of a URL still outstanding this
+                        many seconds after they started, and output the URL's
+                        results with those checks marked as timed out.
+                        (Default: no deadline)
+  --hedge               Send a GET request again if it has not answered
+                        within its checker's observed p95 latency (or its
+                        hedge delay, until 20 requests have answered), and
+                        use the first answer.
+  --journal file        Path of a file to record every completed check in, as
+                        the run progresses.
+  --resume              Skip the checks already recorded in the --journal
+                        file (example: after a crash or Ctrl-C).
+  --cassette file       Path of a file of recorded checker site responses to
+                        answer from, instead of requesting the checker sites.
+  --record              Request the checker sites and record their responses
+                        in the --cassette file (replacing it).
+  --stats               Print the time spent per stage (connect, time to
+                        first byte, download, parse, render), bytes received
+                        and request latency histograms per checker at the end
+                        of the run.
+  --metrics-file file   Path of a file to write the run's metrics to, in the
+                        Prometheus text format (example: for the
+                        node_exporter textfile collector).
+  --shard K/N           Check only shard K (from 1 to N) of N shards of the
+                        URLs, picked by a stable hash of each URL.  (Example:
+                        run --shard 1/2 and --shard 2/2 on two machines)
+  --workers workers     Number of processes to split the URLs between, each
+                        with --threads threads.  Results are merged in input
+                        order.  (Default: 1, this process only)
+  --serve [host:]port   Instead of --site or --file, serve checks over a
+                        local HTTP JSON API until Ctrl-C, keeping sessions
+                        and the cache warm.  (Default host: 127.0.0.1)
+  --watch file          Path of a file keeping each URL's last check time and
+                        verdict.  Check only the URLs due for a re-check:
+                        flagged URLs come back sooner, clean ones later.
+  --history file        Path of a file to keep every run's results in, to
+                        compare the next run's results with.
+  --changes-only        Output only the results that changed since the
+                        previous run recorded in the --history file (and the
+                        results of URLs and checkers seen for the first time).
+  --skip-invalid        Check the valid URLs of the --file and skip the
+                        invalid ones, listed on standard error.  (Default:
+                        list them and exit before checking any URL)
+  --only names          Run only these checkers (comma-separated), even if
+                        off by default (marked *).  Names:
+                        wot, sucuri, pagespeed, w3markup*, w3css,
+                        and those of installed checker plugins.
+  --skip names          Run every checker but these (comma-separated).
+                        (Example: --skip pagespeed for a fast triage run)
+  --checker-config file
+                        Path of a file of per checker settings: enabled,
+                        timeouts, rate limits and cache time to live.
+                        (Default: ~/.sitechecker.cfg, if it exists)
 """
 
 
 import argparse
-import time
+import os
+import signal
+import sys
 
-from sitechecker import checker, utils
+# cassette (which imports requests), server and workers are imported where
+# they are used, so that --help and argument errors answer without loading
+# them (see benchmark.py --startup)
+from sitechecker import cache, checker, engine, history, inputs, journal,\
+    metrics, registry, render, stats, utils, watch
 
 
-SECONDS_TO_SLEEP = 3
+DEFAULT_NUM_OF_THREADS = 1
+DEFAULT_NUM_OF_WORKERS = 1
+DEFAULT_SERVE_HOST = '127.0.0.1'
 
 INPUT_TYPE_URL = 'URL'
 INPUT_TYPE_PATH = 'PATH'
-
-
-CHECKER_DICT = {
-    1: [checker.WotChecker, 'WOT SCORECARD',
-        'https://www.mywot.com/en/scorecard/', 'GET'],
-    2: [checker.SucuriChecker, 'SUCURI SECURITY SITE CHECK',
-        'https://sitecheck.sucuri.net/results/', 'POST'],
-    3: [checker.GoogleChecker, 'GOOGLE PAGESPEED INSIGHTS',
-        'https://www.googleapis.com/pagespeedonline/v1/runPagespeed?url='\
-        'http://', 'GET'],
-    # See github issue #3:
-    # 4: [checker.W3MarkupChecker, 'W3 MARKUP VALIDATION',
-    #    'http://validator.w3.org/check?output=json&uri=http%3A%2F%2F', 'GET'],
-    5: [checker.W3CssChecker, 'W3 CSS3 VALIDATION',
-        'http://jigsaw.w3.org/css-validator/validator?output=json&uri=', 'GET']
-}
+INPUT_TYPE_SERVE = 'SERVE'
 
 
 def main():
     """ Perform main script tasks:
     - Parse arguments to script.
     - Process user command line input (either a URL or a file containing URLs).
-    - If user input was a path to a file, extract URLs from the file.
+    - If user input was a path to a file, report every invalid URL in it
+      before checking any (and exit, unless they are to be skipped), then
+      read URLs from the file as they are needed.
     - For every URL, perform each check for the URL (example: Google PageSpeed
       Insights, Sucuri SiteChecker, etc).
+    - Display the results for every URL, in input order, in the requested
+      format.
     """
-    (user_input, input_type) = __parse_script_args()
+    (user_input, input_type, args, checker_dict) = __parse_script_args()
     urls_to_check = []
 
+    url_reader = None
+    # Standard input can only be read once, so its invalid URLs are found as
+    # it is read instead
+    pre_validated = False
+
     if input_type == INPUT_TYPE_URL:
         urls_to_check.append(user_input)
     elif input_type == INPUT_TYPE_PATH:
-        urls_to_check = __get_urls_from_file(user_input)
+        if inputs.is_seekable(user_input):
+            __validate_url_file(user_input, args.skip_invalid)
+            pre_validated = True
+        url_reader = inputs.UrlReader(user_input,\
+            opt_skip_invalid=args.skip_invalid)
+        urls_to_check = url_reader
+
+    if args.shard:
+        urls_to_check = inputs.select_shard(urls_to_check, args.shard[0] - 1,\
+            args.shard[1])
+
+    watch_state = None
+    if args.watch:
+        watch_state = watch.WatchState(args.watch)
+        urls_to_check = watch_state.select_due(urls_to_check)
+        if args.workers > 1:
+            # Selected up front, rather than on the worker pool's feeder
+            # thread while the main thread records verdicts
+            urls_to_check = list(urls_to_check)
 
-    url_item_cnt = 0
-    temp_checker = None
+    response_cache = None
+    check_journal = None
+    response_cassette = None
 
-    for url_item in urls_to_check:
-        url_item_cnt += 1
+    if args.workers > 1:
+        from sitechecker import workers
+        # The workers open their own cache and cassette
+        batch_engine = workers.WorkerPool(checker_dict, args.workers,\
+            args.threads, opt_cache_path=None if args.no_cache else\
+                args.cache_file, opt_cache_refresh=args.refresh,\
+            opt_cache_ttl=args.cache_ttl, opt_max_retries=args.retries,\
+            opt_cassette_path=args.cassette, opt_deadline=args.deadline,\
+            opt_hedge=args.hedge)
+    else:
+        if not args.no_cache:
+            response_cache = cache.ResponseCache(args.cache_file,\
+                opt_refresh=args.refresh)
+
+        if args.journal:
+            check_journal = journal.Journal(args.journal,\
+                opt_resume=args.resume)
 
-        if not checker.SiteChecker.is_valid_url(url_item):
-            utils.exit_script()
+        if args.cassette:
+            from sitechecker import cassette
+            response_cassette = cassette.Cassette(args.cassette,\
+                opt_record=args.record)
 
-        __display_url_header(url_item)
+        batch_engine = engine.BatchEngine(checker_dict, args.threads,\
+            opt_cache=response_cache, opt_cache_ttl=args.cache_ttl,\
+            opt_max_retries=args.retries, opt_journal=check_journal,\
+            opt_cassette=response_cassette, opt_deadline=args.deadline,\
+            opt_hedge=args.hedge)
 
-        if url_item_cnt != 1:
-            # Don't beat up the kindly web sites that provide you with data
-            time.sleep(SECONDS_TO_SLEEP)
+    if input_type == INPUT_TYPE_SERVE:
+        __serve(user_input, batch_engine, args)
+        return
 
-        for i in CHECKER_DICT.keys():
-            # Instatiate the appropriate checker.SiteChecker child class
-            # with attributes
-            temp_checker = CHECKER_DICT[i][0](CHECKER_DICT[i][1],\
-                CHECKER_DICT[i][2], CHECKER_DICT[i][3])
-            # Invoke the process_url function for that child class
-            temp_checker.process_url(url_item)
+    run_stats = stats.RunStats() if args.stats or args.metrics_file else\
+        None
+    history_store = history.HistoryStore(args.history) if args.history else\
+        None
+    if args.changes_only:
+        renderer = render.ChangesRenderer(history_store, args.format)
+    else:
+        renderer = render.get_renderer(args.format)
+    saved_sigint_handler = __handle_sigint(batch_engine)
+
+    try:
+        for url_task in batch_engine.run(urls_to_check):
+            if not url_task.is_valid:
+                renderer.close()
+                # Display the expected format
+                checker.SiteChecker.is_valid_url(url_task.url_to_check)
+                utils.exit_script()
+
+            renderer.render(url_task)
+            if history_store is not None and not args.changes_only:
+                history_store.add_url_task(url_task)
+            if run_stats is not None:
+                run_stats.add(url_task)
+            if watch_state is not None:
+                watch_state.record(url_task)
+    finally:
+        signal.signal(signal.SIGINT, saved_sigint_handler)
+        if watch_state is not None:
+            watch_state.close()
+        if history_store is not None:
+            history_store.close()
+        if check_journal is not None:
+            check_journal.close()
+        if response_cassette is not None:
+            response_cassette.save()
+
+    renderer.close()
+    if url_reader is not None and url_reader.invalid_lines and\
+        not pre_validated:
+        __display_invalid_lines(url_reader.invalid_lines, user_input.name,\
+            sys.stderr)
+    __display_run_summary(batch_engine, url_reader)
+    if watch_state is not None:
+        __display_watch_summary(watch_state)
+    if history_store is not None:
+        print >> sys.stderr, 'History: {} changed, {} new and {} unchanged '\
+            'result(s) since the previous run'.format(\
+                history_store.changed_cnt, history_store.new_cnt,\
+                history_store.unchanged_cnt)
+    if args.stats:
+        run_stats.display()
+    if args.metrics_file:
+        metrics.write_textfile(args.metrics_file,\
+            metrics.get_metrics_text(batch_engine, run_stats))
 
 
 def __parse_script_args():
@@ -99,8 +256,13 @@ def __parse_script_args():
             'check\n' \
         'Output (per URL):\n'
 
-    for i in CHECKER_DICT.keys():
-        arg_desc += ' - ' + CHECKER_DICT[i][1] + '\n'
+    # Looking up checker plugins would slow --help down
+    builtin_checker_dict = registry.get_checker_dict(opt_config_path=None,\
+        opt_plugins=False)
+    builtin_names = []
+    for i in sorted(builtin_checker_dict.keys()):
+        arg_desc += ' - ' + builtin_checker_dict[i].name + '\n'
+        builtin_names.append(registry.BUILTIN_CHECKERS[i - 1][0])
 
     parser = argparse.ArgumentParser(description=arg_desc,\
         formatter_class=argparse.RawTextHelpFormatter)
@@ -109,46 +271,397 @@ def __parse_script_args():
     parser.add_argument('-f', '--file', metavar='file',\
         type=argparse.FileType('r'),\
         help='Absolute path to file containing 1 or more urls to\n'\
-            'check.  (URLs in file should be 1 per line in format\n'\
-            'www.google.com)')
+            'check, or - for standard input.  (URLs in file should\n'\
+            'be 1 per line in format www.google.com)')
+    parser.add_argument('-t', '--threads', metavar='threads', type=int,\
+        default=DEFAULT_NUM_OF_THREADS,\
+        help='Number of worker threads used to run checks\n'\
+            'concurrently, within a URL and across URLs.\n'\
+            '(Default: {}, one check after another)'.\
+            format(DEFAULT_NUM_OF_THREADS))
+    parser.add_argument('--cache-file', metavar='file', type=str,\
+        default=cache.DEFAULT_CACHE_PATH,\
+        help='Path of the file caching checker site responses.\n'\
+            '(Default: ~/.sitechecker_cache.sqlite)')
+    parser.add_argument('--cache-ttl', metavar='seconds', type=int,\
+        help='Use cached responses up to this many seconds old for\n'\
+            'every checker.  (Default: per checker)')
+    parser.add_argument('--no-cache', action='store_true',\
+        help='Neither read nor store cached responses.')
+    parser.add_argument('--refresh', action='store_true',\
+        help='Request every checker site again, but store the new\n'\
+            'responses in the cache.')
+    parser.add_argument('--format', metavar='format',\
+        choices=[render.FORMAT_TEXT, render.FORMAT_JSONL],\
+        default=render.FORMAT_TEXT,\
+        help='Output format: text (report) or jsonl (one JSON\n'\
+            'record per URL and checker).  (Default: text)')
+    parser.add_argument('--retries', metavar='retries', type=int,\
+        default=engine.DEFAULT_MAX_RETRIES,\
+        help='Number of times a check is retried after a timeout,\n'\
+            'connection error, HTTP 429 or HTTP 5xx.  (Default: {})'.\
+            format(engine.DEFAULT_MAX_RETRIES))
+    parser.add_argument('--deadline', metavar='seconds', type=float,\
+        help='Give up the checks of a URL still outstanding this\n'\
+            'many seconds after they started, and output the URL\'s\n'\
+            'results with those checks marked as timed out.\n'\
+            '(Default: no deadline)')
+    parser.add_argument('--hedge', action='store_true',\
+        help='Send a GET request again if it has not answered\n'\
+            'within its checker\'s observed p95 latency (or its\n'\
+            'hedge delay, until 20 requests have answered), and\n'\
+            'use the first answer.')
+    parser.add_argument('--journal', metavar='file', type=str,\
+        help='Path of a file to record every completed check in, as\n'\
+            'the run progresses.')
+    parser.add_argument('--resume', action='store_true',\
+        help='Skip the checks already recorded in the --journal\n'\
+            'file (example: after a crash or Ctrl-C).')
+    parser.add_argument('--cassette', metavar='file', type=str,\
+        help='Path of a file of recorded checker site responses to\n'\
+            'answer from, instead of requesting the checker sites.')
+    parser.add_argument('--record', action='store_true',\
+        help='Request the checker sites and record their responses\n'\
+            'in the --cassette file (replacing it).')
+    parser.add_argument('--stats', action='store_true',\
+        help='Print the time spent per stage (connect, time to\n'\
+            'first byte, download, parse, render), bytes received\n'\
+            'and request latency histograms per checker at the end\n'\
+            'of the run.')
+    parser.add_argument('--metrics-file', metavar='file', type=str,\
+        help='Path of a file to write the run\'s metrics to, in the\n'\
+            'Prometheus text format (example: for the\n'\
+            'node_exporter textfile collector).')
+    parser.add_argument('--shard', metavar='K/N', type=__parse_shard,\
+        help='Check only shard K (from 1 to N) of N shards of the\n'\
+            'URLs, picked by a stable hash of each URL.  (Example:\n'\
+            'run --shard 1/2 and --shard 2/2 on two machines)')
+    parser.add_argument('--workers', metavar='workers', type=int,\
+        default=DEFAULT_NUM_OF_WORKERS,\
+        help='Number of processes to split the URLs between, each\n'\
+            'with --threads threads.  Results are merged in input\n'\
+            'order.  (Default: {}, this process only)'.\
+            format(DEFAULT_NUM_OF_WORKERS))
+    parser.add_argument('--serve', metavar='[host:]port',\
+        type=__parse_address,\
+        help='Instead of --site or --file, serve checks over a\n'\
+            'local HTTP JSON API until Ctrl-C, keeping sessions\n'\
+            'and the cache warm.  (Default host: {})'.\
+            format(DEFAULT_SERVE_HOST))
+    parser.add_argument('--watch', metavar='file', type=str,\
+        help='Path of a file keeping each URL\'s last check time and\n'\
+            'verdict.  Check only the URLs due for a re-check:\n'\
+            'flagged URLs come back sooner, clean ones later.')
+    parser.add_argument('--history', metavar='file', type=str,\
+        help='Path of a file to keep every run\'s results in, to\n'\
+            'compare the next run\'s results with.')
+    parser.add_argument('--changes-only', action='store_true',\
+        help='Output only the results that changed since the\n'\
+            'previous run recorded in the --history file (and the\n'\
+            'results of URLs and checkers seen for the first time).')
+    parser.add_argument('--skip-invalid', action='store_true',\
+        help='Check the valid URLs of the --file and skip the\n'\
+            'invalid ones, listed on standard error.  (Default:\n'\
+            'list them and exit before checking any URL)')
+    parser.add_argument('--only', metavar='names',\
+        type=registry.parse_checker_names,\
+        help='Run only these checkers (comma-separated), even if\n'\
+            'off by default (marked *).  Names:\n'\
+            '{},\n'\
+            'and those of installed checker plugins.'.format(', '.join(\
+                [name + ('' if name in builtin_names else '*') for name in\
+                    registry.get_checker_names(opt_plugins=False)])))
+    parser.add_argument('--skip', metavar='names',\
+        type=registry.parse_checker_names,\
+        help='Run every checker but these (comma-separated).\n'\
+            '(Example: --skip pagespeed for a fast triage run)')
+    parser.add_argument('--checker-config', metavar='file', type=str,\
+        default=registry.DEFAULT_CONFIG_PATH,\
+        help='Path of a file of per checker settings: enabled,\n'\
+            'timeouts, rate limits and cache time to live.\n'\
+            '(Default: ~/.sitechecker.cfg, if it exists)')
     args = parser.parse_args()
-    if not (args.site or args.file):
+    if not (args.site or args.file or args.serve):
         parser.error('Please provide --site or --file as argument')
         # Not reachable, so no return
-    elif args.site and args.file:
-        parser.error('Please provide either --site or --file as argument '\
+    elif len([arg for arg in (args.site, args.file, args.serve) if arg]) > 1:
+        parser.error('Please provide either --site, --file or --serve as '\
+            'argument (only one)')
+        # Not reachable, so no return
+    elif args.serve and (args.workers > 1 or args.shard or args.journal or\
+        args.watch or args.history):
+        parser.error('Please provide either --serve or --workers/--shard/'\
+            '--journal/--watch/--history as argument (only one)')
+        # Not reachable, so no return
+    elif args.only and args.skip:
+        parser.error('Please provide either --only or --skip as argument '\
             '(only one)')
         # Not reachable, so no return
-    else:
-        return (args.site, INPUT_TYPE_URL) if args.site else (args.file,\
-            INPUT_TYPE_PATH)
+    elif args.checker_config != registry.DEFAULT_CONFIG_PATH and\
+        not os.path.isfile(args.checker_config):
+        parser.error('Please provide --checker-config as an existing file')
+        # Not reachable, so no return
+    elif args.skip_invalid and not args.file:
+        parser.error('Please provide --file with --skip-invalid')
+        # Not reachable, so no return
+    elif args.changes_only and not args.history:
+        parser.error('Please provide --history with --changes-only')
+        # Not reachable, so no return
+    elif args.threads < 1:
+        parser.error('Please provide --threads as a number greater than 0')
+        # Not reachable, so no return
+    elif args.workers < 1:
+        parser.error('Please provide --workers as a number greater than 0')
+        # Not reachable, so no return
+    elif args.workers > 1 and (args.journal or args.record):
+        parser.error('Please provide either --workers or --journal/--record '\
+            'as argument (only one)')
+        # Not reachable, so no return
+    elif args.resume and not args.journal:
+        parser.error('Please provide --journal with --resume')
+        # Not reachable, so no return
+    elif args.record and not args.cassette:
+        parser.error('Please provide --cassette with --record')
+        # Not reachable, so no return
+    elif args.cassette and not args.record and\
+        not os.path.isfile(args.cassette):
+        parser.error('Please provide --cassette as an existing file, or add '\
+            '--record')
+        # Not reachable, so no return
+    elif args.deadline is not None and args.deadline <= 0:
+        parser.error('Please provide --deadline as a number of seconds '\
+            'greater than 0')
+        # Not reachable, so no return
+    elif args.retries < 0:
+        parser.error('Please provide --retries as a number of 0 or more')
+        # Not reachable, so no return
+    elif args.cache_ttl is not None and args.cache_ttl < 0:
+        parser.error('Please provide --cache-ttl as a number of seconds')
+        # Not reachable, so no return
+    elif args.no_cache and (args.refresh or args.cache_ttl is not None):
+        parser.error('Please provide either --no-cache or --refresh/'\
+            '--cache-ttl as argument (only one)')
+        # Not reachable, so no return
 
+    try:
+        checker_dict = registry.get_checker_dict(opt_only=args.only,\
+            opt_skip=args.skip, opt_config_path=args.checker_config)
+    except ValueError as exc_obj:
+        parser.error(str(exc_obj))
+        # Not reachable, so no return
+    if not checker_dict:
+        parser.error('Please leave at least one checker to run')
+        # Not reachable, so no return
+
+    if args.serve:
+        return (args.serve, INPUT_TYPE_SERVE, args, checker_dict)
+    return (args.site, INPUT_TYPE_URL, args, checker_dict) if args.site else\
+        (args.file, INPUT_TYPE_PATH, args, checker_dict)
 
-def __get_urls_from_file(user_input):
-    """ Parse individual URLs listed in file into a list and return the list.
+
+def __parse_shard(value):
+    """ Return a --shard value (example: 2/8) as a (K, N) tuple.
     """
-    urls_to_check = []
-    temp_line = ''
     try:
-        # Input already validated as valid file by args parser
-        with user_input as url_file:
-            for line in url_file:
-                temp_line = line.strip('\n').strip(' ')
-                if utils.is_non_empty_str(temp_line):
-                    urls_to_check.append(temp_line)
-        return urls_to_check
-    except:
-        utils.display_exception()
-        # Not reachable, so no return
+        (shard_index, num_of_shards) = [int(part) for part in\
+            value.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected K/N, like 1/4')
+    if not 1 <= shard_index <= num_of_shards:
+        raise argparse.ArgumentTypeError('expected K from 1 to N, like 1/4')
+    return (shard_index, num_of_shards)
+
+
+def __parse_address(value):
+    """ Return a --serve value (example: 8080 or 0.0.0.0:8080) as a (host,
+    port) tuple.
+    """
+    (host, _, port) = value.rpartition(':')
+    try:
+        port = int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected [host:]port, like 8080')
+    if not 0 < port < 65536:
+        raise argparse.ArgumentTypeError('expected a port from 1 to 65535')
+    return (host or DEFAULT_SERVE_HOST, port)
+
+
+def __serve(address, batch_engine, args):
+    """ Serve checks with batch_engine on address until Ctrl-C, then print
+    the run summary (and write the metrics and --stats, if asked for).
+    """
+    from sitechecker import server
+    run_stats = stats.RunStats()
+    check_server = server.CheckServer(address, batch_engine, run_stats)
+    print >> sys.stderr, 'Serving checks on http://{}:{}/check (press '\
+        'Ctrl-C to stop)'.format(*address)
+    try:
+        check_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        check_server.server_close()
+        if batch_engine.session_pool.cassette is not None:
+            batch_engine.session_pool.cassette.save()
+
+    __display_run_summary(batch_engine, None)
+    print >> sys.stderr, 'Shared {} in-flight check(s) between requests '\
+        'for the same URL'.format(check_server.coalesced_cnt)
+    if args.stats:
+        run_stats.display()
+    if args.metrics_file:
+        metrics.write_textfile(args.metrics_file,\
+            metrics.get_metrics_text(batch_engine, run_stats))
+
+
+def __handle_sigint(batch_engine):
+    """ Make the first Ctrl-C finish the URLs in flight (recording them in
+    the journal, if any) and then end the run; a second Ctrl-C exits at once.
+    Return the previous SIGINT handler.
+    """
+    def handle_first_sigint(signum, frame):
+        """ Stop batch_engine from starting new URLs.
+        """
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print >> sys.stderr
+        print >> sys.stderr, 'Interrupted: finishing the URLs in flight '\
+            '(press Ctrl-C again to exit now)'
+        batch_engine.stop()
+
+    return signal.signal(signal.SIGINT, handle_first_sigint)
+
+
+def __validate_url_file(url_file, skip_invalid):
+    """ Report every invalid URL in url_file, before any URL is checked, and
+    exit if there are any, unless skip_invalid is set.
+
+    :param url_file: Seekable file object the URLs are read from
+    :param skip_invalid: True to go on, checking only the valid URLs
+    """
+    invalid_lines = inputs.find_invalid_lines(url_file)
+    if not invalid_lines:
+        return
+
+    if skip_invalid:
+        __display_invalid_lines(invalid_lines, url_file.name, sys.stderr)
+        return
+
+    __display_invalid_lines(invalid_lines, url_file.name, sys.stdout)
+    print 'No URL was checked.  Please correct the line(s) above, or add '\
+        '--skip-invalid to check the valid URLs only'
+    utils.exit_script()
+
+
+def __display_invalid_lines(invalid_lines, file_name, out):
+    """ Print the expected URL format and every invalid line to out.
+
+    :param invalid_lines: List of (line number, line) (see
+        inputs.find_invalid_lines())
+    :param file_name: Name of the file the lines were read from
+    :param out: File object to print to (example: sys.stderr)
+    """
+    print >> out
+    print >> out, 'Expecting URL in format like www.google.com'
+    print >> out, 'Received {} invalid URL(s) in {}:'.format(\
+        len(invalid_lines), file_name)
+    for (line_no, line) in invalid_lines:
+        print >> out, '  line {}: {}'.format(line_no, line)
+
 
+def __display_run_summary(batch_engine, url_reader):
+    """ Print the run summary to standard error, so that it stays out of the
+    report.
 
-def __display_url_header(url_to_check):
-    """ Print the formatted URL from user input.
+    :param batch_engine: engine.BatchEngine or workers.WorkerPool that ran
+        the checks
+    :param url_reader: inputs.UrlReader the URLs were read with, or None
     """
-    if utils.is_non_empty_str(url_to_check):
-        print
-        print url_to_check
-        print len(url_to_check) * '_'
+    print >> sys.stderr
+    print >> sys.stderr, 'Checked {} URL(s) in {:.2f} seconds ({:.2f} URLs/'\
+        'sec)'.format(batch_engine.url_cnt, batch_engine.end_time -\
+            batch_engine.start_time, batch_engine.get_urls_per_sec())
+
+    if batch_engine.journal is not None and\
+        batch_engine.journal.resumed_cnt > 0:
+        print >> sys.stderr, 'Resumed {} check(s) from {}'.format(\
+            batch_engine.journal.resumed_cnt, batch_engine.journal.path)
+
+    if url_reader is not None and url_reader.invalid_lines:
+        print >> sys.stderr, 'Skipped {} invalid URL(s)'.\
+            format(len(url_reader.invalid_lines))
+
+    if url_reader is not None and url_reader.duplicate_cnt > 0:
+        print >> sys.stderr, 'Skipped {} repeated URL(s)'.\
+            format(url_reader.duplicate_cnt)
+
+    if batch_engine.coalesced_cnt > 0:
+        print >> sys.stderr, 'Shared {} check(s) between equivalent URLs '\
+            '(example: www.example.com and example.com), saving as many '\
+            'request(s)'.format(batch_engine.coalesced_cnt)
+
+    if batch_engine.retry_cnt > 0:
+        print >> sys.stderr, 'Retried {} request(s)'.\
+            format(batch_engine.retry_cnt)
+
+    if batch_engine.hedged_cnt > 0:
+        print >> sys.stderr, 'Hedged {} slow request(s) with a second '\
+            'request'.format(batch_engine.hedged_cnt)
+
+    if batch_engine.failure_cnts:
+        print >> sys.stderr, 'Failed {} check(s):'.\
+            format(sum(batch_engine.failure_cnts.values()))
+        for ((checker_name, error_type), failure_cnt) in\
+            sorted(batch_engine.failure_cnts.items()):
+            print >> sys.stderr, '  {} ({}): {}'.format(checker_name,\
+                error_type, failure_cnt)
+
+    if isinstance(batch_engine, engine.BatchEngine):
+        __display_transport_summary(batch_engine)
+
+    if batch_engine.cache is not None:
+        print >> sys.stderr, 'Cache: {} hit(s), {} miss(es) ({:.0%} hit '\
+            'ratio)'.format(batch_engine.cache.hit_cnt,\
+                batch_engine.cache.miss_cnt,\
+                batch_engine.cache.get_hit_ratio())
+        if batch_engine.cache.error_cnt > 0:
+            print >> sys.stderr, 'Cache: {} error(s) opening, reading or '\
+                'writing {}'.format(batch_engine.cache.error_cnt,\
+                    batch_engine.cache.path)
+
+
+def __display_watch_summary(watch_state):
+    """ Print the --watch part of the run summary to standard error.
+    """
+    print >> sys.stderr, 'Watch: {} URL(s) due, {} not yet due'.format(\
+        watch_state.due_cnt, watch_state.skipped_cnt)
+    if watch_state.risk_cnts:
+        print >> sys.stderr, '  Verdicts: {}'.format(', '.join(['{} {}'.\
+            format(watch_state.risk_cnts[risk], risk) for risk in\
+                (watch.RISK_HIGH, watch.RISK_MEDIUM, watch.RISK_LOW,\
+                    watch.RISK_UNKNOWN) if watch_state.risk_cnts[risk]]))
+
+
+def __display_transport_summary(batch_engine):
+    """ Print the rate limiting, connection reuse and replay part of the run
+    summary, which only a single-process engine.BatchEngine keeps track of.
+    """
+    for (host, bucket) in sorted(batch_engine.rate_limiter.buckets.items()):
+        if bucket.throttled_cnt > 0:
+            print >> sys.stderr, 'Rate limited {} request(s) to {} for '\
+                '{:.2f} seconds'.format(bucket.throttled_cnt, host,\
+                    bucket.throttled_seconds)
+
+    for (host, (request_cnt, connection_cnt)) in\
+        sorted(batch_engine.session_pool.get_connection_stats().items()):
+        if request_cnt > 0:
+            print >> sys.stderr, 'Sent {} request(s) to {} over {} '\
+                'connection(s) ({} reused)'.format(request_cnt, host,\
+                    connection_cnt, max(request_cnt - connection_cnt, 0))
+
+    response_cassette = batch_engine.session_pool.cassette
+    if response_cassette is not None and not response_cassette.record:
+        print >> sys.stderr, 'Replayed {} response(s) from {}'.format(\
+            response_cassette.replay_cnt, response_cassette.path)
 
 
 if __name__ == "__main__":
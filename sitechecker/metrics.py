@@ -0,0 +1,146 @@
+""" Provides run metrics in the Prometheus text exposition format, for the
+node_exporter textfile collector (or a /metrics endpoint).
+"""
+import os
+import tempfile
+import time
+
+from sitechecker import stats
+
+
+METRIC_PREFIX = 'sitechecker_'
+
+
+def get_metrics_text(batch_engine, run_stats):
+    """ Return the metrics of a run in the Prometheus text format.
+
+    :param batch_engine: engine.BatchEngine that ran the checks
+    :param run_stats: stats.RunStats holding every rendered URL of the run
+    """
+    lines = []
+
+    __add_metric(lines, 'urls_processed_total', 'counter',\
+        'URLs checked.', [({}, batch_engine.url_cnt)])
+    __add_metric(lines, 'run_duration_seconds', 'gauge',\
+        'Seconds taken by the run.', [({}, (batch_engine.end_time or\
+            time.time()) - batch_engine.start_time)])
+    __add_metric(lines, 'last_run_timestamp_seconds', 'gauge',\
+        'Unix time the run ended at.', [({}, batch_engine.end_time or\
+            time.time())])
+
+    __add_metric(lines, 'requests_total', 'counter',\
+        'Requests sent to the checker site, including retries.',\
+        [({'checker': checker_name}, checker_stats.request_cnt) for\
+            (checker_name, checker_stats) in run_stats.checker_stats.items()])
+    __add_metric(lines, 'retries_total', 'counter',\
+        'Requests retried after a transient failure.',\
+        [({}, batch_engine.retry_cnt)])
+    __add_metric(lines, 'coalesced_checks_total', 'counter',\
+        'Checker site requests saved by sharing the checks of an '\
+            'equivalent URL in flight.', [({}, batch_engine.coalesced_cnt)])
+    __add_metric(lines, 'hedged_requests_total', 'counter',\
+        'Requests sent a second time because the first was slower than '\
+            'its checker\'s observed p95 latency.',\
+        [({}, batch_engine.hedged_cnt)])
+    __add_metric(lines, 'check_errors_total', 'counter',\
+        'Checks that failed, by exception type (example: ConnectionError '\
+            'or HTTPError).',\
+        [({'checker': checker_name, 'error_type': error_type}, failure_cnt)\
+            for ((checker_name, error_type), failure_cnt) in\
+                sorted(batch_engine.failure_cnts.items())])
+    __add_metric(lines, 'response_bytes_total', 'counter',\
+        'Bytes received from the checker site.',\
+        [({'checker': checker_name}, checker_stats.response_bytes) for\
+            (checker_name, checker_stats) in run_stats.checker_stats.items()])
+    __add_metric(lines, 'stage_seconds_total', 'counter',\
+        'Seconds spent per stage of the checks.',\
+        [({'checker': checker_name, 'stage': stage},\
+            checker_stats.stage_seconds[stage]) for (checker_name,\
+                checker_stats) in run_stats.checker_stats.items() for stage\
+                    in stats.STAGES])
+
+    samples = []
+    for (checker_name, checker_stats) in run_stats.checker_stats.items():
+        cumulative_cnt = 0
+        for (index, bucket_cnt) in\
+            enumerate(checker_stats.latency_bucket_cnts):
+            cumulative_cnt += bucket_cnt
+            bound = stats.LATENCY_BUCKETS_SECONDS[index] if index <\
+                len(stats.LATENCY_BUCKETS_SECONDS) else '+Inf'
+            samples.append(('_bucket', {'checker': checker_name,\
+                'le': bound}, cumulative_cnt))
+        samples.append(('_sum', {'checker': checker_name},\
+            checker_stats.latency_seconds))
+        samples.append(('_count', {'checker': checker_name},\
+            cumulative_cnt))
+    __add_metric(lines, 'request_duration_seconds', 'histogram',\
+        'Seconds spent on the network per check, over every request '\
+            'attempt.', samples)
+
+    if batch_engine.cache is not None:
+        __add_metric(lines, 'cache_hits_total', 'counter',\
+            'Checker site responses answered from the cache.',\
+            [({}, batch_engine.cache.hit_cnt)])
+        __add_metric(lines, 'cache_misses_total', 'counter',\
+            'Cache lookups that found no fresh response.',\
+            [({}, batch_engine.cache.miss_cnt)])
+        __add_metric(lines, 'cache_hit_ratio', 'gauge',\
+            'Share of cache lookups answered from the cache.',\
+            [({}, batch_engine.cache.get_hit_ratio())])
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path, metrics_text):
+    """ Write metrics_text to path atomically (write a temporary file in the
+    same directory, then rename it), so that the textfile collector never
+    reads a half-written file.
+
+    :param path: Path of the .prom file
+    :param metrics_text: Metrics in the Prometheus text format
+    """
+    (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(\
+        os.path.abspath(path)), prefix='.sitechecker_metrics')
+    try:
+        with os.fdopen(fd, 'w') as temp_file:
+            temp_file.write(metrics_text)
+        # The collector runs as another user
+        os.chmod(temp_path, 0644)
+        os.rename(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+
+
+def __add_metric(lines, name, metric_type, help_text, samples):
+    """ Append the HELP, TYPE and sample lines of a metric to lines.
+
+    :param samples: List of (labels dict, value), or of (name suffix, labels
+        dict, value) for a histogram
+    """
+    lines.append('# HELP {}{} {}'.format(METRIC_PREFIX, name, help_text))
+    lines.append('# TYPE {}{} {}'.format(METRIC_PREFIX, name, metric_type))
+    for sample in samples:
+        (suffix, labels, value) = sample if len(sample) == 3 else\
+            ('',) + tuple(sample)
+        lines.append('{}{}{}{} {}'.format(METRIC_PREFIX, name, suffix,\
+            __format_labels(labels), __format_value(value)))
+
+
+def __format_labels(labels):
+    """ Return labels formatted as {name="value",...}, or '' if there are
+    none.
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join(['{}="{}"'.format(name, str(labels[name]).\
+        replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for\
+            name in sorted(labels.keys())]) + '}'
+
+
+def __format_value(value):
+    """ Return a sample value formatted for the text format.
+    """
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
@@ -0,0 +1,106 @@
+""" Contains TokenBucket and HostRateLimiter classes
+"""
+import threading
+import time
+import urlparse
+
+
+class TokenBucket(object):
+    """ Encapsulate a token bucket rate limit.
+
+    The bucket holds up to burst tokens and refills at rate tokens per second.
+    Each request takes a token; a request that finds the bucket empty waits
+    only as long as it takes for its token to be refilled.
+    """
+
+    def __init__(self, rate, burst):
+        """ Initialize an instance of the class.
+
+        :param rate: Sustained number of requests allowed per second
+        :param burst: Number of requests allowed at once after an idle period
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.throttled_cnt = 0
+        self.throttled_seconds = 0.0
+        self.__tokens = self.burst
+        self.__last_refill = time.time()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """ Take a token, sleeping first if the bucket is empty.
+
+        Tokens are reserved under the lock, so concurrent callers queue up
+        behind each other instead of all waking at the same refill.
+        """
+        with self.__lock:
+            now = time.time()
+            self.__tokens = min(self.burst, self.__tokens +\
+                (now - self.__last_refill) * self.rate)
+            self.__last_refill = now
+            self.__tokens -= 1
+            wait_seconds = -self.__tokens / self.rate if self.__tokens < 0\
+                else 0.0
+            if wait_seconds > 0:
+                self.throttled_cnt += 1
+                self.throttled_seconds += wait_seconds
+
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+    def try_acquire(self):
+        """ Take a token if the bucket has one, without waiting, and return
+        True; else return False.
+        """
+        with self.__lock:
+            now = time.time()
+            self.__tokens = min(self.burst, self.__tokens +\
+                (now - self.__last_refill) * self.rate)
+            self.__last_refill = now
+            if self.__tokens < 1:
+                return False
+            self.__tokens -= 1
+            return True
+
+
+class HostRateLimiter(object):
+    """ Encapsulate one TokenBucket per checker host, so that each provider
+    is held to its own budget and fast providers are not held back by slow
+    ones.
+    """
+
+    def __init__(self):
+        """ Initialize an instance of the class.
+        """
+        self.buckets = {}
+
+    def add_host(self, base_url, rate, burst):
+        """ Add a bucket for the host of base_url, unless the host already has
+        one (checkers sharing a host share its budget).
+
+        :param base_url: Base URL of a checker (example:
+            http://checkyoursiteforbadstuff.com/uri=)
+        :param rate: Requests allowed per second to the host
+        :param burst: Requests allowed at once to the host
+        """
+        host = urlparse.urlparse(base_url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(rate, burst)
+
+    def acquire(self, base_url):
+        """ Wait until a request to the host of base_url is within budget.
+
+        :param base_url: Base URL of a checker
+        """
+        bucket = self.buckets.get(urlparse.urlparse(base_url).netloc)
+        if bucket is not None:
+            bucket.acquire()
+
+    def try_acquire(self, base_url):
+        """ Return True if a request to the host of base_url is within budget
+        right now (taking its token), else False, without waiting.
+
+        :param base_url: Base URL of a checker
+        """
+        bucket = self.buckets.get(urlparse.urlparse(base_url).netloc)
+        return bucket.try_acquire() if bucket is not None else True
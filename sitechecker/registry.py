@@ -0,0 +1,251 @@
+""" Contains the registry of checkers: the checkers that come with
+sitechecker, and the ones other packages register under an entry point
+"""
+import ConfigParser
+import copy
+import importlib
+import math
+import os
+
+
+# Entry point group that other packages register checker.SiteChecker child
+# classes under (example, in their setup.py:
+# entry_points={'sitechecker.checkers': ['mycheck = mypackage:MyChecker']})
+ENTRY_POINT_GROUP = 'sitechecker.checkers'
+
+DEFAULT_CONFIG_PATH = os.path.expanduser('~/.sitechecker.cfg')
+
+# Name (for --only, --skip and the config file): checker class, as
+# module:class.  In output order; the key of a checker's definition is its
+# position (from 1), so keys stay the same as more checkers are added after
+BUILTIN_CHECKERS = (
+    ('wot', 'sitechecker.checker:WotChecker'),
+    ('sucuri', 'sitechecker.checker:SucuriChecker'),
+    ('pagespeed', 'sitechecker.checker:GoogleChecker'),
+    ('w3markup', 'sitechecker.checker:W3MarkupChecker'),
+    ('w3css', 'sitechecker.checker:W3CssChecker')
+)
+
+# Config file option (and CheckerDefinition attribute): type
+_CONFIG_OPTIONS = {
+    'max_concurrent_requests': int,
+    'requests_per_second': float,
+    'request_burst': float,
+    'cache_ttl': int,
+    'connect_timeout': float,
+    'read_timeout': float,
+    'hedge_delay': float
+}
+
+# (name, entry point) of every registered plugin checker, sorted by name,
+# once looked up
+_plugin_entry_points = None
+
+
+class CheckerDefinition(object):
+    """ Encapsulate a checker to run: its checker.SiteChecker child class,
+    and the details of its checker site, taken from the class and overridden
+    by the checker's section of the config file, if there is one.
+    """
+
+    def __init__(self, checker_class):
+        """ Initialize an instance of the class.
+
+        :param checker_class: checker.SiteChecker child class
+        """
+        self.checker_class = checker_class
+        self.name = checker_class.NAME
+        self.base_url = checker_class.BASE_URL
+        self.get_or_post = checker_class.GET_OR_POST
+        # Most requests in flight at once to the checker's host
+        self.max_concurrent_requests = checker_class.MAX_CONCURRENT_REQUESTS
+        # Requests per second to the checker's host, and the burst of
+        # requests allowed at once
+        self.requests_per_second = checker_class.REQUESTS_PER_SECOND
+        self.request_burst = checker_class.REQUEST_BURST
+        # Seconds to keep responses in the cache
+        self.cache_ttl = checker_class.CACHE_TTL
+        self.connect_timeout = checker_class.CONNECT_TIMEOUT
+        self.read_timeout = checker_class.READ_TIMEOUT
+        # Seconds after which a GET request is hedged, until enough
+        # latencies have been observed
+        self.hedge_delay = checker_class.HEDGE_DELAY
+
+    def copy(self):
+        """ Return a copy of the definition, to change without changing
+        this one.
+        """
+        return copy.copy(self)
+
+    def get_checker(self, **checker_options):
+        """ Return a new instance of the checker class.
+
+        :param checker_options: Keyword arguments for the checker class
+            (example: opt_session=...); without any, the checker is only
+            fit to display results
+        """
+        return self.checker_class(self.name, self.base_url, self.get_or_post,\
+            **checker_options)
+
+
+def get_checker_names(opt_plugins=True):
+    """ Return the names of every checker, built in or registered, in output
+    order.
+
+    :param opt_plugins: (Optional) False to leave out the checkers that
+        installed packages register
+    """
+    return [name for (name, _) in BUILTIN_CHECKERS] +\
+        ([name for (name, _) in __get_plugin_entry_points()] if opt_plugins\
+            else [])
+
+
+def get_checker_dict(opt_only=None, opt_skip=None,\
+    opt_config_path=DEFAULT_CONFIG_PATH, opt_plugins=True):
+    """ Return a dict of {key: CheckerDefinition} for the checkers to run.
+
+    The key of a checker is its position (from 1) in get_checker_names(), so
+    iterating the keys in order gives the output order.  Only the classes of
+    the checkers to run are loaded.  Raise ValueError for an unknown checker
+    name or a bad config file (example: a number that is not greater than
+    0).
+
+    :param opt_only: (Optional) Names of the only checkers to run, whether
+        enabled by default or not
+    :param opt_skip: (Optional) Names of checkers not to run
+    :param opt_config_path: (Optional) Path of the checker config file, read
+        if it exists (example section: [w3markup] enabled = true), or None
+        to use only the values of the checker classes
+    :param opt_plugins: (Optional) False to leave out the checkers that
+        installed packages register
+    """
+    config = __read_config(opt_config_path)
+    names = get_checker_names(opt_plugins=opt_plugins)
+    unknown_names = [name for name in (opt_only or []) + (opt_skip or []) +\
+        config.sections() if name not in names]
+    if unknown_names:
+        raise ValueError('Unknown checker(s): {} (expected any of: {})'.\
+            format(', '.join(unknown_names), ', '.join(names)))
+
+    checker_dict = {}
+    for (index, name) in enumerate(names):
+        if (opt_only and name not in opt_only) or\
+            (opt_skip and name in opt_skip):
+            continue
+        checker_class = __load_checker_class(name)
+        if not opt_only and not (config.getboolean(name, 'enabled') if\
+            config.has_option(name, 'enabled') else\
+                checker_class.ENABLED_BY_DEFAULT):
+            continue
+
+        definition = CheckerDefinition(checker_class)
+        for (option, option_type) in _CONFIG_OPTIONS.items():
+            if config.has_option(name, option):
+                try:
+                    value = option_type(config.get(name, option))
+                except ValueError:
+                    value = None
+                # A cap or rate of 0 would hold every request back
+                if value is None or not value > 0:
+                    raise ValueError('Expecting a number greater than 0 for '\
+                        '{} in [{}] of {}'.format(option, name,\
+                            opt_config_path))
+                setattr(definition, option, value)
+        checker_dict[index + 1] = definition
+    return checker_dict
+
+
+def get_checker_keys(checker_dict, opt_plugins=True):
+    """ Return a dict of checker name: key in checker_dict, for every checker
+    in checker_dict.
+
+    :param checker_dict: Dict of checker definitions from get_checker_dict()
+    :param opt_plugins: (Optional) Same as for get_checker_dict()
+    """
+    return dict([(name, index + 1) for (index, name) in\
+        enumerate(get_checker_names(opt_plugins=opt_plugins)) if\
+            index + 1 in checker_dict])
+
+
+def split_checker_dict(checker_dict, num_of_parts):
+    """ Return a copy of checker_dict with each host's concurrency cap, rate
+    and burst split into num_of_parts, for as many processes sharing the
+    hosts' budgets (each gets at least 1 request at once, and a burst of 1).
+
+    :param checker_dict: Dict of checker definitions, in the format of
+        get_checker_dict()
+    :param num_of_parts: Number of processes the budgets are split between
+    """
+    part_checker_dict = {}
+    for i in checker_dict.keys():
+        definition = checker_dict[i].copy()
+        definition.max_concurrent_requests = int(math.ceil(\
+            float(definition.max_concurrent_requests) / num_of_parts))
+        definition.requests_per_second =\
+            float(definition.requests_per_second) / num_of_parts
+        definition.request_burst = max(1.0,\
+            float(definition.request_burst) / num_of_parts)
+        part_checker_dict[i] = definition
+    return part_checker_dict
+
+
+def parse_checker_names(value):
+    """ Return a comma-separated list of checker names (example: an --only
+    value of wot,sucuri) as a list.
+    """
+    return [name.strip().lower() for name in value.split(',') if\
+        name.strip()]
+
+
+def __read_config(config_path):
+    """ Return a ConfigParser.RawConfigParser of the config file at
+    config_path (empty if there is no such file, or config_path is None).
+    """
+    config = ConfigParser.RawConfigParser()
+    if config_path is None:
+        return config
+    try:
+        config.read(config_path)
+    except ConfigParser.Error as exc_obj:
+        raise ValueError('Expecting a checker config file of [name] '\
+            'sections in {} ({})'.format(config_path, exc_obj))
+    for name in config.sections():
+        for option in config.options(name):
+            if option != 'enabled' and option not in _CONFIG_OPTIONS:
+                raise ValueError('Unknown option {} in [{}] of {} (expected '\
+                    'any of: enabled, {})'.format(option, name, config_path,\
+                        ', '.join(sorted(_CONFIG_OPTIONS.keys()))))
+    return config
+
+
+def __load_checker_class(name):
+    """ Import and return the checker.SiteChecker child class of the checker
+    called name.
+    """
+    for (builtin_name, class_path) in BUILTIN_CHECKERS:
+        if builtin_name == name:
+            (module_name, class_name) = class_path.split(':')
+            return getattr(importlib.import_module(module_name), class_name)
+    return dict(__get_plugin_entry_points())[name].load()
+
+
+def __get_plugin_entry_points():
+    """ Return a list of (name, entry point) of every checker registered
+    under ENTRY_POINT_GROUP by an installed package, sorted by name, except
+    those named as a built in checker.
+    """
+    global _plugin_entry_points
+    if _plugin_entry_points is None:
+        # Imported here, as scanning the installed packages is slow and only
+        # a run of checks needs it
+        try:
+            import pkg_resources
+        except ImportError:
+            _plugin_entry_points = []
+        else:
+            builtin_names = [name for (name, _) in BUILTIN_CHECKERS]
+            _plugin_entry_points = sorted([(entry_point.name, entry_point)\
+                for entry_point in pkg_resources.iter_entry_points(\
+                    ENTRY_POINT_GROUP) if entry_point.name not in\
+                        builtin_names])
+    return _plugin_entry_points
@@ -0,0 +1,161 @@
+""" Contains TextRenderer, JsonLinesRenderer and ChangesRenderer classes
+"""
+import json
+import sys
+import time
+
+from sitechecker import history, utils
+
+
+FORMAT_TEXT = 'text'
+FORMAT_JSONL = 'jsonl'
+
+
+class TextRenderer(object):
+    """ Render the results for a URL as the human-readable text report.
+    """
+
+    def render(self, url_task):
+        """ Print the URL header and then each checker's results (via its
+        display_results()), in checker order.
+
+        :param url_task: engine.UrlTask whose checks have all completed
+        """
+        self.__display_url_header(url_task.url_to_check)
+
+        for (temp_checker, result) in zip(url_task.checkers,\
+            url_task.result_list):
+            # Invoke the process_url function for that child class
+            temp_checker.process_url(url_task.url_to_check, result)
+
+    def close(self):
+        """ Nothing to finish for text output.
+        """
+        pass
+
+    @classmethod
+    def __display_url_header(cls, url_to_check):
+        """ Print the formatted URL from user input.
+        """
+        if utils.is_non_empty_str(url_to_check):
+            print
+            print url_to_check
+            print len(url_to_check) * '_'
+
+
+class JsonLinesRenderer(object):
+    """ Render the results for a URL as JSON Lines: one compact JSON record
+    per (URL, checker), from results.CheckResult.to_dict().  A failed check
+    is a results.ErrorResult record.
+    """
+
+    def __init__(self, opt_out=None):
+        """ Initialize an instance of the class.
+
+        :param opt_out: (Optional) File object to write to (default:
+            standard output)
+        """
+        self.out = opt_out if opt_out is not None else sys.stdout
+
+    def render(self, url_task):
+        """ Write one record per checker for the URL, in checker order, with a
+        single write for all of the URL's records.
+
+        :param url_task: engine.UrlTask whose checks have all completed
+        """
+        lines = []
+        for (temp_checker, result) in zip(url_task.checkers,\
+            url_task.result_list):
+            start = time.time()
+            lines.append(json.dumps(result.to_dict(),\
+                separators=(',', ':')) + '\n')
+            temp_checker.timings['render'] += time.time() - start
+        self.out.write(''.join(lines))
+
+    def close(self):
+        """ Flush the records written so far.
+        """
+        self.out.flush()
+
+
+class ChangesRenderer(object):
+    """ Render only what changed since the previous run for each (URL,
+    checker), storing every result in a history.HistoryStore.  Unchanged
+    results and failed checks produce no output, so the output grows with
+    how much the sites change rather than with how many are checked.
+
+    A result with no earlier one to compare with is rendered in full.
+    """
+
+    def __init__(self, history_store, output_format, opt_out=None):
+        """ Initialize an instance of the class.
+
+        :param history_store: history.HistoryStore to compare with and store
+            results in
+        :param output_format: FORMAT_TEXT (report of the changes) or
+            FORMAT_JSONL (one record per changed URL and checker)
+        :param opt_out: (Optional) File object to write JSON Lines to
+            (default: standard output)
+        """
+        self.history_store = history_store
+        self.output_format = output_format
+        self.out = opt_out if opt_out is not None else sys.stdout
+
+    def render(self, url_task):
+        """ Store the URL's results and render those that are new or
+        changed, in checker order.
+
+        :param url_task: engine.UrlTask whose checks have all completed
+        """
+        # (checker, result, changes or None if the result is new)
+        changed = []
+        for (index, previous_result) in\
+            self.history_store.add_url_task(url_task):
+            (temp_checker, result) = (url_task.checkers[index],\
+                url_task.result_list[index])
+            if previous_result is None:
+                changed.append((temp_checker, result, None))
+            else:
+                changes = history.get_changes(previous_result, result)
+                if changes:
+                    changed.append((temp_checker, result, changes))
+
+        if not changed:
+            return
+        if self.output_format == FORMAT_JSONL:
+            lines = []
+            for (temp_checker, result, changes) in changed:
+                start = time.time()
+                record = {'url': result.url, 'checker': result.checker}
+                if changes is None:
+                    record['result'] = result.to_dict()
+                else:
+                    record['changes'] = changes
+                lines.append(json.dumps(record, separators=(',', ':')) +\
+                    '\n')
+                temp_checker.timings['render'] += time.time() - start
+            self.out.write(''.join(lines))
+        else:
+            print
+            print url_task.url_to_check
+            print len(url_task.url_to_check) * '_'
+            for (temp_checker, result, changes) in changed:
+                start = time.time()
+                if changes is None:
+                    temp_checker.display_results(result)
+                else:
+                    temp_checker.display_changes(changes)
+                temp_checker.timings['render'] += time.time() - start
+
+    def close(self):
+        """ Flush the records written so far.
+        """
+        self.out.flush()
+
+
+def get_renderer(output_format):
+    """ Return the renderer for output_format (FORMAT_TEXT or FORMAT_JSONL).
+    """
+    if output_format == FORMAT_JSONL:
+        return JsonLinesRenderer()
+    return TextRenderer()
@@ -0,0 +1,149 @@
+""" Contains CheckResult class and its checker-specific child classes
+"""
+import collections
+
+
+class CheckResult(object):
+    """ Encapsulate the parsed results of one checker for one URL.
+
+    Child classes only declare their fields in __slots__, which keeps
+    results compact when many are held at once.
+    """
+    __slots__ = ('checker', 'url')
+
+    def __init__(self, checker, url, **fields):
+        """ Initialize an instance of the class.
+
+        :param checker: User-friendly name of the checker that produced the
+            result (example: GOOGLE PAGESPEED INSIGHTS)
+        :param url: URL from user input that was checked
+        :param fields: Checker-specific fields (see the child's __slots__);
+            fields not given are None
+        """
+        self.checker = checker
+        self.url = url
+        for field in self.get_field_names():
+            setattr(self, field, fields.pop(field, None))
+        if fields:
+            raise TypeError('Unexpected result field(s): {}'.\
+                format(', '.join(sorted(fields))))
+
+    @classmethod
+    def get_field_names(cls):
+        """ Return the names of the checker-specific fields, in declaration
+        order.
+        """
+        field_names = []
+        for klass in reversed(cls.__mro__):
+            if klass is not CheckResult:
+                field_names.extend(klass.__dict__.get('__slots__', ()))
+        return field_names
+
+    def to_dict(self):
+        """ Return the result as a dict (example: for JSON output), with the
+        URL and checker first and then the fields in declaration order.
+        """
+        result_dict = collections.OrderedDict([('url', self.url),\
+            ('checker', self.checker)])
+        for field in self.get_field_names():
+            result_dict[field] = getattr(self, field)
+        return result_dict
+
+    def with_url(self, url):
+        """ Return a copy of the result for url (example: the same site
+        spelled differently in the user input).  The fields are shared, not
+        copied.
+
+        :param url: URL from user input
+        """
+        return type(self)(self.checker, url, **dict([(field,\
+            getattr(self, field)) for field in self.get_field_names()]))
+
+
+class WotResult(CheckResult):
+    """ WOT scorecard results.
+
+    - server_location: Country the server is located in
+    - reputation: List of 'component: rating' str (example:
+      'Child safety: Excellent')
+    """
+    __slots__ = ('server_location', 'reputation')
+
+
+class SucuriResult(CheckResult):
+    """ Sucuri site check results.
+
+    - scan_findings: List of [finding, status, risk]
+    - blacklist: List of blacklist status str
+    - details: List of website detail str
+    - links: List of links found to other domains or sub domains
+    - scripts: List of scripts included
+    """
+    __slots__ = ('scan_findings', 'blacklist', 'details', 'links', 'scripts')
+
+
+class GoogleResult(CheckResult):
+    """ Google PageSpeed Insights results.
+
+    - score: PageSpeed score out of 100
+    - page_stats: Dict of page statistic: value
+    - rules: List of [rule name, impact] negatively impacting the score
+    """
+    __slots__ = ('score', 'page_stats', 'rules')
+
+
+class W3MarkupResult(CheckResult):
+    """ W3 Markup Validation results.
+
+    - error_count: Number of markup errors
+    - messages: List of [type, line, column, message]
+    """
+    __slots__ = ('error_count', 'messages')
+
+
+class W3CssResult(CheckResult):
+    """ W3 CSS Validation results.
+
+    - counts: Dict of count name (example: errorcount): count
+    - errors: List of [source, line, message]
+    """
+    __slots__ = ('counts', 'errors')
+
+
+class ErrorResult(CheckResult):
+    """ Failed check, in place of the checker's results.
+
+    - error_type: Name of the exception class (example: HTTPError)
+    - error: List of lines describing the error
+    - transient: True if trying again later may succeed (example: timeout or
+      HTTP 503)
+    - retry_after: Seconds the checker site asked to wait before trying
+      again, or None
+    """
+    __slots__ = ('error_type', 'error', 'transient', 'retry_after')
+
+
+def to_record(result):
+    """ Return result as a JSON-serializable dict that from_record() can
+    turn back into a result (example: for a journal or history file).
+
+    :param result: CheckResult child class instance
+    """
+    return {'result_type': type(result).__name__, 'result': result.to_dict()}
+
+
+def from_record(record):
+    """ Return the CheckResult child class instance for a dict created by
+    to_record().
+
+    :param record: dict created by to_record() (possibly read back from JSON)
+    """
+    result_class = globals().get(record['result_type'])
+    if not (isinstance(result_class, type) and\
+        issubclass(result_class, CheckResult)):
+        raise ValueError('Unknown result type: {}'.\
+            format(record['result_type']))
+
+    fields = dict((str(key), value) for (key, value) in\
+        record['result'].items())
+    return result_class(fields.pop('checker'), fields.pop('url'), **fields)
@@ -0,0 +1,205 @@
+""" Contains CheckServer class, a long-running local HTTP JSON API for
+checking URLs
+"""
+import BaseHTTPServer
+import json
+import SocketServer
+import threading
+import time
+import urlparse
+
+from sitechecker import inputs, metrics
+
+
+# Most URLs accepted in one request, so that one client cannot queue an
+# unbounded amount of work
+MAX_BATCH_URLS = 1000
+
+# Largest request body read, in bytes
+_MAX_BODY_BYTES = 1024 * 1024
+
+
+class CheckServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """ Serve checks over a local HTTP JSON API, with the checker sessions,
+    connections and response cache of one engine.BatchEngine kept warm
+    between requests.
+
+    Each HTTP request is handled on its own thread, and its URLs are handed
+    to the engine's worker threads, so every checker host's concurrency cap
+    and rate limit hold over all clients together.  Concurrent requests for
+    the same URL share one set of checks.
+
+    API:
+      POST /check  {"url": "www.google.com"} or {"urls": [...]}
+      GET  /check?url=www.google.com
+      GET  /metrics  (Prometheus text format, see metrics.py)
+      GET  /health
+    Checks are answered as {"results": [{"url": ..., "checks": [record,
+    ...]}, ...]}, in request order, with one results.CheckResult.to_dict()
+    record per checker (an invalid URL gets "error" instead of "checks").
+    The status is 400 if no URL of the request is valid.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, batch_engine, run_stats):
+        """ Initialize an instance of the class, and start batch_engine's
+        worker threads.
+
+        :param address: (host, port) tuple to listen on
+        :param batch_engine: engine.BatchEngine to run the checks with
+        :param run_stats: stats.RunStats to add every checked URL to
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, _CheckRequestHandler)
+        self.batch_engine = batch_engine
+        self.run_stats = run_stats
+        self.coalesced_cnt = 0
+        self.start_time = time.time()
+        # Normalized URL: engine.UrlTask in flight
+        self.__in_flight = {}
+        self.__lock = threading.Lock()
+        self.batch_engine.start()
+
+    def check_urls(self, urls_to_check):
+        """ Check every URL, joining the checks already in flight for the
+        same URL, and return the results as a list of dicts, in order.
+
+        :param urls_to_check: List of URLs from the client
+        """
+        submitted = []
+        url_tasks = []
+        with self.__lock:
+            for url_item in urls_to_check:
+                url_item = inputs.UrlReader.normalize_url(url_item)
+                url_task = self.__in_flight.get(url_item)
+                if url_task is not None:
+                    self.coalesced_cnt += 1
+                else:
+                    url_task = self.batch_engine.submit(url_item)
+                    if url_task.is_valid:
+                        self.__in_flight[url_item] = url_task
+                        submitted.append(url_task)
+                url_tasks.append(url_task)
+
+        for url_task in submitted:
+            url_task.wait()
+            # Later requests for the URL start new checks (fresh from the
+            # cache, if it is on)
+            with self.__lock:
+                if self.__in_flight.get(url_task.url_to_check) is url_task:
+                    del self.__in_flight[url_task.url_to_check]
+                self.run_stats.add(url_task)
+
+        url_dicts = []
+        for url_task in url_tasks:
+            url_task.wait()
+            if url_task.is_valid:
+                url_dicts.append({'url': url_task.url_to_check,\
+                    'checks': [result.to_dict() for result in\
+                        url_task.result_list]})
+            else:
+                url_dicts.append({'url': url_task.url_to_check,\
+                    'error': 'Expecting URL in format like www.google.com'})
+        return url_dicts
+
+    def get_metrics_text(self):
+        """ Return the metrics since the server started, in the Prometheus
+        text format.
+        """
+        with self.__lock:
+            return metrics.get_metrics_text(self.batch_engine, self.run_stats)
+
+    def get_health(self):
+        """ Return a dict of the server's uptime and counters.
+        """
+        with self.__lock:
+            return {'status': 'ok',\
+                'uptime_seconds': round(time.time() - self.start_time, 3),\
+                'urls_checked': self.batch_engine.url_cnt,\
+                'urls_coalesced': self.coalesced_cnt,\
+                'urls_in_flight': len(self.__in_flight)}
+
+    def server_close(self):
+        """ Stop listening, and wait for the engine's worker threads to
+        finish the checks queued so far and exit.
+        """
+        BaseHTTPServer.HTTPServer.server_close(self)
+        self.batch_engine.finish(opt_wait=True)
+
+
+class _CheckRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Handle one HTTP request to a CheckServer.
+    """
+
+    server_version = 'sitechecker'
+
+    def do_GET(self):
+        """ Answer /check?url=..., /metrics or /health.
+        """
+        parsed_url = urlparse.urlparse(self.path)
+        if parsed_url.path == '/check':
+            urls_to_check = urlparse.parse_qs(parsed_url.query).get('url')
+            if not urls_to_check:
+                self.__send_json(400, {'error': 'Expecting ?url='})
+            else:
+                self.__send_check_results(urls_to_check)
+        elif parsed_url.path == '/metrics':
+            self.__send(200, 'text/plain; version=0.0.4',\
+                self.server.get_metrics_text())
+        elif parsed_url.path == '/health':
+            self.__send_json(200, self.server.get_health())
+        else:
+            self.__send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        """ Answer /check with a JSON body of {"url": ...} or {"urls":
+        [...]}.
+        """
+        if urlparse.urlparse(self.path).path != '/check':
+            self.__send_json(404, {'error': 'Not found'})
+            return
+
+        body_bytes = int(self.headers.getheader('content-length') or 0)
+        if body_bytes > _MAX_BODY_BYTES:
+            self.__send_json(413, {'error': 'Request body too large'})
+            return
+        try:
+            body = json.loads(self.rfile.read(body_bytes))
+            urls_to_check = [body['url']] if 'url' in body else body['urls']
+            if not isinstance(urls_to_check, list) or not all(\
+                [isinstance(url_item, basestring) for url_item in\
+                    urls_to_check]):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            self.__send_json(400, {'error': 'Expecting a JSON body of '\
+                '{"url": "www.google.com"} or {"urls": [...]}'})
+            return
+        self.__send_check_results([url_item.encode('utf-8') for url_item\
+            in urls_to_check])
+
+    def __send_check_results(self, urls_to_check):
+        """ Check urls_to_check and send their results.
+        """
+        if len(urls_to_check) > MAX_BATCH_URLS:
+            self.__send_json(413, {'error': 'Expecting at most {} URLs per '\
+                'request'.format(MAX_BATCH_URLS)})
+        else:
+            url_dicts = self.server.check_urls(urls_to_check)
+            self.__send_json(200 if any(['checks' in url_dict for url_dict\
+                in url_dicts]) else 400, {'results': url_dicts})
+
+    def __send_json(self, status, body_dict):
+        """ Send body_dict as a JSON response.
+        """
+        self.__send(status, 'application/json',\
+            json.dumps(body_dict, separators=(',', ':')) + '\n')
+
+    def __send(self, status, content_type, body):
+        """ Send a response with body.
+        """
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
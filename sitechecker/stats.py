@@ -0,0 +1,136 @@
+""" Contains RunStats class
+"""
+import bisect
+import collections
+import math
+import sys
+
+
+# Stages of a check, in the order they happen
+STAGES = ('connect', 'ttfb', 'download', 'parse', 'render')
+
+# Upper bounds (seconds) of the request latency histogram buckets; slower
+# requests fall in a last, unbounded bucket
+LATENCY_BUCKETS_SECONDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_HISTOGRAM_WIDTH = 40
+
+
+class CheckerStats(object):
+    """ Encapsulate the totals of one checker over a run.
+    """
+
+    def __init__(self):
+        """ Initialize an instance of the class.
+        """
+        self.check_cnt = 0
+        self.request_cnt = 0
+        self.response_bytes = 0
+        # Stage: seconds
+        self.stage_seconds = collections.Counter()
+        # Number of checks per LATENCY_BUCKETS_SECONDS bucket, plus 1 for
+        # slower checks
+        self.latency_bucket_cnts = [0] * (len(LATENCY_BUCKETS_SECONDS) + 1)
+        self.latency_seconds = 0.0
+
+    def add(self, temp_checker):
+        """ Add the timings of one completed check.
+
+        :param temp_checker: checker.SiteChecker child class instance whose
+            check has completed
+        """
+        self.check_cnt += 1
+        self.request_cnt += temp_checker.request_cnt
+        self.response_bytes += temp_checker.response_bytes
+        self.stage_seconds.update(temp_checker.timings)
+        if temp_checker.request_cnt > 0:
+            # Time spent on the network, over every request attempt
+            latency = sum([temp_checker.timings[stage] for stage in\
+                ('connect', 'ttfb', 'download')])
+            self.latency_seconds += latency
+            self.latency_bucket_cnts[bisect.bisect_left(\
+                LATENCY_BUCKETS_SECONDS, latency)] += 1
+
+
+class RunStats(object):
+    """ Encapsulate per-checker stage timings, byte counts and request
+    latency histograms over a run, for the --stats summary.
+    """
+
+    def __init__(self):
+        """ Initialize an instance of the class.
+        """
+        # Checker name: CheckerStats, in the order checkers were first seen
+        self.checker_stats = collections.OrderedDict()
+
+    def add(self, url_task):
+        """ Add the timings of every check for a URL, once it is rendered.
+
+        :param url_task: engine.UrlTask whose results have been rendered
+        """
+        for temp_checker in url_task.checkers:
+            self.checker_stats.setdefault(temp_checker.name,\
+                CheckerStats()).add(temp_checker)
+
+    def display(self, opt_out=None):
+        """ Print the stage totals per checker, then each checker's request
+        latency histogram.
+
+        :param opt_out: (Optional) File object to print to (default: standard
+            error, so that the summary stays out of the report)
+        """
+        out = opt_out if opt_out is not None else sys.stderr
+        totals = CheckerStats()
+        for checker_stats in self.checker_stats.values():
+            totals.check_cnt += checker_stats.check_cnt
+            totals.request_cnt += checker_stats.request_cnt
+            totals.response_bytes += checker_stats.response_bytes
+            totals.stage_seconds.update(checker_stats.stage_seconds)
+
+        print >> out
+        print >> out, 'Seconds per stage:'
+        row_format = '{:<28}{:>7}{:>9}' + '{:>10}' * len(STAGES) + '{:>10}'
+        print >> out, row_format.format('Checker', 'checks', 'requests',\
+            *(STAGES + ('KB',)))
+        for (checker_name, checker_stats) in self.checker_stats.items() +\
+            [('TOTAL', totals)]:
+            print >> out, row_format.format(checker_name[:27],\
+                checker_stats.check_cnt, checker_stats.request_cnt,\
+                *(['{:.3f}'.format(checker_stats.stage_seconds[stage]) for\
+                    stage in STAGES] + ['{:.1f}'.format(\
+                        checker_stats.response_bytes / 1024.0)]))
+
+        for (checker_name, checker_stats) in self.checker_stats.items():
+            requested_cnt = sum(checker_stats.latency_bucket_cnts)
+            if requested_cnt == 0:
+                continue
+            print >> out
+            print >> out, '{} request latency ({} check(s), mean {:.3f}s):'.\
+                format(checker_name, requested_cnt,\
+                    checker_stats.latency_seconds / requested_cnt)
+            max_cnt = max(checker_stats.latency_bucket_cnts)
+            # Leave out the empty buckets above the slowest check
+            last_index = max([index for (index, bucket_cnt) in\
+                enumerate(checker_stats.latency_bucket_cnts) if bucket_cnt])
+            for (index, bucket_cnt) in\
+                enumerate(checker_stats.latency_bucket_cnts[:last_index + 1]):
+                label = '<= {}s'.format(LATENCY_BUCKETS_SECONDS[index]) if\
+                    index < len(LATENCY_BUCKETS_SECONDS) else '> {}s'.format(\
+                        LATENCY_BUCKETS_SECONDS[-1])
+                print >> out, '  {:>8} {:>6} {}'.format(label, bucket_cnt,\
+                    '#' * int(round(float(bucket_cnt) / max_cnt *\
+                        _HISTOGRAM_WIDTH)))
+
+
+def get_percentile(values, percent):
+    """ Return the nearest-rank percentile of values (example: percent 95 for
+    p95), or None if there are no values.
+
+    :param values: List of numbers
+    :param percent: Percentile, from 0 to 100
+    """
+    if not values:
+        return None
+    sorted_values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
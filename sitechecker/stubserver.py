@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+""" Contains StubServer class, a local stand-in for the checker sites
+
+Serves made-up but realistically shaped WOT, Sucuri, Google PageSpeed
+Insights and W3 Markup/CSS Validation responses (the same paths, methods and
+payload structure that the checker.SiteChecker child classes parse), with
+configurable latency, error rate and rate limiting, so that the engine can be
+measured without requesting the real checker sites.
+
+optional arguments:
+  -h, --help            show this help message and exit
+  --port port           Port to listen on.  (Default: 8000)
+  --latency seconds     Average response time, varied by +/-50% per request.
+                        (Default: 0.0)
+  --error-rate rate     Fraction of requests answered with HTTP 503.
+                        (Default: 0.0)
+  --rate-limit requests
+                        Requests per second answered before HTTP 429 (with
+                        Retry-After) is returned.  (Default: no limit)
+"""
+import argparse
+import BaseHTTPServer
+import collections
+import json
+import random
+import socket
+import SocketServer
+import sys
+import threading
+import time
+import urlparse
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+# Filler repeated in HTML pages, so that pages are parsed at about the size
+# of the real checker sites' pages
+_WOT_FILLER_ITEMS = 300
+_SUCURI_FILLER_ITEMS = 400
+
+_WOT_RATINGS = ['Excellent', 'Good', 'Unsatisfactory', 'Poor', 'Very poor']
+_SUCURI_FINDINGS = ['Malware', 'Website Blacklisting', 'Injected SPAM',\
+    'Defacements']
+_SUCURI_BLACKLISTS = ['by Google Safe Browsing', 'by Norton Safe Web',\
+    'on Phish tank', 'on the Opera browser', 'by SiteAdvisor',\
+    'by the Sucuri Malware Labs blacklist', 'on SpamHaus DBL',\
+    'by Bitdefender', 'on Yandex (via Sophos)', 'by ESET']
+_GOOGLE_RULES = [('AvoidLandingPageRedirects', 'Avoid landing page '\
+    'redirects'), ('EnableGzipCompression', 'Enable compression'),\
+    ('LeverageBrowserCaching', 'Leverage browser caching'),\
+    ('MainResourceServerResponseTime', 'Reduce server response time'),\
+    ('MinifyCss', 'Minify CSS'), ('MinifyHTML', 'Minify HTML'),\
+    ('MinifyJavaScript', 'Minify JavaScript'),\
+    ('MinimizeRenderBlockingResources', 'Eliminate render-blocking '\
+        'JavaScript and CSS in above-the-fold content'),\
+    ('OptimizeImages', 'Optimize images'),\
+    ('PrioritizeVisibleContent', 'Prioritize visible content')]
+_CSS_MESSAGES = ['Parse Error', 'Unknown dimension',\
+    'Property zoom doesn\'t exist : ',\
+    '0 is not a transition value : ',\
+    'distribute-all-lines is not a text-justify value : ']
+_MARKUP_MESSAGES = ['Element "font" not allowed as child of element "div" '\
+    'in this context.', 'Duplicate ID "nav".',\
+    'Bad value "" for attribute "src" on element "img": Must be non-empty.',\
+    'Stray end tag "span".']
+
+
+class StubServer(object):
+    """ Encapsulate a local HTTP server answering like the checker sites.
+
+    Responses are generated from the URL being checked, so the same URL
+    always gets the same results.  Every server answers for every checker
+    site, by path; to keep per-host limits apart, run one per checker host
+    (see start_for_checkers()).
+    """
+
+    def __init__(self, opt_host=DEFAULT_HOST, opt_port=0, opt_latency=0.0,\
+        opt_error_rate=0.0, opt_rate_limit=None):
+        """ Initialize an instance of the class and bind its port.
+
+        :param opt_host: (Optional) Interface to listen on
+        :param opt_port: (Optional) Port to listen on (default: any free
+            port)
+        :param opt_latency: (Optional) Average seconds before responding;
+            each request waits a random 50% to 150% of it
+        :param opt_error_rate: (Optional) Fraction (0 to 1) of requests
+            answered with HTTP 503
+        :param opt_rate_limit: (Optional) Requests per second answered before
+            the rest are answered with HTTP 429 (default: no limit)
+        """
+        self.latency = opt_latency
+        self.error_rate = opt_error_rate
+        self.rate_limit = opt_rate_limit
+        self.request_cnt = 0
+        self.error_cnt = 0
+        self.throttled_cnt = 0
+        self.__recent_requests = collections.deque()
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__http_server = _ThreadingHTTPServer((opt_host, opt_port),\
+            _StubRequestHandler)
+        self.__http_server.stub = self
+        self.base_url = 'http://{}:{}'.format(opt_host,\
+            self.__http_server.server_address[1])
+
+    def start(self):
+        """ Serve requests on a background thread.
+        """
+        self.__thread = threading.Thread(target=self.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def serve_forever(self):
+        """ Serve requests until stop() is called.
+        """
+        self.__http_server.serve_forever()
+
+    def stop(self):
+        """ Stop serving and release the port.
+        """
+        self.__http_server.shutdown()
+        self.__http_server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def get_response(self, method, path):
+        """ Return the (HTTP status, headers dict, body) answer to a request,
+        without the latency.
+
+        :param method: HTTP method (example: GET)
+        :param path: Request path including the query (example:
+            /en/scorecard/apple.com)
+        """
+        with self.__lock:
+            self.request_cnt += 1
+            is_throttled = self.__is_over_rate_limit()
+            if is_throttled:
+                self.throttled_cnt += 1
+            is_error = not is_throttled and\
+                random.random() < self.error_rate
+            if is_error:
+                self.error_cnt += 1
+
+        if is_throttled:
+            return (429, {'Retry-After': '1'}, 'Too Many Requests')
+        if is_error:
+            return (503, {}, 'Service Unavailable')
+
+        parsed = urlparse.urlparse(path)
+        query = urlparse.parse_qs(parsed.query)
+        for (route_method, route_path, content_type, get_url, get_body) in\
+            _ROUTES:
+            if parsed.path.startswith(route_path) and method == route_method:
+                url_to_check = get_url(parsed.path[len(route_path):], query)
+                if not url_to_check:
+                    return (400, {}, 'Bad Request')
+                return (200, {'Content-Type': content_type},\
+                    get_body(url_to_check, random.Random(url_to_check)))
+        return (404, {}, 'Not Found')
+
+    def get_delay(self):
+        """ Return the seconds to wait before answering the next request.
+        """
+        return self.latency * random.uniform(0.5, 1.5)
+
+    def __is_over_rate_limit(self):
+        """ Return True if more than rate_limit requests arrived in the last
+        second.  Call with the lock held.
+        """
+        if self.rate_limit is None:
+            return False
+        now = time.time()
+        while self.__recent_requests and\
+            self.__recent_requests[0] <= now - 1:
+            self.__recent_requests.popleft()
+        if len(self.__recent_requests) >= self.rate_limit:
+            return True
+        self.__recent_requests.append(now)
+        return False
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn,\
+    BaseHTTPServer.HTTPServer):
+    """ HTTP server with a thread per connection.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        """ Ignore clients that hung up before the response was sent
+        (example: a request timed out at a deadline, or lost a hedged race).
+        """
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(self, request,\
+                client_address)
+
+
+class _StubRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Answer requests with StubServer.get_response().
+    """
+    # Keep-alive, like the real checker sites
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        """ Answer a GET request.
+        """
+        self.__respond('GET')
+
+    def do_POST(self):
+        """ Answer a POST request, ignoring its body.
+        """
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.__respond('POST')
+
+    def log_message(self, format, *args):
+        """ Don't log every request to standard error.
+        """
+        pass
+
+    def __respond(self, method):
+        """ Wait for the configured latency and send the response.
+        """
+        stub = self.server.stub
+        time.sleep(stub.get_delay())
+        (status, headers, body) = stub.get_response(method, self.path)
+        self.send_response(status)
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def __get_path_url(path_rest, query):
+    """ Return the URL to check from the end of the path (example: WOT).
+    """
+    return path_rest
+
+
+def __get_query_url(key):
+    """ Return a function returning the URL to check, without its scheme,
+    from the query parameter key (example: Google).
+    """
+    def get_url(path_rest, query):
+        """ Return the URL to check from the query.
+        """
+        value = query.get(key, [''])[0]
+        return value.split('://', 1)[-1]
+    return get_url
+
+
+def __get_wot_body(url_to_check, rand):
+    """ Return a WOT scorecard page.
+    """
+    filler = ''.join(['<li class="nav-item"><a href="/en/scorecard/site{0}.'\
+        'com" title="site{0}.com">site{0}.com</a></li>\n'.format(\
+            rand.randint(1, 99999)) for _ in range(_WOT_FILLER_ITEMS)])
+    return '<!DOCTYPE html>\n<html><head><title>{0} - WOT Scorecard</title>'\
+        '<script src="/js/app.js"></script></head><body>\n'\
+        '<ul class="nav">{1}</ul>\n<div class="scorecard">'\
+        '<h1>{0}</h1><p>Server location: <img id="country" alt="{2}" '\
+        'src="/flags/us.png"/></p>\n'\
+        '<div class="rep-comp"><span class="name">Trustworthiness</span>'\
+        '<span class="rating">{3}</span></div>\n'\
+        '<div class="rep-comp"><span class="name">Child safety</span>'\
+        '<span class="rating">{4}</span></div>\n'\
+        '</div><footer>{1}</footer></body></html>'.format(url_to_check,\
+            filler, rand.choice(['United States', 'Germany', 'Ireland']),\
+            rand.choice(_WOT_RATINGS), rand.choice(_WOT_RATINGS))
+
+
+def __get_sucuri_body(url_to_check, rand):
+    """ Return a Sucuri SiteCheck results page.
+    """
+    host = 'www.' + url_to_check.replace('www.', '')
+    findings = ''.join(['<tr><td>{}</td><td>Not Detected</td>'\
+        '<td>Low Risk</td></tr>\n'.format(finding) for finding in\
+            _SUCURI_FINDINGS])
+    blacklists = ''.join(['<tr><td>Domain clean {}: {}</td></tr>\n'.\
+        format(blacklist, url_to_check) for blacklist in _SUCURI_BLACKLISTS])
+    links = '\n'.join(['http://{}/page{}'.format(host, i) for i in\
+        range(rand.randint(1, 5))] + ['http://cdn{}.example.net/{}'.format(\
+            i, url_to_check) for i in range(rand.randint(0, 12))])
+    scripts = '\n'.join(['/scripts/app{}.js'.format(i) for i in\
+        range(rand.randint(1, 12))])
+    filler = ''.join(['<p class="promo">Scan website {0} for malware and '\
+        'security issues, item {0}.</p>\n'.format(rand.randint(1, 99999))\
+            for _ in range(_SUCURI_FILLER_ITEMS)])
+    return '<!DOCTYPE html>\n<html><head><title>Sucuri SiteCheck - {0}'\
+        '</title></head><body>\n<div class="promos">{1}</div>\n'\
+        '<table class="table scan-findings"><tbody>\n{2}</tbody></table>\n'\
+        '<table class="table scan-findings"><tbody>\n{3}</tbody></table>\n'\
+        '<div id="sitecheck-details">\n<div id="collapseOne">\n'\
+        '<p>Scan for: <a href="http://{4}/">http://{4}/</a></p>\n'\
+        '<p>Hostname: {4}</p>\n<p>IP address: 10.{5}.{6}.{7}</p>\n'\
+        '<p><b>System Details:</b></p>\n<p>Running on: {8}</p>\n</div>\n'\
+        '<div id="collapseTwo">\n{9}\n</div>\n'\
+        '<div id="collapseThree">\n{10}\n</div>\n</div>\n'\
+        '</body></html>'.format(url_to_check, filler, findings, blacklists,\
+            host, rand.randint(0, 255), rand.randint(0, 255),\
+            rand.randint(1, 254), rand.choice(['Apache', 'nginx']), links,\
+            scripts)
+
+
+def __get_google_body(url_to_check, rand):
+    """ Return a Google PageSpeed Insights API (v1) response.
+    """
+    rule_results = {}
+    for (rule_key, rule_name) in _GOOGLE_RULES:
+        rule_results[rule_key] = {'localizedRuleName': rule_name,\
+            'ruleImpact': round(rand.uniform(0, 15), 4) if\
+                rand.random() < 0.6 else 0.0,\
+            'urlBlocks': [{'header': {'format': 'Fix this rule.'},\
+                'urls': [{'result': {'format': 'http://{}/static/{}.js'.\
+                    format(url_to_check, i)}} for i in range(5)]}]}
+    return json.dumps({'kind': 'pagespeedonline#result',\
+        'id': 'http://{}/'.format(url_to_check), 'responseCode': 200,\
+        'title': url_to_check, 'score': rand.randint(40, 100),\
+        'pageStats': {'numberResources': rand.randint(10, 120),\
+            'numberHosts': rand.randint(1, 20),\
+            'totalRequestBytes': rand.randint(1000, 9000),\
+            'numberStaticResources': rand.randint(5, 100),\
+            'htmlResponseBytes': rand.randint(5000, 90000),\
+            'cssResponseBytes': rand.randint(1000, 500000),\
+            'imageResponseBytes': rand.randint(1000, 900000),\
+            'javascriptResponseBytes': rand.randint(1000, 900000),\
+            'otherResponseBytes': rand.randint(0, 5000),\
+            'numberJsResources': rand.randint(0, 30),\
+            'numberCssResources': rand.randint(0, 10)},\
+        'formattedResults': {'locale': 'en_US',\
+            'ruleResults': rule_results},\
+        'version': {'major': 1, 'minor': 15}})
+
+
+def __get_w3_markup_body(url_to_check, rand):
+    """ Return a W3 Markup Validation (Nu checker) JSON response.
+    """
+    messages = [{'type': 'info', 'message': 'This interface to HTML5 '\
+        'document checking is deprecated.'}]
+    for _ in range(rand.randint(0, 40)):
+        messages.append({'type': 'error', 'lastLine': rand.randint(1, 900),\
+            'lastColumn': rand.randint(1, 120),\
+            'message': rand.choice(_MARKUP_MESSAGES)})
+    return json.dumps({'url': 'http://{}'.format(url_to_check),\
+        'messages': messages})
+
+
+def __get_w3_css_body(url_to_check, rand):
+    """ Return a W3 CSS Validation JSON response.
+    """
+    error_cnt = rand.randint(0, 200)
+    source = 'http://{}/styles/main.css'.format(url_to_check)
+    errors = [{'source': source, 'context': '.nav', 'type': 'parse-error',\
+        'line': line, 'message': rand.choice(_CSS_MESSAGES)} for line in\
+            sorted(rand.sample(xrange(1, 5000), error_cnt))]
+    return json.dumps({'cssvalidation': {'uri': 'http://{}'.\
+        format(url_to_check), 'checkedby': 'http://www.w3.org/2005/07/'\
+        'css-validator', 'csslevel': 'css3', 'date': '2015-06-01T00:00:00Z',\
+        'validity': error_cnt == 0, 'errors': errors,\
+        'result': {'errorcount': error_cnt,\
+            'warningcount': rand.randint(0, 150)}}})
+
+
+# [HTTP method, path prefix, content type, function returning the URL to
+# check from the request, function returning the body], matching the checker
+# base URLs of the built in checkers (see registry.py)
+_ROUTES = [
+    ['GET', '/en/scorecard/', 'text/html; charset=utf-8', __get_path_url,\
+        __get_wot_body],
+    ['POST', '/results/', 'text/html; charset=utf-8', __get_path_url,\
+        __get_sucuri_body],
+    ['GET', '/pagespeedonline/v1/runPagespeed', 'application/json; '\
+        'charset=UTF-8', __get_query_url('url'), __get_google_body],
+    ['GET', '/check', 'application/json', __get_query_url('uri'),\
+        __get_w3_markup_body],
+    ['GET', '/css-validator/validator', 'application/json',\
+        __get_query_url('uri'), __get_w3_css_body]
+]
+
+
+def rebase_url(base_url, stub_base_url):
+    """ Return base_url with its scheme and host replaced by those of
+    stub_base_url (example: https://www.mywot.com/en/scorecard/ becomes
+    http://127.0.0.1:8000/en/scorecard/).
+    """
+    parsed = urlparse.urlparse(base_url)
+    stub_parsed = urlparse.urlparse(stub_base_url)
+    return urlparse.urlunparse((stub_parsed.scheme, stub_parsed.netloc) +\
+        parsed[2:])
+
+
+def start_for_checkers(checker_dict, **stub_options):
+    """ Start a StubServer per checker host and return (list of StubServer,
+    copy of checker_dict with the base URLs pointing at them).
+
+    Each checker host gets its own server (and so its own port), so that the
+    engine still keeps per-host concurrency caps, rate limits and connection
+    pools apart.
+
+    :param checker_dict: Dict of checker definitions, in the format of
+        registry.get_checker_dict()
+    :param stub_options: Keyword arguments for StubServer (example:
+        opt_latency=0.2)
+    """
+    stub_servers = {}
+    stub_checker_dict = {}
+    for i in sorted(checker_dict.keys()):
+        host = urlparse.urlparse(checker_dict[i].base_url).netloc
+        if host not in stub_servers:
+            stub_servers[host] = StubServer(**stub_options)
+            stub_servers[host].start()
+        stub_checker_dict[i] = checker_dict[i].copy()
+        stub_checker_dict[i].base_url = rebase_url(checker_dict[i].base_url,\
+            stub_servers[host].base_url)
+    return (stub_servers.values(), stub_checker_dict)
+
+
+def main():
+    """ Serve the checker site stand-ins until Ctrl-C.
+    """
+    parser = argparse.ArgumentParser(description='Local stand-in for the '\
+        'checker sites')
+    parser.add_argument('--port', metavar='port', type=int,\
+        default=DEFAULT_PORT, help='Port to listen on.  (Default: {})'.\
+            format(DEFAULT_PORT))
+    parser.add_argument('--latency', metavar='seconds', type=float,\
+        default=0.0, help='Average response time, varied by +/-50%% per '\
+            'request.  (Default: 0.0)')
+    parser.add_argument('--error-rate', metavar='rate', type=float,\
+        default=0.0, help='Fraction of requests answered with HTTP 503.  '\
+            '(Default: 0.0)')
+    parser.add_argument('--rate-limit', metavar='requests', type=float,\
+        help='Requests per second answered before HTTP 429 (with '\
+            'Retry-After) is returned.  (Default: no limit)')
+    args = parser.parse_args()
+
+    stub = StubServer(opt_port=args.port, opt_latency=args.latency,\
+        opt_error_rate=args.error_rate, opt_rate_limit=args.rate_limit)
+    print 'Serving checker site stand-ins on {} (Ctrl-C to stop)'.\
+        format(stub.base_url)
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
+else:
+    pass
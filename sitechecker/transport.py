@@ -0,0 +1,191 @@
+""" Contains SessionPool class and the retry policy for checker site
+requests
+"""
+import random
+import threading
+import time
+import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3 import connection, connectionpool
+
+from sitechecker import cassette
+
+
+BASE_RETRY_DELAY_SECONDS = 1
+MAX_RETRY_DELAY_SECONDS = 30
+
+# Seconds spent opening connections (DNS, TCP and TLS) by the current thread
+# since reset_connect_seconds()
+_connect_timer = threading.local()
+
+
+class SessionPool(object):
+    """ Encapsulate one keep-alive requests.Session per checker host.
+
+    Checkers for the same host share a session, so repeated requests to the
+    same few providers reuse their TCP and TLS connections instead of paying
+    a new handshake every time.
+    """
+
+    def __init__(self, opt_cassette=None):
+        """ Initialize an instance of the class.
+
+        :param opt_cassette: (Optional) A cassette.Cassette for every session
+            to replay responses from, or to record responses in
+        """
+        self.cassette = opt_cassette
+        self.__sessions = {}
+        self.__lock = threading.Lock()
+
+    def add_host(self, base_url, pool_size):
+        """ Create the session for the host of base_url, unless the host
+        already has one.
+
+        :param base_url: Base URL of a checker (example:
+            http://checkyoursiteforbadstuff.com/uri=)
+        :param pool_size: Number of connections to keep open to the host
+            (i.e. the number of concurrent requests allowed to the host)
+        """
+        host = urlparse.urlparse(base_url).netloc
+        with self.__lock:
+            if host not in self.__sessions:
+                session = requests.Session()
+                if self.cassette is not None:
+                    adapter = cassette.CassetteAdapter(self.cassette,\
+                        pool_connections=1, pool_maxsize=pool_size)
+                else:
+                    adapter = HTTPAdapter(pool_connections=1,\
+                        pool_maxsize=pool_size)
+                adapter.poolmanager.pool_classes_by_scheme = {\
+                    'http': _TimedHTTPConnectionPool,\
+                    'https': _TimedHTTPSConnectionPool}
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.__sessions[host] = session
+
+    def get_session(self, base_url):
+        """ Return the session for the host of base_url, or None if the host
+        was never added.
+
+        :param base_url: Base URL of a checker
+        """
+        return self.__sessions.get(urlparse.urlparse(base_url).netloc)
+
+    def get_connection_stats(self):
+        """ Return a dict of host: (number of requests, number of connections
+        opened) over the life of the pool.
+        """
+        stats = {}
+        for (host, session) in self.__sessions.items():
+            request_cnt = 0
+            connection_cnt = 0
+            # Sessions are mounted with a single adapter for both schemes
+            pool_manager = session.get_adapter('https://').poolmanager
+            for key in pool_manager.pools.keys():
+                conn_pool = pool_manager.pools.get(key)
+                if conn_pool is not None:
+                    request_cnt += conn_pool.num_requests
+                    connection_cnt += conn_pool.num_connections
+            stats[host] = (request_cnt, connection_cnt)
+        return stats
+
+
+class _TimedConnectionMixin(object):
+    """ Add the time taken to open the connection to the thread's connect
+    timer.
+    """
+
+    def connect(self):
+        """ Open the connection, timing it.
+        """
+        start = time.time()
+        try:
+            super(_TimedConnectionMixin, self).connect()
+        finally:
+            _connect_timer.seconds = get_connect_seconds() + time.time() -\
+                start
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, connection.HTTPConnection):
+    """ HTTP connection whose connect() is timed.
+    """
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin,\
+    connection.HTTPSConnection):
+    """ HTTPS connection whose connect() (including the TLS handshake) is
+    timed.
+    """
+    pass
+
+
+class _TimedHTTPConnectionPool(connectionpool.HTTPConnectionPool):
+    """ HTTP connection pool of timed connections.
+    """
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(connectionpool.HTTPSConnectionPool):
+    """ HTTPS connection pool of timed connections.
+    """
+    ConnectionCls = _TimedHTTPSConnection
+
+
+def reset_connect_seconds():
+    """ Start timing the connections opened by the current thread from 0.
+    """
+    _connect_timer.seconds = 0.0
+
+
+def get_connect_seconds():
+    """ Return the seconds the current thread has spent opening connections
+    through a SessionPool session since reset_connect_seconds().
+    """
+    return getattr(_connect_timer, 'seconds', 0.0)
+
+
+def is_transient_error(exc_obj):
+    """ Return True if the request that raised exc_obj may succeed when
+    tried again: connection errors, timeouts, HTTP 429 (too many requests)
+    and HTTP 5xx (server errors).
+    """
+    if isinstance(exc_obj, (requests.exceptions.ConnectionError,\
+        requests.exceptions.Timeout)):
+        return True
+    if isinstance(exc_obj, requests.exceptions.HTTPError) and\
+        exc_obj.response is not None:
+        return exc_obj.response.status_code == 429 or\
+            exc_obj.response.status_code >= 500
+    return False
+
+
+def get_retry_after(exc_obj):
+    """ Return the seconds to wait given by the Retry-After header of the
+    response that raised exc_obj, or None.
+    """
+    response = getattr(exc_obj, 'response', None)
+    if response is not None:
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def get_retry_delay(attempt, opt_retry_after=None):
+    """ Return the seconds to wait before retry number attempt (1 for the
+    first retry): capped exponential backoff with full jitter, but at least
+    what the checker site asked for.
+
+    :param attempt: Number of the retry about to be made
+    :param opt_retry_after: (Optional) Seconds the checker site asked to
+        wait (from get_retry_after())
+    """
+    delay = random.uniform(0, min(MAX_RETRY_DELAY_SECONDS,\
+        BASE_RETRY_DELAY_SECONDS * 2 ** (attempt - 1)))
+    if opt_retry_after is not None:
+        delay = max(delay, min(opt_retry_after, MAX_RETRY_DELAY_SECONDS))
+    return delay
@@ -16,38 +16,64 @@ def is_non_empty_str(p_obj):
         return False
 
 
-def display_exception(opt_prepend=None):
+def display_exception(opt_prepend=None, opt_exc_info=None):
     """ Parse and print details about the exception that is currently being
-    handled.
+    handled, and then exit.
 
     :param opt_prepend: (Optional) A message to prepend before the exception
         details are printed.
+    :param opt_exc_info: (Optional) A sys.exc_info() tuple captured earlier
+        to display instead of the exception currently being handled.
+    """
+    print
+    if opt_prepend:
+        print opt_prepend
+        print
+    for line in format_exception(opt_exc_info):
+        print line
+    print
+    exit_script()
+
+
+def format_exception(opt_exc_info=None):
+    """ Parse details about the exception that is currently being handled and
+    return them as a list of lines to print.
+
+    :param opt_exc_info: (Optional) A sys.exc_info() tuple captured earlier
+        to describe instead of the exception currently being handled.
     """
     # Following parsing logic adapted from
     # http://stackoverflow.com/questions/14519177/
     #   python-exception-handling-line-number?lq=1
-    exc_type, exc_obj, exc_tb = sys.exc_info()
+    exc_type, exc_obj, exc_tb = opt_exc_info or sys.exc_info()
+    # Report the line that raised, not the line that caught
+    while exc_tb.tb_next is not None:
+        exc_tb = exc_tb.tb_next
     tb_frame = exc_tb.tb_frame
     lineno = exc_tb.tb_lineno
     filename = tb_frame.f_code.co_filename
     linecache.checkcache(filename)
     line = linecache.getline(filename, lineno, tb_frame.f_globals)
 
-    print
-    if opt_prepend:
-        print opt_prepend
-        print
     if str(exc_type) == "<class 'requests.exceptions.ConnectionError'>":
-        print 'Connection Error: {}'.format(exc_obj)
-        print 'Please check your internet connection.'
+        return ['Connection Error: {}'.format(exc_obj),\
+            'Please check your internet connection.']
     elif str(exc_type) == "<class 'requests.exceptions.HTTPError'>":
-        print 'HTTP Error: {}'.format(exc_obj)
+        return ['HTTP Error: {}'.format(exc_obj)]
     else:
-        print 'Error in {} line {}:\n{}{}\n{}{}: {}'.format(
+        return 'Error in {} line {}:\n{}{}\n{}{}: {}'.format(
             filename, lineno, ' ' * 4, line.strip(), ' ' * 8, exc_type,
-            exc_obj)
-    print
-    exit_script()
+            exc_obj).splitlines()
+
+
+def get_exception_name(opt_exc_info=None):
+    """ Return the class name of the exception that is currently being
+    handled (example: HTTPError).
+
+    :param opt_exc_info: (Optional) A sys.exc_info() tuple captured earlier
+        to name instead of the exception currently being handled.
+    """
+    return (opt_exc_info or sys.exc_info())[0].__name__
 
 
 def exit_script():
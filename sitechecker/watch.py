@@ -0,0 +1,155 @@
+""" Contains WatchState class, which schedules the re-checks of watched URLs
+by the risk their last results showed
+"""
+import collections
+import json
+import random
+import sqlite3
+import threading
+import time
+
+from sitechecker import checker, results
+
+
+RISK_HIGH = 'high'
+RISK_MEDIUM = 'medium'
+RISK_LOW = 'low'
+# Some check failed, so the verdict is incomplete
+RISK_UNKNOWN = 'unknown'
+
+# Risk: seconds until a URL is due for a re-check.  Flagged URLs come back
+# as soon as the Sucuri cache time to live allows a fresh scan; clean ones
+# once a week
+RECHECK_INTERVALS = {
+    RISK_HIGH: 6 * 3600,
+    RISK_MEDIUM: 24 * 3600,
+    RISK_LOW: 7 * 24 * 3600,
+    RISK_UNKNOWN: 3600
+}
+
+# Each interval is randomly stretched or shrunk by up to this share, so that
+# URLs first checked together do not all come due together
+RECHECK_JITTER = 0.1
+
+# PageSpeed scores below this are a medium risk
+LOW_PAGESPEED_SCORE = 50
+
+# WOT ratings that are a medium risk
+POOR_WOT_RATINGS = ('Poor', 'Very poor')
+
+
+class WatchState(object):
+    """ Encapsulate a single-file (SQLite) record of every watched URL's last
+    check time, verdict and the time it is next due for a re-check, so that
+    repeated runs over the same URL list (example: hourly from cron) only
+    re-check the URLs that are due.
+
+    Safe to use from several threads (example: the URLs selected on
+    workers.WorkerPool's feeder thread, and recorded on the main thread).
+    """
+
+    def __init__(self, path):
+        """ Initialize an instance of the class.
+
+        :param path: Path of the SQLite file (created if missing)
+        """
+        self.path = path
+        self.due_cnt = 0
+        self.skipped_cnt = 0
+        # Risk: number of URLs checked in this run with that verdict
+        self.risk_cnts = collections.Counter()
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(path, check_same_thread=False)
+        self.__conn.execute('CREATE TABLE IF NOT EXISTS watched ('\
+            'url TEXT PRIMARY KEY, '\
+            'last_checked REAL NOT NULL, '\
+            'next_due REAL NOT NULL, '\
+            'risk TEXT NOT NULL, '\
+            'reasons TEXT NOT NULL)')
+        self.__conn.commit()
+
+    def select_due(self, urls_to_check, opt_now=None):
+        """ Yield the URLs of urls_to_check that have never been checked or
+        are due for a re-check.
+
+        Invalid URLs are yielded too, so that the run stops at them as usual.
+
+        :param urls_to_check: Iterable of URLs from user input
+        :param opt_now: (Optional) Unix time to compare due times with
+            (default: now)
+        """
+        now = opt_now if opt_now is not None else time.time()
+        for url_item in urls_to_check:
+            with self.__lock:
+                row = self.__conn.execute('SELECT next_due FROM watched '\
+                    'WHERE url = ?', (url_item,)).fetchone()
+            if row is None or row[0] <= now or\
+                not checker.SiteChecker.is_valid_url(url_item, opt_quiet=True):
+                self.due_cnt += 1
+                yield url_item
+            else:
+                self.skipped_cnt += 1
+
+    def record(self, url_task):
+        """ Store the verdict for a checked URL and schedule its re-check.
+
+        :param url_task: engine.UrlTask whose checks have all completed
+        """
+        (risk, reasons) = get_verdict(url_task.result_list)
+        now = time.time()
+        next_due = now + RECHECK_INTERVALS[risk] * random.uniform(\
+            1 - RECHECK_JITTER, 1 + RECHECK_JITTER)
+        with self.__lock:
+            self.__conn.execute('INSERT OR REPLACE INTO watched (url, '\
+                'last_checked, next_due, risk, reasons) VALUES (?, ?, ?, ?, '\
+                '?)', (url_task.url_to_check, now, next_due, risk,\
+                    json.dumps(reasons)))
+            # Committed per URL, so that a killed run keeps what it checked
+            self.__conn.commit()
+        self.risk_cnts[risk] += 1
+
+    def close(self):
+        """ Close the state file.
+        """
+        with self.__lock:
+            self.__conn.close()
+
+
+def get_verdict(result_list):
+    """ Return (risk, list of reasons) for the results of one URL.
+
+    High risk: a Sucuri scan finding above low risk, or a blacklist entry.
+    Medium risk: a poor WOT rating, or a low PageSpeed score.  Unknown: no
+    other risk, but a check failed.
+
+    :param result_list: List of results.CheckResult for the URL
+    """
+    high_reasons = []
+    medium_reasons = []
+    failed = False
+    for result in result_list:
+        if isinstance(result, results.ErrorResult):
+            failed = True
+        elif isinstance(result, results.SucuriResult):
+            high_reasons.extend(['{}: {} ({})'.format(*finding) for finding\
+                in result.scan_findings or [] if len(finding) == 3 and\
+                    finding[2] != 'Low Risk'])
+            high_reasons.extend([blacklist_item for blacklist_item in\
+                result.blacklist or [] if\
+                    not blacklist_item.startswith('Domain clean')])
+        elif isinstance(result, results.WotResult):
+            medium_reasons.extend([rating for rating in result.reputation or\
+                [] if rating.split(': ')[-1] in POOR_WOT_RATINGS])
+        elif isinstance(result, results.GoogleResult):
+            if result.score is not None and\
+                result.score < LOW_PAGESPEED_SCORE:
+                medium_reasons.append('PageSpeed score: {} / 100'.format(\
+                    result.score))
+
+    if high_reasons:
+        return (RISK_HIGH, high_reasons + medium_reasons)
+    elif medium_reasons:
+        return (RISK_MEDIUM, medium_reasons)
+    elif failed:
+        return (RISK_UNKNOWN, [])
+    return (RISK_LOW, [])
@@ -0,0 +1,328 @@
+""" Contains WorkerPool class, which splits a run across local processes
+"""
+import collections
+import multiprocessing
+import Queue
+import signal
+import threading
+import time
+import traceback
+
+from sitechecker import cache, cassette, checker, engine, inputs, registry,\
+    results
+
+
+# Salt for splitting URLs between workers, so that a --shard can be split
+# again evenly
+_WORKER_SHARD_SALT = 'worker:'
+
+# Seconds a worker waits for its next URL before handing back the URLs it
+# has completed meanwhile (the calling process may be waiting for them
+# before it hands out more)
+_URL_WAIT_SECONDS = 0.1
+
+
+class WorkerPool(object):
+    """ Run the checks for many URLs in several worker processes, each with
+    its own engine.BatchEngine.
+
+    URLs are read once, by the calling process, and handed to the workers by
+    a stable hash of the URL (see inputs.get_shard()), so that equivalent
+    URLs go to the same worker and can share their checks.  Each worker sends
+    back its results as structured records, and they are merged back in
+    input order.  Every checker host's concurrency cap, rate and burst are
+    split between the workers, so that together they keep to the host's
+    budget.
+
+    Offers the run() interface of engine.BatchEngine, and the counters the
+    run summary needs.
+    """
+
+    def __init__(self, checker_dict, num_of_workers, num_of_threads,\
+        opt_cache_path=None, opt_cache_refresh=False, opt_cache_ttl=None,\
+        opt_max_retries=engine.DEFAULT_MAX_RETRIES, opt_cassette_path=None,\
+        opt_deadline=None, opt_hedge=False):
+        """ Initialize an instance of the class.
+
+        :param checker_dict: Dict of checker definitions, in the format of
+            registry.get_checker_dict()
+        :param num_of_workers: Number of worker processes
+        :param num_of_threads: Number of engine worker threads per process
+        :param opt_cache_path: (Optional) Path of the cache.ResponseCache
+            file the workers share (default: no cache)
+        :param opt_cache_refresh: (Optional) True to ignore cached responses
+            but still store new ones
+        :param opt_cache_ttl: (Optional) Cache time to live in seconds for
+            every checker
+        :param opt_max_retries: (Optional) Number of times a check is retried
+            after a transient failure
+        :param opt_cassette_path: (Optional) Path of a cassette.Cassette file
+            to replay checker site responses from
+        :param opt_deadline: (Optional) Seconds from the start of a URL's
+            first check after which its outstanding checks are given up
+        :param opt_hedge: (Optional) True to hedge slow GET requests (see
+            engine.BatchEngine)
+        """
+        self.checker_dict = checker_dict
+        self.num_of_workers = num_of_workers
+        self.num_of_threads = num_of_threads
+        self.cache_path = opt_cache_path
+        self.cache_refresh = opt_cache_refresh
+        self.cache_ttl = opt_cache_ttl
+        self.max_retries = opt_max_retries
+        self.cassette_path = opt_cassette_path
+        self.deadline = opt_deadline
+        self.hedge = opt_hedge
+        # Merged from the workers, as for engine.BatchEngine (the workers'
+        # caches and journals are their own; cache is a cache.CacheCounts of
+        # their caches' counters)
+        self.cache = None
+        self.journal = None
+        self.retry_cnt = 0
+        self.coalesced_cnt = 0
+        self.hedged_cnt = 0
+        self.failure_cnts = collections.Counter()
+        self.url_cnt = 0
+        self.start_time = None
+        self.end_time = None
+        self.__stopping = threading.Event()
+
+    def run(self, urls_to_check):
+        """ Check every URL and yield an engine.UrlTask per URL, in input
+        order, once all of its checks have completed.
+
+        Stops at the first URL that fails validation, and after stop(), as
+        engine.BatchEngine.run() does.
+
+        :param urls_to_check: Iterable of URLs from user input
+        """
+        self.url_cnt = 0
+        self.retry_cnt = 0
+        self.coalesced_cnt = 0
+        self.hedged_cnt = 0
+        self.failure_cnts.clear()
+        self.cache = cache.CacheCounts(self.cache_path) if self.cache_path\
+            else None
+        self.__stopping.clear()
+        self.start_time = time.time()
+
+        result_queue = multiprocessing.Queue()
+        # Bounded, so that input is read only as fast as it is checked
+        url_queues = [multiprocessing.Queue(self.num_of_threads * 4) for _ in\
+            range(self.num_of_workers)]
+        # A token per URL handed out but not yet merged back, so that a slow
+        # worker holds up the input instead of letting the other workers'
+        # results pile up while they wait to be merged
+        unmerged = Queue.Queue(self.num_of_workers * self.num_of_threads * 4)
+        worker_checker_dict = registry.split_checker_dict(self.checker_dict,\
+            self.num_of_workers)
+        processes = []
+        for worker_index in range(self.num_of_workers):
+            process = multiprocessing.Process(target=_work, args=(\
+                worker_index, worker_checker_dict, self.num_of_threads,\
+                self.cache_path, self.cache_refresh, self.cache_ttl,\
+                self.max_retries, self.cassette_path, self.deadline,\
+                self.hedge, url_queues[worker_index], result_queue))
+            # Never outlive the script (example: a second Ctrl-C)
+            process.daemon = True
+            process.start()
+            processes.append(process)
+
+        feeder = threading.Thread(target=self.__feed, args=(urls_to_check,\
+            url_queues, result_queue, unmerged))
+        feeder.daemon = True
+        feeder.start()
+
+        # Position in the input: (URL, records, checker stats), until the
+        # URLs before it have been handed back
+        arrived = {}
+        next_position = 0
+        input_cnt = None
+        invalid_url = None
+        done_cnt = 0
+        try:
+            # The feeder tells the input size only after telling the workers
+            # to finish, so either may come last
+            while done_cnt < self.num_of_workers or input_cnt is None:
+                while next_position in arrived:
+                    (url_item, records, checker_stats) =\
+                        arrived.pop(next_position)
+                    unmerged.get_nowait()
+                    next_position += 1
+                    self.url_cnt += 1
+                    yield self.__get_url_task(url_item, records,\
+                        checker_stats)
+
+                message = self.__get_message(result_queue, processes)
+                if message[0] == 'result':
+                    arrived[message[1]] = message[2:]
+                elif message[0] == 'input_done':
+                    (input_cnt, invalid_url) = message[1:]
+                elif message[0] == 'done':
+                    self.retry_cnt += message[1]
+                    self.failure_cnts.update(message[2])
+                    self.coalesced_cnt += message[3]
+                    self.hedged_cnt += message[4]
+                    if message[5] is not None:
+                        self.cache.add(*message[5])
+                    done_cnt += 1
+                else:
+                    raise RuntimeError('Worker process failed:\n' +\
+                        message[1])
+
+            while next_position in arrived:
+                (url_item, records, checker_stats) =\
+                    arrived.pop(next_position)
+                unmerged.get_nowait()
+                next_position += 1
+                self.url_cnt += 1
+                yield self.__get_url_task(url_item, records, checker_stats)
+            if invalid_url is not None:
+                yield engine.UrlTask(invalid_url, [], is_valid=False)
+        finally:
+            self.__stopping.set()
+            for process in processes:
+                process.join(0.1)
+            self.end_time = time.time()
+
+    def stop(self):
+        """ Stop handing out new URLs; run() ends once the URLs already
+        handed out are complete.  Safe to call from a signal handler.
+        """
+        self.__stopping.set()
+
+    def get_urls_per_sec(self):
+        """ Return the number of URLs checked per second during the last run.
+        """
+        elapsed = (self.end_time or time.time()) - self.start_time
+        return self.url_cnt / elapsed if elapsed > 0 else 0.0
+
+    def __feed(self, urls_to_check, url_queues, result_queue, unmerged):
+        """ Hand each URL, with its position in the input, to its worker,
+        stopping at the first invalid URL.  Runs on its own thread, so that
+        results are merged while input is still being read.
+
+        Each URL handed out takes a token from unmerged; once it is full,
+        the next URL waits until a URL is merged back.
+        """
+        position = 0
+        invalid_url = None
+        try:
+            for url_item in urls_to_check:
+                if self.__stopping.is_set():
+                    break
+                if not checker.SiteChecker.is_valid_url(url_item,\
+                    opt_quiet=True):
+                    invalid_url = url_item
+                    break
+                if not self.__wait_for_room(unmerged):
+                    break
+                url_queues[inputs.get_shard(url_item, self.num_of_workers,\
+                    opt_salt=_WORKER_SHARD_SALT)].put((position, url_item))
+                position += 1
+        except:
+            # Otherwise the run would end as if the input were empty
+            result_queue.put(('error', 'Reading URLs: {}'.format(\
+                traceback.format_exc())))
+        finally:
+            for url_queue in url_queues:
+                url_queue.put(None)
+            result_queue.put(('input_done', position, invalid_url))
+
+    def __wait_for_room(self, unmerged):
+        """ Put a token in unmerged once it has room, and return True; or
+        return False if stop() is called first.
+        """
+        while not self.__stopping.is_set():
+            try:
+                unmerged.put(None, timeout=1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    @classmethod
+    def __get_message(cls, result_queue, processes):
+        """ Return the next message from the workers (or the feeder), raising
+        RuntimeError if a worker died without saying why.
+        """
+        while True:
+            try:
+                return result_queue.get(timeout=1)
+            except Queue.Empty:
+                for process in processes:
+                    if process.exitcode not in (None, 0):
+                        raise RuntimeError('Worker process exited with code '\
+                            '{}'.format(process.exitcode))
+
+    def __get_url_task(self, url_item, records, checker_stats):
+        """ Return a completed engine.UrlTask for the records a worker sent
+        back, with checkers to render them (their timings included).
+        """
+        temp_checkers = [self.checker_dict[i].get_checker() for i in\
+            sorted(self.checker_dict.keys())]
+        task = engine.UrlTask(url_item, temp_checkers)
+        for (index, record) in enumerate(records):
+            (timings, request_cnt, response_bytes) = checker_stats[index]
+            temp_checkers[index].timings.update(timings)
+            temp_checkers[index].request_cnt = request_cnt
+            temp_checkers[index].response_bytes = response_bytes
+            task.set_result(index, results.from_record(record))
+        return task
+
+
+def _work(worker_index, checker_dict, num_of_threads, cache_path,\
+    cache_refresh, cache_ttl, max_retries, cassette_path, deadline, hedge,\
+    url_queue, result_queue):
+    """ Worker process: check the URLs handed to it with its own
+    engine.BatchEngine and send back each URL's results as records.
+    """
+    # Ctrl-C is handled by the calling process, which stops handing out URLs
+    # so that the URLs in flight still complete
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        response_cache = cache.ResponseCache(cache_path,\
+            opt_refresh=cache_refresh) if cache_path else None
+        response_cassette = cassette.Cassette(cassette_path) if\
+            cassette_path else None
+        batch_engine = engine.BatchEngine(checker_dict, num_of_threads,\
+            opt_cache=response_cache, opt_cache_ttl=cache_ttl,\
+            opt_max_retries=max_retries, opt_cassette=response_cassette,\
+            opt_deadline=deadline, opt_hedge=hedge)
+
+        # Positions of the URLs in flight, in the order the engine hands
+        # them back
+        positions = collections.deque()
+
+        def get_urls():
+            """ Yield the URLs handed to this worker until told to stop, and
+            None while waiting for the next one (see
+            engine.BatchEngine.run()).
+            """
+            while True:
+                try:
+                    item = url_queue.get(timeout=_URL_WAIT_SECONDS)
+                except Queue.Empty:
+                    yield None
+                    continue
+                if item is None:
+                    break
+                positions.append(item[0])
+                yield item[1]
+
+        for url_task in batch_engine.run(get_urls()):
+            result_queue.put(('result', positions.popleft(),\
+                url_task.url_to_check,\
+                [results.to_record(result) for result in\
+                    url_task.result_list],\
+                [(dict(temp_checker.timings), temp_checker.request_cnt,\
+                    temp_checker.response_bytes) for temp_checker in\
+                        url_task.checkers]))
+        result_queue.put(('done', batch_engine.retry_cnt,\
+            dict(batch_engine.failure_cnts), batch_engine.coalesced_cnt,\
+            batch_engine.hedged_cnt, (response_cache.hit_cnt,\
+                response_cache.miss_cnt, response_cache.error_cnt) if\
+                    response_cache is not None else None))
+    except:
+        result_queue.put(('error', 'Worker {}: {}'.format(worker_index,\
+            traceback.format_exc())))
@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+""" Contains WorkQueue class, a SQLite work queue of (URL, checker) jobs
+shared by any number of worker processes
+
+Slow checks (example: Sucuri scans) do not hold up the rest: every worker
+thread claims the next pending job as soon as it is free, so all workers
+stay busy until the queue drains.  A claim is a lease that the worker keeps
+renewing while it works; the job of a worker that dies is claimed again by
+another worker once its lease runs out.  Jobs name their checker, so a
+worker only claims the jobs of checkers installed where it runs.  Each
+worker keeps to its share (--workers-expected) of every checker host's
+concurrency cap and rate limit, so that together the workers keep to the
+host's budget.
+
+usage:
+  python -m sitechecker.workqueue enqueue queue (-s site | -f file)
+                                                [--only names | --skip names]
+  python -m sitechecker.workqueue work queue [-t threads] [--retries retries]
+                                             [--lease seconds]
+                                             [--workers-expected workers]
+                                             [--cache-file file] [--no-cache]
+                                             [--cache-ttl seconds] [--refresh]
+                                             [--cassette file]
+  python -m sitechecker.workqueue status queue
+  python -m sitechecker.workqueue results queue [--format format]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from sitechecker import cache, cassette, checker, engine, inputs, registry,\
+    render, results, utils
+
+
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_NUM_OF_THREADS = 4
+
+# Seconds an idle worker waits before looking for work again, while other
+# workers still hold leases
+_IDLE_POLL_SECONDS = 1
+
+STATE_PENDING = 'pending'
+STATE_CLAIMED = 'claimed'
+STATE_DONE = 'done'
+
+
+class WorkQueue(object):
+    """ Encapsulate a single-file (SQLite) queue of (URL, checker) jobs and
+    their results.
+
+    Any number of processes (on the same machine, or sharing the file over a
+    file system with working locks) may use the queue at once.  Claims are
+    made in IMMEDIATE transactions, so no two workers claim the same job.
+
+    Each job names its checker as registry.get_checker_names() does, so
+    workers with other plugins or checker configs never mistake one
+    checker's jobs for another's.
+    """
+
+    def __init__(self, path, opt_lease_seconds=DEFAULT_LEASE_SECONDS):
+        """ Initialize an instance of the class.
+
+        :param path: Path of the SQLite file (created if missing)
+        :param opt_lease_seconds: (Optional) Seconds a claim lasts without
+            being renewed
+        """
+        self.path = path
+        self.lease_seconds = opt_lease_seconds
+        self.owner = '{}:{}'.format(socket.gethostname(), os.getpid())
+        self.__lock = threading.Lock()
+        # Shared by the worker threads; access is serialized by self.__lock.
+        # Transactions are begun explicitly (autocommit otherwise).
+        self.__conn = sqlite3.connect(path, timeout=60,\
+            check_same_thread=False, isolation_level=None)
+        with self.__lock:
+            self.__conn.execute('CREATE TABLE IF NOT EXISTS jobs ('\
+                'id INTEGER PRIMARY KEY, '\
+                'position INTEGER NOT NULL, '\
+                'url TEXT NOT NULL, '\
+                'checker TEXT NOT NULL, '\
+                'state TEXT NOT NULL, '\
+                'owner TEXT, '\
+                'lease_expires REAL, '\
+                'claim_cnt INTEGER NOT NULL DEFAULT 0, '\
+                'result TEXT, '\
+                'UNIQUE (url, checker))')
+            self.__conn.execute('CREATE INDEX IF NOT EXISTS jobs_state ON '\
+                'jobs (state, lease_expires)')
+
+    def enqueue(self, urls_to_check, checker_names):
+        """ Add a job per checker for every URL, after the URLs already
+        queued, in a single transaction.  URLs already queued are skipped.
+        Return the number of URLs added, or raise ValueError (adding
+        nothing) at the first invalid URL.
+
+        :param urls_to_check: Iterable of URLs from user input
+        :param checker_names: Names of the checkers to run (see
+            registry.get_checker_names())
+        """
+        url_cnt = 0
+        with self.__lock:
+            self.__conn.execute('BEGIN IMMEDIATE')
+            try:
+                position = self.__conn.execute('SELECT COALESCE('\
+                    'MAX(position) + 1, 0) FROM jobs').fetchone()[0]
+                for url_item in urls_to_check:
+                    if not checker.SiteChecker.is_valid_url(url_item,\
+                        opt_quiet=True):
+                        raise ValueError(url_item)
+                    added_cnt = 0
+                    for checker_name in checker_names:
+                        added_cnt += self.__conn.execute('INSERT OR IGNORE '\
+                            'INTO jobs (position, url, checker, state) '\
+                            'VALUES (?, ?, ?, ?)', (position, url_item,\
+                                checker_name, STATE_PENDING)).rowcount
+                    if added_cnt > 0:
+                        position += 1
+                        url_cnt += 1
+                self.__conn.execute('COMMIT')
+            except:
+                self.__conn.execute('ROLLBACK')
+                raise
+        return url_cnt
+
+    def claim(self, checker_names):
+        """ Claim the next pending job (or one whose lease has run out) for
+        one of the checkers and return it as (job id, URL, checker name), or
+        None if there is none.
+
+        :param checker_names: Names of the checkers this worker can run
+        """
+        now = time.time()
+        with self.__lock:
+            self.__conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.__conn.execute('SELECT id, url, checker FROM '\
+                    'jobs WHERE (state = ? OR (state = ? AND lease_expires '\
+                    '< ?)) AND checker IN ({}) ORDER BY id LIMIT 1'.format(\
+                        ', '.join(['?'] * len(checker_names))),\
+                    [STATE_PENDING, STATE_CLAIMED, now] +\
+                        list(checker_names)).fetchone()
+                if row is not None:
+                    self.__conn.execute('UPDATE jobs SET state = ?, '\
+                        'owner = ?, lease_expires = ?, claim_cnt = '\
+                        'claim_cnt + 1 WHERE id = ?', (STATE_CLAIMED,\
+                            self.owner, now + self.lease_seconds, row[0]))
+                self.__conn.execute('COMMIT')
+            except:
+                self.__conn.execute('ROLLBACK')
+                raise
+        # SQLite hands back unicode; URLs and checker names are ASCII str
+        return (row[0], str(row[1]), str(row[2])) if row is not None else\
+            None
+
+    def renew_leases(self):
+        """ Extend the leases of every job this process holds (the
+        heartbeat).
+        """
+        with self.__lock:
+            self.__conn.execute('UPDATE jobs SET lease_expires = ? WHERE '\
+                'state = ? AND owner = ?', (time.time() +\
+                    self.lease_seconds, STATE_CLAIMED, self.owner))
+
+    def complete(self, job_id, result):
+        """ Store the result of a job, unless another worker completed it
+        first (example: after this worker's lease ran out).
+
+        :param job_id: Job id returned by claim()
+        :param result: results.CheckResult (results.ErrorResult if the check
+            failed)
+        """
+        with self.__lock:
+            self.__conn.execute('UPDATE jobs SET state = ?, owner = ?, '\
+                'lease_expires = NULL, result = ? WHERE id = ? AND state '\
+                '!= ?', (STATE_DONE, self.owner,\
+                    json.dumps(results.to_record(result)), job_id,\
+                    STATE_DONE))
+
+    def release(self, job_id):
+        """ Hand a claimed job back to the queue without a result.
+
+        :param job_id: Job id returned by claim()
+        """
+        with self.__lock:
+            self.__conn.execute('UPDATE jobs SET state = ?, owner = NULL, '\
+                'lease_expires = NULL WHERE id = ? AND state = ? AND '\
+                'owner = ?', (STATE_PENDING, job_id, STATE_CLAIMED,\
+                    self.owner))
+
+    def get_state_cnts(self):
+        """ Return a dict of job state: number of jobs.
+        """
+        with self.__lock:
+            return dict(self.__conn.execute('SELECT state, COUNT(*) FROM '\
+                'jobs GROUP BY state').fetchall())
+
+    def is_drained(self, checker_names):
+        """ Return True if every job for the checkers is done.
+
+        :param checker_names: Names of the checkers this worker can run
+        """
+        with self.__lock:
+            return self.__conn.execute('SELECT COUNT(*) FROM jobs WHERE '\
+                'state != ? AND checker IN ({})'.format(', '.join(['?'] *\
+                    len(checker_names))), [STATE_DONE] +\
+                        list(checker_names)).fetchone()[0] == 0
+
+    def get_results(self):
+        """ Yield (URL, list of (checker name, results.CheckResult)) for every
+        URL whose jobs are all done, in the order the URLs were enqueued
+        (and the checkers in the order they were for the URL).
+        """
+        with self.__lock:
+            rows = self.__conn.execute('SELECT position, url, checker, '\
+                'state, result FROM jobs ORDER BY position, id').fetchall()
+        url_rows = []
+        for row in rows + [None]:
+            if url_rows and (row is None or row[0] != url_rows[0][0]):
+                if all([url_row[3] == STATE_DONE for url_row in url_rows]):
+                    yield (str(url_rows[0][1]), [(str(url_row[2]),\
+                        results.from_record(json.loads(url_row[4]))) for\
+                            url_row in url_rows])
+                url_rows = []
+            if row is not None:
+                url_rows.append(row)
+
+    def close(self):
+        """ Close the queue file.
+        """
+        with self.__lock:
+            self.__conn.close()
+
+
+class QueueWorker(object):
+    """ Encapsulate a worker process: threads that claim jobs from a
+    WorkQueue, run them with an engine.BatchEngine (so each checker host's
+    concurrency cap, rate limit and the response cache still apply) and
+    store the results, until the queue drains.
+    """
+
+    def __init__(self, work_queue, batch_engine, num_of_threads):
+        """ Initialize an instance of the class.
+
+        :param work_queue: WorkQueue to claim jobs from
+        :param batch_engine: engine.BatchEngine to run the checks with; only
+            the jobs of the checkers in its checker_dict are claimed
+        :param num_of_threads: Number of threads claiming jobs
+        """
+        self.work_queue = work_queue
+        self.batch_engine = batch_engine
+        # Checker name: key in the engine's checker_dict
+        self.checker_keys = registry.get_checker_keys(\
+            batch_engine.checker_dict)
+        self.num_of_threads = num_of_threads
+        self.done_cnt = 0
+        self.__cnt_lock = threading.Lock()
+        self.__stopping = threading.Event()
+
+    def run(self):
+        """ Work until the queue drains, or until stop() is called and the
+        jobs in hand are done.
+        """
+        heartbeat = threading.Thread(target=self.__beat)
+        heartbeat.daemon = True
+        heartbeat.start()
+
+        threads = []
+        for _ in range(self.num_of_threads):
+            thread = threading.Thread(target=self.__work)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            # Join in slices so that Ctrl-C is still delivered to the main
+            # thread
+            while thread.is_alive():
+                thread.join(1)
+        self.__stopping.set()
+        heartbeat.join()
+
+    def stop(self):
+        """ Stop claiming new jobs.  Safe to call from a signal handler.
+        """
+        self.__stopping.set()
+
+    def __work(self):
+        """ Worker thread loop: claim a job, run it and store its result.
+        """
+        while not self.__stopping.is_set():
+            job = self.work_queue.claim(self.checker_keys.keys())
+            if job is None:
+                if self.work_queue.is_drained(self.checker_keys.keys()):
+                    break
+                # Other workers hold the rest; wait in case one of them dies
+                # and its leases run out
+                self.__stopping.wait(_IDLE_POLL_SECONDS)
+                continue
+
+            (job_id, url_to_check, checker_name) = job
+            temp_checker = self.batch_engine.get_checker(\
+                self.checker_keys[checker_name])
+            self.work_queue.complete(job_id, self.batch_engine.check(\
+                temp_checker, url_to_check))
+            with self.__cnt_lock:
+                self.done_cnt += 1
+
+    def __beat(self):
+        """ Heartbeat thread loop: renew the leases of the jobs in hand.
+        """
+        while not self.__stopping.wait(self.work_queue.lease_seconds / 3.0):
+            self.work_queue.renew_leases()
+
+
+def main():
+    """ Run the enqueue, work, status or results command.
+    """
+    args = __parse_script_args()
+    work_queue = WorkQueue(args.queue, opt_lease_seconds=getattr(args,\
+        'lease', DEFAULT_LEASE_SECONDS))
+    # Every checker, so that jobs queued with --only for a checker that is
+    # off by default still run
+    checker_dict = registry.get_checker_dict(\
+        opt_only=registry.get_checker_names())
+    checker_keys = registry.get_checker_keys(checker_dict)
+
+    if args.command == 'enqueue':
+        try:
+            checker_names = [name for (name, _) in sorted(\
+                registry.get_checker_keys(registry.get_checker_dict(\
+                    opt_only=args.only, opt_skip=args.skip)).items(),\
+                        key=lambda item: item[1])]
+        except ValueError as exc_obj:
+            print >> sys.stderr, exc_obj
+            utils.exit_script()
+        urls_to_check = [args.site] if args.site else\
+            inputs.UrlReader(args.file)
+        try:
+            url_cnt = work_queue.enqueue(urls_to_check, checker_names)
+        except ValueError as exc_obj:
+            # Display the expected format
+            checker.SiteChecker.is_valid_url(str(exc_obj))
+            utils.exit_script()
+        print >> sys.stderr, 'Queued {} URL(s) in {}'.format(url_cnt,\
+            args.queue)
+
+    elif args.command == 'work':
+        response_cache = None if args.no_cache else\
+            cache.ResponseCache(args.cache_file, opt_refresh=args.refresh)
+        response_cassette = cassette.Cassette(args.cassette) if\
+            args.cassette else None
+        batch_engine = engine.BatchEngine(registry.split_checker_dict(\
+            checker_dict, args.workers_expected), args.threads,\
+            opt_cache=response_cache, opt_cache_ttl=args.cache_ttl,\
+            opt_max_retries=args.retries, opt_cassette=response_cassette)
+        worker = QueueWorker(work_queue, batch_engine, args.threads)
+
+        def handle_first_sigint(signum, frame):
+            """ Stop claiming jobs, but finish the ones in hand.
+            """
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            print >> sys.stderr, 'Interrupted: finishing the jobs in hand '\
+                '(press Ctrl-C again to exit now; their leases will run out)'
+            worker.stop()
+
+        signal.signal(signal.SIGINT, handle_first_sigint)
+        start_time = time.time()
+        worker.run()
+        print >> sys.stderr, 'Completed {} check(s) in {:.2f} seconds'.\
+            format(worker.done_cnt, time.time() - start_time)
+        for ((checker_name, error_type), failure_cnt) in\
+            sorted(batch_engine.failure_cnts.items()):
+            print >> sys.stderr, '  Failed {} ({}): {}'.format(checker_name,\
+                error_type, failure_cnt)
+
+    elif args.command == 'status':
+        state_cnts = work_queue.get_state_cnts()
+        for state in (STATE_PENDING, STATE_CLAIMED, STATE_DONE):
+            print '{}: {}'.format(state, state_cnts.get(state, 0))
+
+    else:
+        renderer = render.get_renderer(args.format)
+        unknown_names = set()
+        for (url_to_check, checker_results) in work_queue.get_results():
+            # Checkers not installed here cannot display their results
+            unknown_names.update([checker_name for (checker_name, _) in\
+                checker_results if checker_name not in checker_keys])
+            checker_results = [(checker_keys[checker_name], result) for\
+                (checker_name, result) in checker_results if\
+                    checker_name in checker_keys]
+            temp_checkers = [checker_dict[checker_key].get_checker() for\
+                (checker_key, _) in checker_results]
+            url_task = engine.UrlTask(url_to_check, temp_checkers)
+            for (index, (_, result)) in enumerate(checker_results):
+                url_task.set_result(index, result)
+            renderer.render(url_task)
+        renderer.close()
+        if unknown_names:
+            print >> sys.stderr, 'Left out the results of checker(s) not '\
+                'installed here: {}'.format(', '.join(sorted(unknown_names)))
+
+    work_queue.close()
+
+
+def __parse_script_args():
+    """ Parse command-line arguments to this script
+    """
+    parser = argparse.ArgumentParser(description='SQLite work queue of '\
+        '(URL, checker) jobs shared by worker processes')
+    subparsers = parser.add_subparsers(dest='command')
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Queue a job '\
+        'per checker for each URL')
+    enqueue_parser.add_argument('queue', help='Path of the queue file')
+    input_group = enqueue_parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument('-s', '--site', metavar='site', type=str,\
+        help='Url of site to check.  Example: www.google.com')
+    input_group.add_argument('-f', '--file', metavar='file',\
+        type=argparse.FileType('r'), help='Path to file containing 1 or '\
+            'more urls to check, or - for standard input')
+    checkers_group = enqueue_parser.add_mutually_exclusive_group()
+    checkers_group.add_argument('--only', metavar='names',\
+        type=registry.parse_checker_names, help='Queue jobs for these '\
+            'checkers only (comma-separated, see sitechecker.main --only)')
+    checkers_group.add_argument('--skip', metavar='names',\
+        type=registry.parse_checker_names, help='Queue no jobs for these '\
+            'checkers (comma-separated)')
+
+    work_parser = subparsers.add_parser('work', help='Run queued jobs until '\
+        'the queue drains')
+    work_parser.add_argument('queue', help='Path of the queue file')
+    work_parser.add_argument('-t', '--threads', metavar='threads', type=int,\
+        default=DEFAULT_NUM_OF_THREADS, help='Number of jobs run at once.  '\
+            '(Default: {})'.format(DEFAULT_NUM_OF_THREADS))
+    work_parser.add_argument('--retries', metavar='retries', type=int,\
+        default=engine.DEFAULT_MAX_RETRIES, help='Number of times a check '\
+            'is retried after a transient failure.  (Default: {})'.\
+            format(engine.DEFAULT_MAX_RETRIES))
+    work_parser.add_argument('--lease', metavar='seconds', type=int,\
+        default=DEFAULT_LEASE_SECONDS, help='Seconds a claimed job stays '\
+            'claimed without a heartbeat.  (Default: {})'.\
+            format(DEFAULT_LEASE_SECONDS))
+    work_parser.add_argument('--workers-expected', metavar='workers',\
+        type=int, default=1, help='Number of work processes expected to '\
+            'share the queue at once; each keeps to its share of every '\
+            'checker host\'s concurrency cap, rate and burst.  (Default: 1)')
+    work_parser.add_argument('--cache-file', metavar='file', type=str,\
+        default=cache.DEFAULT_CACHE_PATH, help='Path of the file caching '\
+            'checker site responses.  (Default: '\
+            '~/.sitechecker_cache.sqlite)')
+    work_parser.add_argument('--no-cache', action='store_true',\
+        help='Neither read nor store cached responses.')
+    work_parser.add_argument('--cache-ttl', metavar='seconds', type=int,\
+        help='Use cached responses up to this many seconds old for every '\
+            'checker.  (Default: per checker)')
+    work_parser.add_argument('--refresh', action='store_true',\
+        help='Request every checker site again, but store the new '\
+            'responses in the cache.')
+    work_parser.add_argument('--cassette', metavar='file', type=str,\
+        help='Replay checker site responses from a cassette file instead '\
+            'of the network.')
+
+    status_parser = subparsers.add_parser('status', help='Count the jobs '\
+        'by state')
+    status_parser.add_argument('queue', help='Path of the queue file')
+
+    results_parser = subparsers.add_parser('results', help='Display the '\
+        'results of the URLs whose jobs are all done, in queued order')
+    results_parser.add_argument('queue', help='Path of the queue file')
+    results_parser.add_argument('--format', metavar='format',\
+        choices=[render.FORMAT_TEXT, render.FORMAT_JSONL],\
+        default=render.FORMAT_TEXT, help='Output format: text or jsonl.  '\
+            '(Default: text)')
+
+    args = parser.parse_args()
+    if args.command == 'work' and (args.threads < 1 or args.lease < 1 or\
+        args.workers_expected < 1):
+        parser.error('Please provide --threads, --lease and '\
+            '--workers-expected as numbers greater than 0')
+        # Not reachable, so no return
+    elif args.command == 'work' and args.cache_ttl is not None and\
+        args.cache_ttl < 0:
+        parser.error('Please provide --cache-ttl as a number of seconds')
+        # Not reachable, so no return
+    elif args.command == 'work' and args.no_cache and (args.refresh or\
+        args.cache_ttl is not None):
+        parser.error('Please provide either --no-cache or --refresh/'\
+            '--cache-ttl as argument (only one)')
+        # Not reachable, so no return
+    return args
+
+
+if __name__ == "__main__":
+    main()
+else:
+    pass
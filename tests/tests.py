@@ -1,11 +1,45 @@
 #!/usr/bin/env python
 """ Contain TestSiteChecker class
+
+Checker site responses are replayed from the cassette files in cassettes/,
+so the tests run offline.  To record the cassettes again from the checker
+sites, run with the environment variable SITECHECKER_RECORD=1 (except the
+made-up responses of the retry and --changes-only tests, which are never
+recorded).
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -j jobs, --jobs jobs  Number of tests to run at once, each in its own
+                        process.  (Default: number of CPUs)
 """
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
 from StringIO import StringIO
 import sys
+import tempfile
+import threading
+import time
 import unittest
+import urllib2
+
+from sitechecker import cassette, checker, engine, history, main,\
+    registry, results, server, stats, stubserver, workqueue
 
-from sitechecker import main
+
+CASSETTE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),\
+    'cassettes')
+# Expected output of the tests that compare to a file, named after the test
+EXPECTED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),\
+    'expected')
+
+# Tests that start worker processes (--workers), which the processes of the
+# test pool may not (they are daemonic), so run in the calling process
+UNPOOLED_TESTS = ('test_watch_with_workers', 'test_workers_input_order',\
+    'test_workers_cache_counts')
 
 
 class TestSiteChecker(unittest.TestCase):
@@ -21,9 +55,37 @@ class TestSiteChecker(unittest.TestCase):
         'HTTP Error: 404 Client Error: Not Found'
     __SITE_OK_URL_BUT_NOT_REAL = \
         'HTTP Error: 400 Client Error: Bad Request'
+    __SITE_SERVICE_UNAVAILABLE_MSG = \
+        'HTTP Error: 503 Server Error: Service Unavailable'
+    __SITE_NOT_FOUND_MSG = 'HTTP Error: 404 Client Error: Not Found'
+    __RETRIED_MSG = 'Retried {} request(s)'
+    __RESUMED_MSG = 'Resumed {} check(s)'
+    __REPLAYED_MSG = 'Replayed {} response(s)'
+    __HISTORY_MSG = 'History: {} changed, {} new and {} unchanged'
+    __CACHE_UNUSABLE_MSG = 'Warning: cache {} not usable'
+    __CACHE_MSG = 'Cache: {} hit(s), {} miss(es)'
+    __WATCH_MSG = 'Watch: {} URL(s) due, {} not yet due'
+    __UNKNOWN_CHECKER_MSG = 'Unknown checker(s): {}'
+    __ONLY_AND_SKIP_MSG = \
+        'Please provide either --only or --skip as argument (only one)'
+    __CONFIG_NOT_POSITIVE_MSG = \
+        'Expecting a number greater than 0 for {} in [{}] of {}'
     __FILE_INSUFF_ARGS_PROVIDED_MSG = \
         'argument -f/--file: expected one argument'
     __FILE_DOES_NOT_EXIST_MSG = 'No such file or directory'
+    __REPEATED_MSG = 'Skipped {} repeated URL(s)'
+    __STATS_HEADING = 'Seconds per stage:'
+    # Timings in the --stats output, which differ from run to run
+    __STATS_TIMING_PATTERN = re.compile(r'\d+\.\d{3}(?!\d)')
+    # Metrics whose values are timings or times, which differ from run to run
+    __TIMING_METRICS = ('sitechecker_run_duration_seconds', \
+        'sitechecker_last_run_timestamp_seconds', \
+        'sitechecker_stage_seconds_total', \
+        'sitechecker_request_duration_seconds_sum')
+    __INVALID_LINES_MSG = 'Received {} invalid URL(s) in {}:'
+    __INVALID_LINE_MSG = 'line {}: {}'
+    __NO_URL_CHECKED_MSG = 'No URL was checked'
+    __SKIPPED_INVALID_MSG = 'Skipped {} invalid URL(s)'
     __WOT_EXPECTED_STR = 'Child safety'
     __SUCURI_EXPECTED_STR = 'System Details'
     __GOOGLE_EXPECTED_STR = 'Minify JavaScript'
@@ -57,6 +119,29 @@ class TestSiteChecker(unittest.TestCase):
         self.__output = self.__out.getvalue().strip()
         self.__outputerr = self.__outerr.getvalue().strip()
 
+    def __get_cassette_args(self, opt_recordable=True):
+        """ Return the script args that answer the checker site requests
+        from this test's cassette (or record it, with SITECHECKER_RECORD=1).
+
+        :param opt_recordable: (Optional) False for a cassette of made-up
+            responses, which is always replayed
+        """
+        cassette_args = ['--no-cache', '--cassette', os.path.join(\
+            CASSETTE_DIR, self._testMethodName + '.json')]
+        if opt_recordable and os.environ.get('SITECHECKER_RECORD'):
+            cassette_args.append('--record')
+        return cassette_args
+
+    def __get_expected_output(self, extension):
+        """ Return the expected output of this test, from its file in
+        expected/.
+
+        :param extension: Extension of the file (example: .txt)
+        """
+        with open(os.path.join(EXPECTED_DIR, self._testMethodName + \
+            extension)) as expected_file:
+            return expected_file.read().strip()
+
     def __get_wot_match_cnt(self):
         """ Get and return count of expected string occurences for WOT results.
         """
@@ -101,6 +186,14 @@ class TestSiteChecker(unittest.TestCase):
             print 'Unexpected W3 CSS3 Validation Output'
         return cnt
 
+    def __get_url_headings(self):
+        """ Return the list of URLs whose results are in the output, in
+        output order (each URL heading is underlined).
+        """
+        lines = self.__output.splitlines()
+        return [line for (line, next_line) in zip(lines, lines[1:]) if\
+            line and next_line == '_' * len(line)]
+
     def __is_all_checker_output_ok(self, num_of_urls):
         """ Return True if all the expected string occurences in all results
         are as expected (else False) for the given num_of_urls.
@@ -220,7 +313,8 @@ class TestSiteChecker(unittest.TestCase):
         """
         test_args = ['-s', 'abc.defg.hij']
         self.__redirect_std()
-        sys.argv = ['main.py', test_args[0], test_args[1]]
+        sys.argv = ['main.py', test_args[0], test_args[1]] + \
+            self.__get_cassette_args()
         try:
             main.main()
         except:
@@ -238,7 +332,8 @@ class TestSiteChecker(unittest.TestCase):
         """
         test_args = ['-s', 'adjflsdjdfjl.com']
         self.__redirect_std()
-        sys.argv = ['main.py', test_args[0], test_args[1]]
+        sys.argv = ['main.py', test_args[0], test_args[1]] + \
+            self.__get_cassette_args()
         try:
             main.main()
         except:
@@ -299,6 +394,63 @@ class TestSiteChecker(unittest.TestCase):
             assert self.__SITE_INVALID_URL_FORMAT_MSG in self.__output, \
                 self.__output
 
+    def test_file_invalid_lines_listed(self):
+        """ Test input: file with invalid lines for -f(ile) option.  Every
+        invalid line is listed with its line number, and no URL is checked.
+
+        Example: pass -f sample_input_url_list_bad.txt as an option.
+        """
+        file_name = 'sample_input_url_list_bad.txt'
+        self.__redirect_std()
+        sys.argv = ['main.py', '-f', file_name]
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            assert self.__INVALID_LINES_MSG.format(3, file_name) in \
+                self.__output, self.__output
+            for (line_no, line) in [(1, 'im not a url'), (3, 'nor am i'), \
+                (6, 'this is a bad input file')]:
+                assert self.__INVALID_LINE_MSG.format(line_no, line) in \
+                    self.__output, self.__output
+            assert self.__NO_URL_CHECKED_MSG in self.__output, self.__output
+            assert self.__get_url_headings() == [], self.__output
+
+    def test_skip_invalid(self):
+        """ Test --skip-invalid: the invalid lines are listed on standard
+        error, and only the valid lines are checked.
+
+        Example: pass -f file --skip-invalid, the file mixing valid URLs,
+        invalid lines and a blank line.
+        """
+        temp_dir = tempfile.mkdtemp()
+        file_name = os.path.join(temp_dir, 'urls.txt')
+        with open(file_name, 'w') as url_file:
+            url_file.write('google.com\nim not a url\n\nadriatic.com\n'\
+                'nor am i\n')
+        self.__redirect_std()
+        sys.argv = ['main.py', '-f', file_name, '--skip-invalid', \
+            '--no-cache', '--cassette', os.path.join(CASSETTE_DIR, \
+                'test_site_normal_multi_url.json')]
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            shutil.rmtree(temp_dir)
+            assert self.__INVALID_LINE_MSG.format(2, 'im not a url') in \
+                self.__outputerr, self.__outputerr
+            assert self.__INVALID_LINE_MSG.format(5, 'nor am i') in \
+                self.__outputerr, self.__outputerr
+            assert self.__SKIPPED_INVALID_MSG.format(2) in \
+                self.__outputerr, self.__outputerr
+            assert self.__get_url_headings() == ['google.com', \
+                'adriatic.com'], self.__output
+            assert self.__is_all_checker_output_ok(2), self.__output
+
     def test_site_normal_one_url(self):
         """ Test normal response for one URL for -s(ite) option.
 
@@ -307,7 +459,8 @@ class TestSiteChecker(unittest.TestCase):
         num_of_urls = 1
         test_args = ['-s', 'apple.com']
         self.__redirect_std()
-        sys.argv = ['main.py', test_args[0], test_args[1]]
+        sys.argv = ['main.py', test_args[0], test_args[1]] + \
+            self.__get_cassette_args()
         try:
             main.main()
         except:
@@ -324,7 +477,8 @@ class TestSiteChecker(unittest.TestCase):
         num_of_urls = 1
         test_args = ['-s', 'www.apple.com']
         self.__redirect_std()
-        sys.argv = ['main.py', test_args[0], test_args[1]]
+        sys.argv = ['main.py', test_args[0], test_args[1]] + \
+            self.__get_cassette_args()
         try:
             main.main()
         except:
@@ -346,7 +500,8 @@ class TestSiteChecker(unittest.TestCase):
         num_of_urls = i + 1
         test_args = ['-f', file_name]
         self.__redirect_std()
-        sys.argv = ['main.py', test_args[0], test_args[1]]
+        sys.argv = ['main.py', test_args[0], test_args[1]] + \
+            self.__get_cassette_args()
         try:
             main.main()
         except:
@@ -355,7 +510,990 @@ class TestSiteChecker(unittest.TestCase):
             self.__restore_std()
             assert self.__is_all_checker_output_ok(num_of_urls), self.__output
 
+    def test_retry_transient_error(self):
+        """ Test a transient failure: an HTTP 503 is retried, and the retry
+        succeeds.
+
+        Example: WOT answers 503 once, then 200.
+        """
+        test_args = ['-s', 'apple.com']
+        self.__redirect_std()
+        sys.argv = ['main.py', test_args[0], test_args[1]] + \
+            self.__get_cassette_args(opt_recordable=False)
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            assert self.__is_all_checker_output_ok(1), self.__output
+            assert self.__RETRIED_MSG.format(1) in self.__outputerr, \
+                self.__outputerr
+
+    def test_no_retry_client_error(self):
+        """ Test a failure that is not transient: an HTTP 404 is not retried.
+
+        Example: WOT answers 404 (and would answer 200 if asked again).
+        """
+        test_args = ['-s', 'apple.com']
+        self.__redirect_std()
+        sys.argv = ['main.py', test_args[0], test_args[1]] + \
+            self.__get_cassette_args(opt_recordable=False)
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            assert self.__SITE_NOT_FOUND_MSG in self.__output, self.__output
+            assert self.__WOT_EXPECTED_STR not in self.__output, \
+                self.__output
+            assert 'Retried' not in self.__outputerr, self.__outputerr
+
+    def test_retries_exhausted(self):
+        """ Test a transient failure that outlasts the retries: the check
+        fails with the last error, and the other checks are unaffected.
+
+        Example: pass --retries 1 while WOT answers 503 twice (and would
+        answer 200 a third time).
+        """
+        test_args = ['-s', 'apple.com', '--retries', '1']
+        self.__redirect_std()
+        sys.argv = ['main.py'] + test_args + \
+            self.__get_cassette_args(opt_recordable=False)
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            assert self.__SITE_SERVICE_UNAVAILABLE_MSG in self.__output, \
+                self.__output
+            assert self.__WOT_EXPECTED_STR not in self.__output, \
+                self.__output
+            assert self.__get_sucuri_match_cnt() >= 1, self.__output
+            assert self.__RETRIED_MSG.format(1) in self.__outputerr, \
+                self.__outputerr
+
+    def test_cache_file_unopenable(self):
+        """ Test input: a --cache-file that cannot be opened: the run goes
+        on without a cache, with a warning.
+
+        Example: pass --cache-file /I/do/not/exist/cache.sqlite as an option.
+        """
+        test_args = ['-s', 'apple.com', '--cache-file', \
+            '/I/do/not/exist/cache.sqlite', '--cassette', \
+            os.path.join(CASSETTE_DIR, 'test_site_normal_one_url.json')]
+        self.__redirect_std()
+        sys.argv = ['main.py'] + test_args
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            assert self.__is_all_checker_output_ok(1), self.__output
+            assert self.__CACHE_UNUSABLE_MSG.format(test_args[3]) in \
+                self.__outputerr, self.__outputerr
+            assert self.__outputerr.count(self.__CACHE_UNUSABLE_MSG.format(\
+                test_args[3])) == 1, self.__outputerr
+
+    def test_resume_interrupted_run(self):
+        """ Test --resume after a run killed partway through its URLs: only
+        the checks missing from the journal are run, and the results are
+        output once per URL, in input order.
+
+        Example: pass -f sample_input_url_list.txt --journal file --resume.
+        """
+        file_name = 'sample_input_url_list.txt'
+        with open(file_name) as url_file:
+            urls = [line.strip() for line in url_file if line.strip()]
+        temp_dir = tempfile.mkdtemp()
+        journal_path = os.path.join(temp_dir, 'journal.jsonl')
+        test_args = ['-f', file_name, '--journal', journal_path, \
+            '--cassette', os.path.join(CASSETTE_DIR, \
+                'test_site_normal_multi_url.json'), '--no-cache']
+        try:
+            self.__redirect_std()
+            sys.argv = ['main.py'] + test_args
+            try:
+                main.main()
+            except:
+                pass
+            finally:
+                self.__restore_std()
+
+            # Keep what a run killed halfway would have journaled, ending
+            # in an incomplete line
+            with open(journal_path) as journal_file:
+                journal_lines = journal_file.readlines()
+            num_of_checks = len(journal_lines)
+            num_of_resumed = num_of_checks / 2
+            with open(journal_path, 'w') as journal_file:
+                journal_file.writelines(journal_lines[:num_of_resumed])
+                journal_file.write(journal_lines[num_of_resumed][:40])
+
+            self.__redirect_std()
+            sys.argv = ['main.py'] + test_args + ['--resume']
+            try:
+                main.main()
+            except:
+                pass
+            finally:
+                self.__restore_std()
+        finally:
+            shutil.rmtree(temp_dir)
+
+        assert self.__RESUMED_MSG.format(num_of_resumed) in \
+            self.__outputerr, self.__outputerr
+        assert self.__REPLAYED_MSG.format(num_of_checks - num_of_resumed) \
+            in self.__outputerr, self.__outputerr
+        assert self.__get_url_headings() == urls, self.__output
+        assert self.__get_wot_match_cnt() == len(urls), self.__output
+        assert self.__get_sucuri_match_cnt() == len(urls), self.__output
+
+    def test_changes_only(self):
+        """ Test --changes-only across two runs: the results that are the
+        same as in the previous run are left out, and a changed result is
+        output as its changes only.
+
+        Example: pass -s apple.com --history file, then again with
+        --changes-only once the PageSpeed score has gone from 83 to 52.
+        """
+        temp_dir = tempfile.mkdtemp()
+        test_args = ['-s', 'apple.com', '--history', \
+            os.path.join(temp_dir, 'history.sqlite'), '--format', 'jsonl']
+        try:
+            self.__redirect_std()
+            sys.argv = ['main.py'] + test_args + ['--no-cache', \
+                '--cassette', os.path.join(CASSETTE_DIR, \
+                    'test_site_normal_one_url.json')]
+            try:
+                main.main()
+            except:
+                pass
+            finally:
+                self.__restore_std()
+
+            self.__redirect_std()
+            sys.argv = ['main.py'] + test_args + ['--changes-only'] + \
+                self.__get_cassette_args(opt_recordable=False)
+            try:
+                main.main()
+            except:
+                pass
+            finally:
+                self.__restore_std()
+        finally:
+            shutil.rmtree(temp_dir)
+
+        records = [json.loads(line) for line in self.__output.splitlines()]
+        assert records == [{'url': 'apple.com', \
+            'checker': 'GOOGLE PAGESPEED INSIGHTS', \
+            'changes': {'score': [83, 52]}}], self.__output
+        assert self.__HISTORY_MSG.format(1, 0, 3) in self.__outputerr, \
+            self.__outputerr
+
+    def test_watch_with_workers(self):
+        """ Test --watch with --workers across two runs: the first run checks
+        every URL and records its verdict, and the second checks none, as
+        none is due yet.
+
+        Example: pass -f sample_input_url_list.txt --watch file --workers 2,
+        twice.
+        """
+        file_name = 'sample_input_url_list.txt'
+        with open(file_name) as url_file:
+            urls = [line.strip() for line in url_file if line.strip()]
+        temp_dir = tempfile.mkdtemp()
+        test_args = ['-f', file_name, '--watch', os.path.join(temp_dir, \
+            'watch.sqlite'), '--workers', '2', '--no-cache', '--cassette', \
+            os.path.join(CASSETTE_DIR, 'test_site_normal_multi_url.json')]
+        try:
+            self.__redirect_std()
+            sys.argv = ['main.py'] + test_args
+            try:
+                main.main()
+            except:
+                pass
+            finally:
+                self.__restore_std()
+            assert self.__get_url_headings() == urls, self.__output
+            assert self.__WATCH_MSG.format(len(urls), 0) in \
+                self.__outputerr, self.__outputerr
+
+            self.__redirect_std()
+            sys.argv = ['main.py'] + test_args
+            try:
+                main.main()
+            except:
+                pass
+            finally:
+                self.__restore_std()
+        finally:
+            shutil.rmtree(temp_dir)
+
+        assert self.__get_url_headings() == [], self.__output
+        assert self.__WATCH_MSG.format(0, len(urls)) in self.__outputerr, \
+            self.__outputerr
+
+    def test_workers_input_order(self):
+        """ Test --workers: the URLs are split between worker processes, and
+        their results are output in input order.
+
+        Example: pass -f sample_input_url_list.txt --workers 3.
+        """
+        file_name = 'sample_input_url_list.txt'
+        with open(file_name) as url_file:
+            urls = [line.strip() for line in url_file if line.strip()]
+        test_args = ['-f', file_name, '--workers', '3', '-t', '2', \
+            '--no-cache', '--cassette', os.path.join(CASSETTE_DIR, \
+                'test_site_normal_multi_url.json')]
+        self.__redirect_std()
+        sys.argv = ['main.py'] + test_args
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            assert self.__get_url_headings() == urls, self.__output
+            assert self.__is_all_checker_output_ok(len(urls)), self.__output
+
+    def test_workers_cache_counts(self):
+        """ Test --workers with the cache, across two runs: the cache
+        counters of the worker processes are added up in the run summary.
+
+        Example: pass -f sample_input_url_list.txt --workers 2 --cache-file
+        file, twice.
+        """
+        file_name = 'sample_input_url_list.txt'
+        with open(file_name) as url_file:
+            urls = [line.strip() for line in url_file if line.strip()]
+        num_of_checks = len(urls) * 4
+        temp_dir = tempfile.mkdtemp()
+        test_args = ['-f', file_name, '--workers', '2', '--cache-file', \
+            os.path.join(temp_dir, 'cache.sqlite'), '--cassette', \
+            os.path.join(CASSETTE_DIR, 'test_site_normal_multi_url.json')]
+        outputerrs = []
+        try:
+            for _ in range(2):
+                self.__redirect_std()
+                sys.argv = ['main.py'] + test_args
+                try:
+                    main.main()
+                except:
+                    pass
+                finally:
+                    self.__restore_std()
+                outputerrs.append(self.__outputerr)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        assert self.__CACHE_MSG.format(0, num_of_checks) in outputerrs[0], \
+            outputerrs[0]
+        assert self.__CACHE_MSG.format(num_of_checks, 0) in outputerrs[1], \
+            outputerrs[1]
+        assert self.__get_url_headings() == urls, self.__output
+
+    def test_shard(self):
+        """ Test --shard: every URL is checked by exactly one of the
+        shards, and each shard outputs its URLs in input order.
+
+        Example: pass -f sample_input_url_list.txt --shard 1/2, then
+        --shard 2/2.
+        """
+        file_name = 'sample_input_url_list.txt'
+        with open(file_name) as url_file:
+            urls = [line.strip() for line in url_file if line.strip()]
+        shard_urls = []
+        for shard in ('1/2', '2/2'):
+            self.__redirect_std()
+            sys.argv = ['main.py', '-f', file_name, '--shard', shard, \
+                '--no-cache', '--cassette', os.path.join(CASSETTE_DIR, \
+                    'test_site_normal_multi_url.json')]
+            try:
+                main.main()
+            except:
+                pass
+            finally:
+                self.__restore_std()
+            shard_urls.append(self.__get_url_headings())
+
+        assert all(shard_urls), shard_urls
+        assert sorted(shard_urls[0] + shard_urls[1]) == sorted(urls), \
+            shard_urls
+        for urls_in_shard in shard_urls:
+            assert urls_in_shard == [url_item for url_item in urls if \
+                url_item in urls_in_shard], shard_urls
+
+    def test_history_reordered_only(self):
+        """ Test --history with a result whose list items only changed
+        order: it is counted as unchanged, as --changes-only leaves it out.
+
+        Example: Sucuri links a, b in a run, then b, a in the next.
+        """
+        temp_dir = tempfile.mkdtemp()
+        history_path = os.path.join(temp_dir, 'history.sqlite')
+        try:
+            for links in (['a.com', 'b.com'], ['b.com', 'a.com']):
+                history_store = history.HistoryStore(history_path)
+                result = results.SucuriResult(checker.SucuriChecker.NAME, \
+                    'apple.com', links=links)
+                previous_result = history_store.add(result)
+                history_store.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+        assert history.get_changes(previous_result, result) == {}, \
+            previous_result
+        assert (history_store.changed_cnt, history_store.new_cnt, \
+            history_store.unchanged_cnt) == (0, 0, 1), \
+            (history_store.changed_cnt, history_store.new_cnt, \
+                history_store.unchanged_cnt)
+
+    def test_format_jsonl(self):
+        """ Test --format jsonl: a JSON record per checker result, in checker
+        order.
+
+        Example: pass -s apple.com --format jsonl as options.
+        """
+        self.__redirect_std()
+        sys.argv = ['main.py', '-s', 'apple.com', '--format', 'jsonl', \
+            '--no-cache', '--cassette', os.path.join(CASSETTE_DIR, \
+                'test_site_normal_one_url.json')]
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            records = [json.loads(line) for line in \
+                self.__output.splitlines()]
+            expected_records = [json.loads(line) for line in \
+                self.__get_expected_output('.jsonl').splitlines()]
+            assert records == expected_records, self.__output
+
+    def test_stdin_repeated_urls(self):
+        """ Test input: URLs piped in on standard input for -f(ile) -, with
+        repeats.  Each URL is checked once, and the repeats are counted.
+
+        Example: pipe apple.com, APPLE.com, a blank line and apple.com
+        with trailing space into -f -.
+        """
+        (read_fd, write_fd) = os.pipe()
+        os.write(write_fd, 'apple.com\nAPPLE.com\n\napple.com \n')
+        os.close(write_fd)
+        saved_stdin = sys.stdin
+        sys.stdin = os.fdopen(read_fd)
+        self.__redirect_std()
+        sys.argv = ['main.py', '-f', '-', '--no-cache', '--cassette', \
+            os.path.join(CASSETTE_DIR, 'test_site_normal_one_url.json')]
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            sys.stdin.close()
+            sys.stdin = saved_stdin
+            assert self.__output == self.__get_expected_output('.txt'), \
+                self.__output
+            assert self.__REPEATED_MSG.format(2) in self.__outputerr, \
+                self.__outputerr
+
+    def test_stats(self):
+        """ Test --stats: the run summary adds the seconds per stage and the
+        request latency histogram of each checker (timings masked).
+
+        Example: pass -s apple.com --stats as options.
+        """
+        self.__redirect_std()
+        sys.argv = ['main.py', '-s', 'apple.com', '--stats', '--no-cache', \
+            '--cassette', os.path.join(CASSETTE_DIR, \
+                'test_site_normal_one_url.json')]
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            stats_output = self.__outputerr[\
+                self.__outputerr.find(self.__STATS_HEADING):]
+            assert self.__STATS_TIMING_PATTERN.sub('#.###', stats_output) == \
+                self.__get_expected_output('.txt'), self.__outputerr
+
+    def test_metrics_file(self):
+        """ Test --metrics-file: the run metrics are written in the Prometheus
+        text format (timings masked).
+
+        Example: pass -s apple.com --metrics-file file as options.
+        """
+        temp_dir = tempfile.mkdtemp()
+        metrics_path = os.path.join(temp_dir, 'sitechecker.prom')
+        self.__redirect_std()
+        sys.argv = ['main.py', '-s', 'apple.com', '--metrics-file', \
+            metrics_path, '--no-cache', '--cassette', os.path.join(\
+                CASSETTE_DIR, 'test_site_normal_one_url.json')]
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+        try:
+            with open(metrics_path) as metrics_file:
+                lines = metrics_file.read().strip().splitlines()
+        finally:
+            shutil.rmtree(temp_dir)
+
+        for (i, line) in enumerate(lines):
+            if line.split('{')[0].split(' ')[0] in self.__TIMING_METRICS:
+                lines[i] = line.rsplit(' ', 1)[0] + ' #'
+        assert '\n'.join(lines) == self.__get_expected_output('.prom'), \
+            '\n'.join(lines)
+
+    def test_serve(self):
+        """ Test --serve: a check request gets the results of every checker
+        as the --format jsonl records; a request of only invalid URLs, or a
+        malformed body, gets status 400.
+
+        Example: GET /check?url=apple.com, GET /check?url=not_a_url and POST
+        /check with a body that is not JSON.
+        """
+        cassette_path = os.path.join(CASSETTE_DIR, \
+            'test_site_normal_one_url.json')
+        self.__redirect_std()
+        sys.argv = ['main.py', '-s', 'apple.com', '--format', 'jsonl', \
+            '--no-cache', '--cassette', cassette_path]
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+        expected_records = [json.loads(line) for line in \
+            self.__output.splitlines()]
+
+        batch_engine = engine.BatchEngine(registry.get_checker_dict(\
+            opt_config_path=None, opt_plugins=False), 2, \
+            opt_cassette=cassette.Cassette(cassette_path))
+        check_server = server.CheckServer(('127.0.0.1', 0), batch_engine, \
+            stats.RunStats())
+        base_url = 'http://127.0.0.1:{}'.format(check_server.server_port)
+        thread = threading.Thread(target=check_server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        # The request log goes to standard error
+        self.__redirect_std()
+        try:
+            (status, body) = self.__request(base_url + '/check?url=apple.com')
+            (invalid_status, invalid_body) = self.__request(base_url + \
+                '/check?url=not_a_url')
+            (malformed_status, _) = self.__request(base_url + '/check', \
+                opt_data='not json')
+            (_, health_body) = self.__request(base_url + '/health')
+        finally:
+            check_server.shutdown()
+            check_server.server_close()
+            self.__restore_std()
+
+        assert status == 200, status
+        assert body == {'results': [{'url': 'apple.com', \
+            'checks': expected_records}]}, body
+        assert len(expected_records) == 4, expected_records
+        assert invalid_status == 400, invalid_status
+        assert invalid_body['results'][0]['url'] == 'not_a_url', invalid_body
+        assert self.__SITE_INVALID_URL_FORMAT_MSG in \
+            invalid_body['results'][0]['error'], invalid_body
+        assert malformed_status == 400, malformed_status
+        assert health_body['urls_checked'] == 1, health_body
+
+    @classmethod
+    def __request(cls, url, opt_data=None):
+        """ Send a request (a POST if opt_data is given) and return (status,
+        JSON body).
+        """
+        try:
+            response = urllib2.urlopen(url, data=opt_data, timeout=30)
+        except urllib2.HTTPError as exc_obj:
+            # An error status; the exception is the response
+            response = exc_obj
+        try:
+            return (response.getcode(), json.loads(response.read()))
+        finally:
+            response.close()
+
+    def test_checkers_unknown_name(self):
+        """ Test input: a checker name that is neither built in nor a
+        plugin, for --only.
+
+        Example: pass --only wot,nosuch as an option.
+        """
+        test_args = ['-s', 'apple.com', '--only', 'wot,nosuch']
+        self.__redirect_std()
+        sys.argv = ['main.py'] + test_args
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            assert self.__UNKNOWN_CHECKER_MSG.format('nosuch') in \
+                self.__outputerr, self.__outputerr
+
+    def test_checkers_only_and_skip(self):
+        """ Test input: --only and --skip together.
+
+        Example: pass --only wot --skip sucuri as options.
+        """
+        test_args = ['-s', 'apple.com', '--only', 'wot', '--skip', 'sucuri']
+        self.__redirect_std()
+        sys.argv = ['main.py'] + test_args
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            assert self.__outputerr.endswith(self.__ONLY_AND_SKIP_MSG), \
+                self.__outputerr
+
+    def test_checker_plugin_named_as_builtin(self):
+        """ Test a checker plugin registered under the name of a built in
+        checker: the built in checker is kept and the plugin is left out,
+        while a plugin with a name of its own is added after the built in
+        checkers.
+        """
+        import pkg_resources
+        distribution = pkg_resources.Distribution(\
+            location=os.path.dirname(os.path.abspath(__file__)), \
+            project_name='sitechecker-test-plugins', version='1.0')
+        distribution._ep_map = pkg_resources.EntryPoint.parse_map(\
+            {registry.ENTRY_POINT_GROUP: [\
+                'wot = sitechecker.checker:SucuriChecker', \
+                'mycheck = sitechecker.checker:W3CssChecker']}, \
+            dist=distribution)
+        saved_iter_entry_points = pkg_resources.iter_entry_points
+
+        def iter_entry_points(group, name=None):
+            """ Yield the test plugins as the only installed ones, without
+            installing them for the later tests run in this process.
+            """
+            return distribution.get_entry_map(group).itervalues()
+
+        pkg_resources.iter_entry_points = iter_entry_points
+        # Look the plugins up again, with the test ones
+        registry._plugin_entry_points = None
+        try:
+            checker_names = registry.get_checker_names()
+            checker_dict = registry.get_checker_dict(\
+                opt_only=['wot', 'mycheck'], opt_config_path=None)
+        finally:
+            pkg_resources.iter_entry_points = saved_iter_entry_points
+            registry._plugin_entry_points = None
+
+        builtin_names = [name for (name, _) in registry.BUILTIN_CHECKERS]
+        assert checker_names == builtin_names + ['mycheck'], checker_names
+        assert sorted(checker_dict.keys()) == [1, len(builtin_names) + 1], \
+            checker_dict
+        assert checker_dict[1].checker_class is checker.WotChecker, \
+            checker_dict
+        assert checker_dict[len(builtin_names) + 1].checker_class is \
+            checker.W3CssChecker, checker_dict
+
+    def test_checker_config_timeouts(self):
+        """ Test per checker timeouts: each checker's own by default, and
+        those of its section of the checker config file if it has one.
+
+        Example: a config file of [pagespeed] connect_timeout = 5 and
+        read_timeout = 120.
+        """
+        temp_dir = tempfile.mkdtemp()
+        config_path = os.path.join(temp_dir, 'sitechecker.cfg')
+        with open(config_path, 'w') as config_file:
+            config_file.write('[pagespeed]\nconnect_timeout = 5\n'\
+                'read_timeout = 120\n')
+        try:
+            checker_dict = registry.get_checker_dict(\
+                opt_config_path=config_path, opt_plugins=False)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        batch_engine = engine.BatchEngine(checker_dict, 1)
+        timeouts = dict([(checker_dict[i].name, batch_engine.get_checker(i).\
+            timeout) for i in checker_dict.keys()])
+        assert timeouts[checker.GoogleChecker.NAME] == (5.0, 120.0), \
+            timeouts
+        assert timeouts[checker.WotChecker.NAME] == \
+            (checker.WotChecker.CONNECT_TIMEOUT, \
+                checker.WotChecker.READ_TIMEOUT), timeouts
+
+    def test_checker_config_not_positive(self):
+        """ Test input: a checker config file with a concurrency cap of 0,
+        which would hold every request to the checker's host back.
+
+        Example: a config file of [wot] max_concurrent_requests = 0.
+        """
+        temp_dir = tempfile.mkdtemp()
+        config_path = os.path.join(temp_dir, 'sitechecker.cfg')
+        with open(config_path, 'w') as config_file:
+            config_file.write('[wot]\nmax_concurrent_requests = 0\n')
+        test_args = ['-s', 'apple.com', '--checker-config', config_path]
+        self.__redirect_std()
+        sys.argv = ['main.py'] + test_args
+        try:
+            main.main()
+        except:
+            pass
+        finally:
+            self.__restore_std()
+            shutil.rmtree(temp_dir)
+            assert self.__outputerr.endswith(\
+                self.__CONFIG_NOT_POSITIVE_MSG.format(\
+                    'max_concurrent_requests', 'wot', config_path)), \
+                self.__outputerr
+
+    def test_deadline_not_counting_queued_time(self):
+        """ Test --deadline with more URLs queued than there are threads:
+        each URL's deadline runs from the start of its first check, so URLs
+        queued behind others still get all their checks done.
+
+        Example: 12 URLs submitted at once to 1 thread, with a 2 second
+        deadline and checker sites answering in about 0.05 seconds (all 12
+        URLs take longer than the deadline, each URL much less).
+        """
+        num_of_urls = 12
+        (stub_servers, checker_dict) = stubserver.start_for_checkers(\
+            registry.get_checker_dict(opt_config_path=None, \
+                opt_plugins=False), opt_latency=0.05)
+        for definition in checker_dict.values():
+            # Only the deadline is to hold the checks up
+            definition.requests_per_second = definition.request_burst = 1000.0
+        batch_engine = engine.BatchEngine(checker_dict, 1, opt_deadline=2)
+        try:
+            batch_engine.start()
+            url_tasks = [batch_engine.submit('site{}.example.com'.format(i))\
+                for i in range(num_of_urls)]
+            for url_task in url_tasks:
+                url_task.wait()
+            batch_engine.finish(opt_wait=True)
+        finally:
+            for stub in stub_servers:
+                stub.stop()
+
+        elapsed = batch_engine.end_time - batch_engine.start_time
+        assert elapsed > 2, elapsed
+        assert not batch_engine.failure_cnts, batch_engine.failure_cnts
+        for url_task in url_tasks:
+            assert None not in url_task.result_list, url_task.url_to_check
+
+    def test_hedge_single_url(self):
+        """ Test --hedge on a run checking a single URL: too few latencies are
+        observed to hedge at their p95, so slow requests are hedged after
+        their checker's hedge delay.
+
+        Example: checker sites answering in 0.1 to 0.3 seconds, and a hedge
+        delay of 0.05 seconds for every checker.
+        """
+        (stub_servers, checker_dict) = stubserver.start_for_checkers(\
+            registry.get_checker_dict(opt_config_path=None, \
+                opt_plugins=False), opt_latency=0.2)
+        for definition in checker_dict.values():
+            # Only the hedge delay is to decide whether to hedge
+            definition.requests_per_second = definition.request_burst = 1000.0
+            definition.hedge_delay = 0.05
+        batch_engine = engine.BatchEngine(checker_dict, 1, opt_hedge=True)
+        try:
+            batch_engine.start()
+            url_task = batch_engine.submit('www.example.com')
+            url_task.wait()
+            batch_engine.finish(opt_wait=True)
+        finally:
+            for stub in stub_servers:
+                stub.stop()
+
+        assert batch_engine.hedged_cnt > 0, batch_engine.hedged_cnt
+        assert not batch_engine.failure_cnts, batch_engine.failure_cnts
+        assert None not in url_task.result_list, url_task.result_list
+
+    def test_hedge_checker_raising(self):
+        """ Test --hedge with a checker whose request raises instead of
+        returning an error result (example: a checker plugin's override):
+        the check fails with the exception, rather than never completing.
+
+        Example: a WOT checker raising RuntimeError, with a hedge delay of
+        0.05 seconds, and a 5 second deadline in case the check hangs.
+        """
+        class RaisingChecker(checker.WotChecker):
+            """ WOT checker whose requests raise.
+            """
+            def request_url(self, url_to_check):
+                raise RuntimeError('Request failed before sending')
+
+        checker_dict = registry.get_checker_dict(opt_only=['wot'], \
+            opt_config_path=None, opt_plugins=False)
+        for definition in checker_dict.values():
+            definition.checker_class = RaisingChecker
+            definition.hedge_delay = 0.05
+        batch_engine = engine.BatchEngine(checker_dict, 1, opt_deadline=5, \
+            opt_hedge=True)
+        batch_engine.start()
+        url_task = batch_engine.submit('www.example.com')
+        url_task.wait()
+        # Not waiting for the worker thread, which a hung check would hold
+        batch_engine.finish()
+
+        assert [result.error_type for result in url_task.result_list] == \
+            ['RuntimeError'], url_task.result_list
+        assert batch_engine.failure_cnts == \
+            {(checker.WotChecker.NAME, 'RuntimeError'): 1}, \
+            batch_engine.failure_cnts
+
+    def test_coalesce_equivalent_urls(self):
+        """ Test two URLs with the same canonical form in flight at once: the
+        checker site is requested once, each URL gets its own result row, and
+        the shared check is counted.
+
+        Example: www.example.com and example.com, checked by WOT with its
+        site answering in about 0.2 seconds.
+        """
+        (stub_servers, checker_dict) = stubserver.start_for_checkers(\
+            registry.get_checker_dict(opt_only=['wot'], \
+                opt_config_path=None, opt_plugins=False), opt_latency=0.2)
+        batch_engine = engine.BatchEngine(checker_dict, 2)
+        try:
+            url_tasks = list(batch_engine.run(\
+                ['www.example.com', 'example.com']))
+        finally:
+            for stub in stub_servers:
+                stub.stop()
+
+        assert [stub.request_cnt for stub in stub_servers] == [1], \
+            [stub.request_cnt for stub in stub_servers]
+        assert [url_task.url_to_check for url_task in url_tasks] == \
+            ['www.example.com', 'example.com'], url_tasks
+        assert [[result.url for result in url_task.result_list] for\
+            url_task in url_tasks] == [['www.example.com'], ['example.com']],\
+                url_tasks
+        # The same check, shown for each URL
+        assert url_tasks[0].result_list[0].reputation == \
+            url_tasks[1].result_list[0].reputation, url_tasks
+        assert batch_engine.url_cnt == 2, batch_engine.url_cnt
+        assert batch_engine.coalesced_cnt == 1, batch_engine.coalesced_cnt
+
+    def test_work_queue_enqueue_and_claim(self):
+        """ Test queueing URLs: a job per URL and checker, claimed in queued
+        order and each only once; URLs already queued are skipped, and an
+        invalid URL adds nothing.
+
+        Example: queue apple.com and google.com for wot and sucuri.
+        """
+        temp_dir = tempfile.mkdtemp()
+        work_queue = workqueue.WorkQueue(os.path.join(temp_dir, \
+            'queue.sqlite'))
+        checker_names = ['wot', 'sucuri']
+        try:
+            url_cnt = work_queue.enqueue(['apple.com', 'google.com'], \
+                checker_names)
+            repeated_url_cnt = work_queue.enqueue(['apple.com'], \
+                checker_names)
+            try:
+                work_queue.enqueue(['example.com', 'not_a_url'], \
+                    checker_names)
+                invalid_url = None
+            except ValueError as exc_obj:
+                invalid_url = str(exc_obj)
+            jobs = [work_queue.claim(checker_names) for _ in range(5)]
+            state_cnts = work_queue.get_state_cnts()
+        finally:
+            work_queue.close()
+            shutil.rmtree(temp_dir)
+
+        assert (url_cnt, repeated_url_cnt) == (2, 0), \
+            (url_cnt, repeated_url_cnt)
+        assert invalid_url == 'not_a_url', invalid_url
+        assert [job[1:] for job in jobs[:4]] == [('apple.com', 'wot'), \
+            ('apple.com', 'sucuri'), ('google.com', 'wot'), \
+            ('google.com', 'sucuri')], jobs
+        assert jobs[4] is None, jobs
+        assert state_cnts == {workqueue.STATE_CLAIMED: 4}, state_cnts
+
+    def test_work_queue_lease_expiry(self):
+        """ Test the lease of a claimed job: a renewed lease keeps the job
+        claimed, and once the lease runs out (example: its worker died) the
+        job is claimed again; only the first result stored is kept.
+
+        Example: a lease of 0.5 seconds.
+        """
+        temp_dir = tempfile.mkdtemp()
+        work_queue = workqueue.WorkQueue(os.path.join(temp_dir, \
+            'queue.sqlite'), opt_lease_seconds=0.5)
+        try:
+            work_queue.enqueue(['apple.com'], ['wot'])
+            job = work_queue.claim(['wot'])
+            time.sleep(0.3)
+            work_queue.renew_leases()
+            time.sleep(0.35)
+            renewed_job = work_queue.claim(['wot'])
+            time.sleep(0.3)
+            reclaimed_job = work_queue.claim(['wot'])
+            work_queue.complete(reclaimed_job[0], \
+                self.__get_error_result('apple.com', 'First'))
+            work_queue.complete(job[0], \
+                self.__get_error_result('apple.com', 'Second'))
+            url_results = list(work_queue.get_results())
+            is_drained = work_queue.is_drained(['wot'])
+        finally:
+            work_queue.close()
+            shutil.rmtree(temp_dir)
+
+        assert renewed_job is None, renewed_job
+        assert reclaimed_job == job, (reclaimed_job, job)
+        assert [(url_to_check, [(checker_name, result.error_type) for \
+            (checker_name, result) in checker_results]) for \
+                (url_to_check, checker_results) in url_results] == \
+            [('apple.com', [('wot', 'First')])], url_results
+        assert is_drained
+
+    def test_work_queue_checker_filtering(self):
+        """ Test claiming for some of the checkers only (example: a worker
+        without a checker plugin): the jobs of the other checkers are left
+        to other workers, and the queue is drained for this worker once its
+        own jobs are done.
+
+        Example: queue apple.com for wot and pagespeed, and claim for wot.
+        """
+        temp_dir = tempfile.mkdtemp()
+        work_queue = workqueue.WorkQueue(os.path.join(temp_dir, \
+            'queue.sqlite'))
+        try:
+            work_queue.enqueue(['apple.com'], ['wot', 'pagespeed'])
+            job = work_queue.claim(['wot'])
+            other_job = work_queue.claim(['wot'])
+            work_queue.complete(job[0], \
+                self.__get_error_result('apple.com', 'Done'))
+            is_drained = work_queue.is_drained(['wot'])
+            is_all_drained = work_queue.is_drained(['wot', 'pagespeed'])
+            url_results = list(work_queue.get_results())
+        finally:
+            work_queue.close()
+            shutil.rmtree(temp_dir)
+
+        assert job[1:] == ('apple.com', 'wot'), job
+        assert other_job is None, other_job
+        assert is_drained and not is_all_drained, \
+            (is_drained, is_all_drained)
+        # Not every check of the URL is done yet
+        assert url_results == [], url_results
+
+    def test_work_queue_results(self):
+        """ Test the work queue commands end to end: enqueue a URL file,
+        work the queue off, then output the results in queued order.
+
+        Example: run enqueue queue -f sample_input_url_list.txt, then work
+        queue and results queue.
+        """
+        file_name = 'sample_input_url_list.txt'
+        with open(file_name) as url_file:
+            urls = [line.strip() for line in url_file if line.strip()]
+        temp_dir = tempfile.mkdtemp()
+        queue_path = os.path.join(temp_dir, 'queue.sqlite')
+        try:
+            for command_args in (['enqueue', queue_path, '-f', file_name], \
+                ['work', queue_path, '-t', '4', '--no-cache', '--cassette', \
+                    os.path.join(CASSETTE_DIR, \
+                        'test_site_normal_multi_url.json')], \
+                ['status', queue_path], ['results', queue_path]):
+                self.__redirect_std()
+                sys.argv = ['workqueue.py'] + command_args
+                try:
+                    workqueue.main()
+                except:
+                    pass
+                finally:
+                    self.__restore_std()
+                if command_args[0] == 'status':
+                    status_output = self.__output
+        finally:
+            shutil.rmtree(temp_dir)
+
+        assert status_output.splitlines() == ['pending: 0', 'claimed: 0', \
+            'done: {}'.format(len(urls) * 4)], status_output
+        assert self.__get_url_headings() == urls, self.__output
+        assert self.__is_all_checker_output_ok(len(urls)), self.__output
+
+    @classmethod
+    def __get_error_result(cls, url_to_check, error_type):
+        """ Return a WOT results.ErrorResult of error_type for url_to_check.
+        """
+        return results.ErrorResult(checker.WotChecker.NAME, url_to_check, \
+            error_type=error_type, error=[], transient=False, \
+            retry_after=None)
+
+
+def run_test(test_name):
+    """ Run one TestSiteChecker test and return (test name, True if it
+    passed, unittest report).
+    """
+    stream = StringIO()
+    result = unittest.TextTestRunner(stream=stream, verbosity=0).run(\
+        TestSiteChecker(test_name))
+    return (test_name, result.wasSuccessful(), stream.getvalue())
+
+
+def run_tests(num_of_jobs):
+    """ Run every TestSiteChecker test, num_of_jobs at once, and print a
+    report like unittest.main().  Return True if all passed.
+
+    Each test runs in its own process, as the tests swap sys.argv and the
+    standard streams around main.main(), except UNPOOLED_TESTS, which run
+    one after another in this process once the others are done.
+    """
+    test_names = unittest.TestLoader().getTestCaseNames(TestSiteChecker)
+    start_time = time.time()
+    pool = multiprocessing.Pool(num_of_jobs)
+    try:
+        outcomes = pool.map(run_test, [test_name for test_name in\
+            test_names if test_name not in UNPOOLED_TESTS], chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    outcomes.extend([run_test(test_name) for test_name in test_names if\
+        test_name in UNPOOLED_TESTS])
+
+    failed = [outcome for outcome in outcomes if not outcome[1]]
+    print >> sys.stderr, ''.join(['.' if outcome[1] else 'F' for outcome in\
+        outcomes])
+    for (test_name, _, report) in failed:
+        print >> sys.stderr, '=' * 70
+        print >> sys.stderr, 'FAIL: {}'.format(test_name)
+        print >> sys.stderr, report.strip()
+    print >> sys.stderr, '-' * 70
+    print >> sys.stderr, 'Ran {} tests in {:.3f}s'.format(len(outcomes),\
+        time.time() - start_time)
+    print >> sys.stderr
+    print >> sys.stderr, 'FAILED (failures={})'.format(len(failed)) if\
+        failed else 'OK'
+    return not failed
+
+
+def __parse_script_args():
+    """ Parse command-line arguments to this script
+    """
+    parser = argparse.ArgumentParser(description='Run the sitechecker '\
+        'tests')
+    parser.add_argument('-j', '--jobs', metavar='jobs', type=int,\
+        default=multiprocessing.cpu_count(),\
+        help='Number of tests to run at once, each in its own process.  '\
+            '(Default: number of CPUs)')
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error('Please provide --jobs as a number greater than 0')
+        # Not reachable, so no return
+    return args
+
 
 if __name__ == '__main__':
-    unittest.main()
+    sys.exit(0 if run_tests(__parse_script_args().jobs) else 1)
 